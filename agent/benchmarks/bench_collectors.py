@@ -0,0 +1,57 @@
+"""Per-tick CPU cost of the psutil collector vs the /proc fast path.
+
+Run from ``agent/``::
+
+    PYTHONPATH=src python benchmarks/bench_collectors.py --ticks 500
+
+Both collectors run with ``cpu_sample_interval=0`` so the measurement is the
+process CPU time spent reading and parsing counters, not the sampling sleep.
+GPU/fan probing is identical on both paths and is included in both numbers.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from ai_dashboard_agent.collector import collect_raw_metrics
+from ai_dashboard_agent.procfs import ProcfsCollector, procfs_available
+
+
+def _measure(collect, ticks: int) -> tuple[float, float]:
+    collect(cpu_sample_interval=0.0)  # warm-up (imports, first /proc reads)
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for _ in range(ticks):
+        collect(cpu_sample_interval=0.0)
+    cpu_ms = (time.process_time() - cpu_start) * 1000.0 / ticks
+    wall_ms = (time.perf_counter() - wall_start) * 1000.0 / ticks
+    return cpu_ms, wall_ms
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ticks", type=int, default=200)
+    args = parser.parse_args()
+
+    if not procfs_available():
+        print("procfs collector is not available on this platform")
+        return 1
+
+    ticks = max(1, args.ticks)
+    procfs = ProcfsCollector()
+    try:
+        psutil_cpu, psutil_wall = _measure(collect_raw_metrics, ticks)
+        procfs_cpu, procfs_wall = _measure(procfs.collect, ticks)
+    finally:
+        procfs.close()
+
+    print(f"ticks={ticks}")
+    print(f"psutil  cpu={psutil_cpu:8.3f} ms/tick  wall={psutil_wall:8.3f} ms/tick")
+    print(f"procfs  cpu={procfs_cpu:8.3f} ms/tick  wall={procfs_wall:8.3f} ms/tick")
+    if procfs_cpu > 0:
+        print(f"speedup x{psutil_cpu / procfs_cpu:.2f} (cpu)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,102 @@
+"""Bytes per sample on the wire: full samples vs keyframe/delta encoding.
+
+Run from ``agent/``::
+
+    PYTHONPATH=src python benchmarks/bench_delta.py --gpus 8 --samples 600
+
+Host fields come from one real ``collect_raw_metrics()`` call; the GPUs are
+synthetic (deterministic random walk) so the numbers are reproducible on
+machines without NVIDIA hardware.  Each sample is annotated with rates the
+same way the agent does before it is encoded.
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import gzip
+import json
+import random
+
+from ai_dashboard_agent.collector import collect_raw_metrics
+from ai_dashboard_agent.delta import DeltaEncoder
+from ai_dashboard_agent.rates import RateTracker
+
+
+def _synthetic_gpus(rng: random.Random, count: int, tick: int) -> list[dict]:
+    gpus = []
+    for idx in range(count):
+        util = max(0.0, min(100.0, 85.0 + rng.gauss(0, 12)))
+        mem_total = 85_899_345_920
+        mem_used = int(mem_total * (0.7 + 0.05 * rng.random()))
+        gpus.append(
+            {
+                "gpu_index": idx,
+                "name": "NVIDIA H100 80GB HBM3",
+                "uuid": f"GPU-{idx:08x}-5d2c-4b7a-9f1e-{idx:012x}",
+                "utilization_gpu_percent": round(util, 1),
+                "utilization_memory_percent": round(util * 0.6, 1),
+                "memory_total_bytes": mem_total,
+                "memory_used_bytes": mem_used,
+                "memory_percent": round(mem_used / mem_total * 100.0, 2),
+                "temperature_c": 60.0 + (tick + idx) % 7,
+                "fan_speed_percent": None,
+                "power_w": round(550.0 + rng.gauss(0, 40), 2),
+                "power_limit_w": 700.0,
+            }
+        )
+    return gpus
+
+
+def _bytes(payload: object) -> tuple[int, int]:
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return len(raw), len(gzip.compress(raw))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--gpus", type=int, default=8)
+    parser.add_argument("--samples", type=int, default=600)
+    parser.add_argument("--keyframe-every", type=int, default=60)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    host = collect_raw_metrics(cpu_sample_interval=0.0)
+    tracker = RateTracker()
+    encoder = DeltaEncoder(args.keyframe_every)
+
+    full_raw = full_gz = wire_raw = wire_gz = 0
+    for tick in range(max(1, args.samples)):
+        sample = copy.deepcopy(host)
+        sample["seq"] = 1_000 + tick
+        sample["cpu_usage_percent"] = round(40.0 + rng.gauss(0, 10), 1)
+        sample["memory_used_bytes"] += int(rng.gauss(0, 2**24))
+        sample["network_rx_bytes_total"] += tick * 125_000_000
+        sample["network_tx_bytes_total"] += tick * 25_000_000
+        for disk in sample.get("disks") or []:
+            disk["read_bytes_total"] += tick * 2_000_000_000
+            disk["read_count_total"] += tick * 15_000
+            disk["busy_time_ms_total"] += tick * 1_500
+        sample["gpus"] = _synthetic_gpus(rng, args.gpus, tick)
+        tracker.apply(sample, now=float(tick) * 2.0)
+
+        raw, gz = _bytes(sample)
+        full_raw += raw
+        full_gz += gz
+        (wire,) = encoder.encode([sample])
+        raw, gz = _bytes(wire)
+        wire_raw += raw
+        wire_gz += gz
+        # A current webapp acknowledges each keyframe it stores.
+        held = wire["seq"] if wire.get("keyframe") else wire.get("base_seq")
+        encoder.acknowledge({"delta": {"keyframe_seq": held}}, 1)
+
+    n = max(1, args.samples)
+    print(f"samples={n} gpus={args.gpus} keyframe_every={args.keyframe_every}")
+    print(f"full   {full_raw / n:9.0f} B/sample  gzip {full_gz / n:8.0f} B/sample")
+    print(f"delta  {wire_raw / n:9.0f} B/sample  gzip {wire_gz / n:8.0f} B/sample")
+    print(f"reduction x{full_raw / wire_raw:.2f} (raw)  x{full_gz / wire_gz:.2f} (gzip)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
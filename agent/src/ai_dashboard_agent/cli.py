@@ -51,8 +51,23 @@ from typing import Any
 import requests
 
 from . import __version__
-from .client import EnrollmentError, IngestAuthError, enroll, post_sample
+from .client import (
+    EnrollmentError,
+    IngestAuthError,
+    IngestBackoffError,
+    KeyframeRequiredError,
+    enroll,
+    post_sample,
+    post_samples,
+    refresh_token,
+)
 from .collector import collect_raw_metrics, collect_system_info
+from .delta import DeltaEncoder
+from .fastsample import FastSampler
+from .pipeline import Sampler, SampleQueue, default_jitter, stable_phase_fraction
+from .procfs import ProcfsCollector, procfs_available
+from .rates import RateTracker
+from .transport import build_session
 
 LOG_FORMAT = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
 
@@ -63,6 +78,9 @@ _SYSTEM_STATE  = Path("/var/lib/ai-dashboard-agent/state.json")
 _USER_CONFIG   = Path.home() / ".config" / "ai-dashboard-agent" / "agent.conf"
 _USER_STATE    = Path.home() / ".local" / "share" / "ai-dashboard-agent" / "state.json"
 
+# Sequence numbers reserved in the state file per write.
+_SEQ_RESERVE = 1000
+
 # -- Machine identity ---------------------------------------------------------
 
 def _read_machine_id() -> str:
@@ -135,8 +153,21 @@ def _load_state() -> dict[str, str]:
         return {}
 
 
+def _enrollment_state(host: str, machine_id: str, server_slug: str, ingest_token: str) -> dict[str, str]:
+    return {
+        "host":         host,
+        "machine_id":   machine_id,
+        "server_slug":  server_slug,
+        "ingest_token": ingest_token,
+        "enrolled_at":  time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
 def _save_state(state: dict[str, Any]) -> None:
     path = _state_path()
+    reserved = _load_state().get("seq_reserved")
+    if isinstance(reserved, int) and "seq_reserved" not in state:
+        state = {**state, "seq_reserved": reserved}  # re-enrolling must not forget used sequence numbers
     try:
         path.parent.mkdir(parents=True, exist_ok=True)
         path.write_text(json.dumps(state, indent=2))
@@ -146,6 +177,32 @@ def _save_state(state: dict[str, Any]) -> None:
         )
 
 
+class _Sequence:
+    """Sample sequence numbers that never repeat across restarts.
+
+    The webapp drops a sample whose ``seq`` it already stored, so numbers must
+    keep increasing even if the clock steps back while the agent is down.  The
+    counter starts at ``max(reserved + 1, now in ms)`` and records a reservation
+    ``_SEQ_RESERVE`` numbers ahead in the state file before handing any out.
+    """
+
+    def __init__(self) -> None:
+        reserved = _load_state().get("seq_reserved")
+        start = int(time.time() * 1000)
+        if isinstance(reserved, int):
+            start = max(reserved + 1, start)
+        self._next = start
+        self._reserved = start - 1
+
+    def __next__(self) -> int:
+        if self._next > self._reserved:
+            self._reserved = self._next + _SEQ_RESERVE
+            _save_state({**_load_state(), "seq_reserved": self._reserved})
+        value = self._next
+        self._next += 1
+        return value
+
+
 # -- Misc helpers -------------------------------------------------------------
 
 def _csv_list(value: str) -> list[str]:
@@ -240,6 +297,47 @@ def build_parser() -> argparse.ArgumentParser:
     parser.add_argument("--timeout", type=float, default=0.0)
     parser.add_argument("--disks", default="")
     parser.add_argument("--cpu-sample-interval", type=float, default=0.2)
+    parser.add_argument(
+        "--collector",
+        default="",
+        choices=["psutil", "procfs"],
+        help="Metric source: psutil (portable, default) or procfs (Linux fast path) (env: AI_DASHBOARD_COLLECTOR)",
+    )
+    parser.add_argument(
+        "--fast-sample-hz",
+        type=float,
+        default=0.0,
+        help="Sample GPU/CPU/iowait/disk busy at this rate between reports and send min/avg/max/p95 (default: off) (env: AI_DASHBOARD_FAST_SAMPLE_HZ)",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=0,
+        help="Samples buffered while the dashboard is slow/unreachable; oldest dropped when full (default: 300) (env: AI_DASHBOARD_QUEUE_SIZE)",
+    )
+    parser.add_argument(
+        "--max-batch",
+        type=int,
+        default=0,
+        help="Max queued samples sent per request when a backlog exists (default: 50) (env: AI_DASHBOARD_MAX_BATCH)",
+    )
+    parser.add_argument(
+        "--http2",
+        action="store_true",
+        help="Use HTTP/2 via httpx (requires: pip install 'httpx[http2]') (env: AI_DASHBOARD_HTTP2=1)",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=None,
+        help="Connection retries with exponential backoff per request (default: 2) (env: AI_DASHBOARD_RETRIES)",
+    )
+    parser.add_argument(
+        "--keyframe-every",
+        type=int,
+        default=None,
+        help="Send a full sample every N samples and only changed fields in between; 0 disables (default: 60) (env: AI_DASHBOARD_KEYFRAME_EVERY)",
+    )
     parser.add_argument("--hostname", default="")
     parser.add_argument("--once", action="store_true")
     parser.add_argument("--insecure", action="store_true", help="Disable TLS verification")
@@ -304,6 +402,86 @@ def _do_enroll(
     return slug, token
 
 
+def _resume_from_state(
+    *,
+    host: str,
+    machine_id: str,
+    verify: bool,
+    timeout: float,
+    session: requests.Session,
+) -> tuple[str, str] | None:
+    """Reuse the persisted slug/token, refreshing the token cheaply.
+
+    Returns None when there is no usable state or the webapp rejects the
+    token, in which case the caller falls back to full enrollment.
+    """
+    logger = logging.getLogger("ai_dashboard_agent")
+    state = _load_state()
+    slug = state.get("server_slug") or ""
+    token = state.get("ingest_token") or ""
+    if not slug or not token:
+        return None
+    # State written by older agents has no host/machine_id; assume it matches.
+    if state.get("host", host) != host or state.get("machine_id", machine_id) != machine_id:
+        logger.info("Saved state belongs to a different host or machine; enrolling")
+        return None
+
+    try:
+        data = refresh_token(
+            host=host,
+            server_slug=slug,
+            token=token,
+            timeout=timeout,
+            verify=verify,
+            session=session,
+        )
+    except IngestAuthError as exc:
+        logger.info("Saved ingest token rejected (%s); enrolling", exc)
+        return None
+    except RuntimeError as exc:
+        # Webapp unreachable or too old for refresh: keep the saved token;
+        # a 401 on ingest still triggers re-enrollment.
+        logger.warning("Token refresh unavailable, using saved token: %s", exc)
+        return slug, token
+
+    slug = data.get("server_slug") or slug
+    token = data["ingest_token"]
+    new_state = _enrollment_state(host, machine_id, slug, token)
+    new_state["refreshed_at"] = new_state["enrolled_at"]
+    new_state["enrolled_at"] = state.get("enrolled_at") or new_state["enrolled_at"]
+    _save_state(new_state)
+    return slug, token
+
+
+def _apply_schedule(
+    sampler: Sampler | None,
+    schedule: Any,
+    configured_interval: float,
+    fast_sampler: FastSampler | None = None,
+) -> float:
+    """Adopt the interval/phase suggested by the webapp; return seconds to hold off sending.
+
+    A ``null`` interval means the webapp is not overriding it, so the
+    configured interval is restored after a period of back-pressure.  The
+    fast sampler's buffers follow the interval so summaries keep covering it.
+    """
+    if not isinstance(schedule, dict):
+        return 0.0
+    try:
+        interval = max(0.5, float(schedule.get("interval_seconds") or configured_interval))
+        phase = schedule.get("phase_fraction")
+        phase = float(phase) if phase is not None else None
+        retry_after = max(0.0, float(schedule.get("retry_after_seconds") or 0.0))
+    except (TypeError, ValueError):
+        return 0.0
+    if sampler is not None:
+        sampler.set_schedule(interval=interval, phase_fraction=phase)
+        sampler.jitter = default_jitter(sampler.interval)
+        if fast_sampler is not None:
+            fast_sampler.set_report_interval(sampler.interval)
+    return min(retry_after, 300.0)
+
+
 # -- Main run loop ------------------------------------------------------------
 
 def run(args: argparse.Namespace) -> int:  # noqa: C901
@@ -324,6 +502,14 @@ def run(args: argparse.Namespace) -> int:  # noqa: C901
     disks_raw    = args.disks     or _get_config("AI_DASHBOARD_DISKS",     cfg)
     hostname     = args.hostname  or _get_config("AI_DASHBOARD_HOSTNAME",  cfg) or socket.gethostname()
     log_level    = args.log_level or _get_config("AI_DASHBOARD_LOG_LEVEL", cfg, "INFO")
+    collector    = (args.collector or _get_config("AI_DASHBOARD_COLLECTOR", cfg, "psutil")).lower()
+    fast_hz      = args.fast_sample_hz or float(_get_config("AI_DASHBOARD_FAST_SAMPLE_HZ", cfg, "0"))
+    queue_size   = args.queue_size or int(_get_config("AI_DASHBOARD_QUEUE_SIZE", cfg, "300"))
+    max_batch    = args.max_batch or int(_get_config("AI_DASHBOARD_MAX_BATCH", cfg, "50"))
+    keyframe_every = (args.keyframe_every if args.keyframe_every is not None
+                      else int(_get_config("AI_DASHBOARD_KEYFRAME_EVERY", cfg, "60")))
+    http2        = args.http2 or _get_config("AI_DASHBOARD_HTTP2", cfg).lower() in ("1", "true", "yes", "on")
+    retries      = args.retries if args.retries is not None else int(_get_config("AI_DASHBOARD_RETRIES", cfg, "2"))
 
     if not host:
         raise SystemExit("Missing --host (or AI_DASHBOARD_HOST)")
@@ -338,7 +524,7 @@ def run(args: argparse.Namespace) -> int:  # noqa: C901
     logging.basicConfig(level=level_name, format=LOG_FORMAT)
     logger = logging.getLogger("ai_dashboard_agent")
 
-    session      = requests.Session()
+    session, transport_stats = build_session(http2=http2, verify=verify, retries=retries)
     legacy_mode  = bool(legacy_slug and legacy_token)
 
     if legacy_mode:
@@ -360,23 +546,30 @@ def run(args: argparse.Namespace) -> int:  # noqa: C901
         machine_id = _read_machine_id()
         logger.debug("Machine-id: %s", machine_id)
 
-        server_slug, ingest_token = _do_enroll(
+        resumed = _resume_from_state(
             host=host,
-            username=username,
-            password=password,
             machine_id=machine_id,
-            hostname=hostname,
-            agent_user=agent_user,
             verify=verify,
             timeout=timeout,
-            quiet=args.quiet,
             session=session,
         )
-        _save_state({
-            "server_slug":  server_slug,
-            "ingest_token": ingest_token,
-            "enrolled_at":  time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-        })
+        if resumed is not None:
+            server_slug, ingest_token = resumed
+            _print(f"Resuming as server '{server_slug}'.", quiet=args.quiet)
+        else:
+            server_slug, ingest_token = _do_enroll(
+                host=host,
+                username=username,
+                password=password,
+                machine_id=machine_id,
+                hostname=hostname,
+                agent_user=agent_user,
+                verify=verify,
+                timeout=timeout,
+                quiet=args.quiet,
+                session=session,
+            )
+            _save_state(_enrollment_state(host, machine_id, server_slug, ingest_token))
         _print(
             f"Agent {__version__} -> {host} server='{server_slug}' every {interval:.2f}s",
             quiet=args.quiet,
@@ -388,86 +581,184 @@ def run(args: argparse.Namespace) -> int:  # noqa: C901
 
     agent = _agent_metadata(hostname, agent_user, disk_filters, labels)
 
-    # Collect + post loop
-    while True:
-        started = time.monotonic()
-        try:
-            sample = collect_raw_metrics(
-                disk_filters=disk_filters or None,
-                cpu_sample_interval=max(0.0, float(args.cpu_sample_interval)),
-            )
-            result = post_sample(
-                host=host,
-                server_slug=server_slug,
-                token=ingest_token,
-                sample=sample,
-                agent=agent,
-                timeout=float(timeout),
-                verify=verify,
-                session=session,
-            )
-            snap = result.get("snapshot", {})
-            _print(
-                (
-                    f"{snap.get('collected_at', '-')}"
-                    f" | cpu={snap.get('cpu_usage_percent', '-')}"
-                    f" gpu={snap.get('top_gpu_util_percent', '-')}"
-                    f" disk={snap.get('disk_util_percent', '-')}"
-                    f" bottleneck={snap.get('bottleneck', '-')}"
-                ),
-                quiet=args.quiet,
+    collect = collect_raw_metrics
+    if collector == "procfs":
+        if procfs_available():
+            collect = ProcfsCollector().collect
+        else:
+            logger.warning("procfs collector unavailable on this platform; using psutil")
+            collector = "psutil"
+    logger.info("Using %s collector", collector)
+
+    fast_sampler: FastSampler | None = None
+    if fast_hz > 0 and not args.once:
+        fast_sampler = FastSampler(hz=fast_hz, report_interval=interval, disk_filters=disk_filters or None)
+        fast_sampler.start()
+        logger.info("Fast sampling enabled at %.1f Hz", fast_sampler.hz)
+
+    rate_tracker = RateTracker()
+    cpu_sample_interval = max(0.0, float(args.cpu_sample_interval))
+    sequence = _Sequence()
+    delta_encoder = DeltaEncoder(keyframe_every) if keyframe_every > 0 else None
+
+    def produce() -> dict[str, Any]:
+        sample = collect(disk_filters=disk_filters or None, cpu_sample_interval=cpu_sample_interval)
+        sample["seq"] = next(sequence)
+        rate_tracker.apply(sample)
+        if fast_sampler is not None:
+            sample["summaries"] = fast_sampler.drain()
+        return sample
+
+    # Sampler thread produces on a fixed schedule; this loop is the sender.
+    queue = SampleQueue(queue_size)
+    sampler: Sampler | None = None
+    server_max_batch = 1  # raised once the webapp advertises batch ingest
+    try:
+        if args.once:
+            queue.put(produce())
+        else:
+            # Spread agents over the interval by machine until the webapp assigns a phase.
+            sampler = Sampler(
+                produce,
+                queue,
+                interval=interval,
+                phase_fraction=stable_phase_fraction(machine_id or f"{host}/{server_slug}"),
+                jitter=default_jitter(interval),
             )
+            sampler.start()
 
-        except IngestAuthError:
-            if legacy_mode:
-                logger.error(
-                    "Ingest token rejected and legacy mode is active -- cannot re-enroll. Exiting."
-                )
-                return 1
-            logger.warning("Ingest token rejected (401) -- re-enrolling ...")
+        while True:
+            batch = queue.get_batch(
+                min(max_batch, server_max_batch),
+                timeout=sampler.interval if sampler is not None else interval,
+            )
+            if not batch:
+                continue
+            agent_payload = {
+                **agent,
+                "queue": {**queue.stats(), "sampler_errors": sampler.errors if sampler else 0},
+                "interval_seconds": interval,
+                "transport": transport_stats.as_dict(),
+            }
+            wire = delta_encoder.encode(batch) if delta_encoder is not None else batch
             try:
-                server_slug, ingest_token = _do_enroll(
-                    host=host,
-                    username=username,
-                    password=password,
-                    machine_id=machine_id,
-                    hostname=hostname,
-                    agent_user=agent_user,
-                    verify=verify,
-                    timeout=timeout,
+                if len(wire) == 1:
+                    result = post_sample(
+                        host=host,
+                        server_slug=server_slug,
+                        token=ingest_token,
+                        sample=wire[0],
+                        agent=agent_payload,
+                        timeout=float(timeout),
+                        verify=verify,
+                        session=session,
+                    )
+                else:
+                    result = post_samples(
+                        host=host,
+                        server_slug=server_slug,
+                        token=ingest_token,
+                        samples=wire,
+                        agent=agent_payload,
+                        timeout=float(timeout),
+                        verify=verify,
+                        session=session,
+                    )
+                if delta_encoder is not None:
+                    delta_encoder.acknowledge(result, len(batch))
+                try:
+                    server_max_batch = max(1, int(result.get("max_batch") or 1))
+                except (TypeError, ValueError):
+                    server_max_batch = 1
+                hold_off = _apply_schedule(sampler, result.get("schedule"), interval, fast_sampler)
+                snap = result.get("snapshot", {})
+                _print(
+                    (
+                        f"{snap.get('collected_at', '-')}"
+                        f" | cpu={snap.get('cpu_usage_percent', '-')}"
+                        f" gpu={snap.get('top_gpu_util_percent', '-')}"
+                        f" disk={snap.get('disk_util_percent', '-')}"
+                        f" bottleneck={snap.get('bottleneck', '-')}"
+                        + (f" (batch of {len(batch)})" if len(batch) > 1 else "")
+                    ),
                     quiet=args.quiet,
-                    session=session,
                 )
-                _save_state({
-                    "server_slug":  server_slug,
-                    "ingest_token": ingest_token,
-                    "enrolled_at":  time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-                })
-                agent = _agent_metadata(hostname, agent_user, disk_filters, labels)
-            except SystemExit:
-                return 1
-            except Exception as exc:
-                logger.exception("Re-enrollment failed: %s", exc)
-                _print(f"Re-enrollment failed: {exc}", quiet=args.quiet)
+                if hold_off and not args.once:
+                    # Webapp is saturated: keep collecting, send the backlog later as a batch.
+                    logger.info("Webapp asked to hold off for %.0fs", hold_off)
+                    time.sleep(hold_off)
+
+            except KeyframeRequiredError:
+                # Webapp lost (or never had) our keyframe: resend the batch starting with a full sample.
+                queue.requeue(batch)
+                if delta_encoder is not None:
+                    delta_encoder.reset()
+                logger.info("Webapp requested a keyframe")
+                continue
+
+            except IngestBackoffError as exc:
+                queue.requeue(batch)
+                _apply_schedule(sampler, exc.schedule, interval, fast_sampler)
                 if args.once:
                     return 1
-                time.sleep(min(60.0, interval * 5))
+                time.sleep(min(max(exc.retry_after, 1.0), 300.0))
+                continue
+
+            except IngestAuthError:
+                queue.requeue(batch)
+                if legacy_mode:
+                    logger.error(
+                        "Ingest token rejected and legacy mode is active -- cannot re-enroll. Exiting."
+                    )
+                    return 1
+                logger.warning("Ingest token rejected (401) -- re-enrolling ...")
+                try:
+                    server_slug, ingest_token = _do_enroll(
+                        host=host,
+                        username=username,
+                        password=password,
+                        machine_id=machine_id,
+                        hostname=hostname,
+                        agent_user=agent_user,
+                        verify=verify,
+                        timeout=timeout,
+                        quiet=args.quiet,
+                        session=session,
+                    )
+                    _save_state(_enrollment_state(host, machine_id, server_slug, ingest_token))
+                    agent = _agent_metadata(hostname, agent_user, disk_filters, labels)
+                except SystemExit:
+                    return 1
+                except Exception as exc:
+                    logger.exception("Re-enrollment failed: %s", exc)
+                    _print(f"Re-enrollment failed: {exc}", quiet=args.quiet)
+                    if args.once:
+                        return 1
+                    time.sleep(min(60.0, interval * 5))
+                continue
 
-        except KeyboardInterrupt:
-            _print("Agent stopped.", quiet=args.quiet)
-            return 0
+            except Exception as exc:
+                queue.requeue(batch)
+                logger.exception("Send failed")
+                _print(f"Send failed: {exc}", quiet=args.quiet)
+                if args.once:
+                    return 1
+                # Samples stay queued (drop-oldest bounds memory); retry next interval.
+                time.sleep(interval)
+                continue
 
-        except Exception as exc:
-            logger.exception("Send failed")
-            _print(f"Send failed: {exc}", quiet=args.quiet)
             if args.once:
-                return 1
+                return 0
 
-        if args.once:
-            return 0
+    except KeyboardInterrupt:
+        _print("Agent stopped.", quiet=args.quiet)
+        return 0
 
-        elapsed = time.monotonic() - started
-        time.sleep(max(0.0, interval - elapsed))
+    finally:
+        if sampler is not None:
+            sampler.stop()
+        if fast_sampler is not None:
+            fast_sampler.stop()
 
 
 def main(argv: list[str] | None = None) -> int:
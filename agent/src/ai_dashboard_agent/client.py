@@ -23,6 +23,10 @@ def build_enroll_url(host: str) -> str:
     return _build_url(host, "api/agent/enroll/")
 
 
+def build_token_refresh_url(host: str) -> str:
+    return _build_url(host, "api/agent/token/refresh/")
+
+
 # ── Enrollment ────────────────────────────────────────────────────────────────
 
 class EnrollmentError(Exception):
@@ -33,6 +37,31 @@ class EnrollmentError(Exception):
         self.status_code = status_code
 
 
+class IngestAuthError(Exception):
+    """Raised when the ingest endpoint returns 401 (token expired/invalid)."""
+
+
+class IngestBackoffError(RuntimeError):
+    """Raised when the webapp is overloaded (429/503) and asks the agent to retry later."""
+
+    def __init__(self, message: str, retry_after: float, schedule: dict | None = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.schedule = schedule or {}
+
+
+class KeyframeRequiredError(RuntimeError):
+    """Raised when the webapp cannot apply a delta sample (409) and needs a full keyframe."""
+
+
+def _retry_after_seconds(response: requests.Response, default: float = 5.0) -> float:
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", "")))
+    except ValueError:
+        # HTTP-date form is not used by the webapp; fall back to the default.
+        return default
+
+
 def enroll(
     *,
     host: str,
@@ -97,22 +126,65 @@ def enroll(
     return data
 
 
-# ── Metric ingest ─────────────────────────────────────────────────────────────
+def refresh_token(
+    *,
+    host: str,
+    server_slug: str,
+    token: str,
+    timeout: float = 10.0,
+    verify: bool = True,
+    session: requests.Session | None = None,
+) -> dict:
+    """Exchange a persisted ingest token for a fresh one without re-enrolling.
 
-class IngestAuthError(Exception):
-    """Raised when the ingest endpoint returns 401 (token expired/invalid)."""
+    Returns the response dict which includes ``server_slug`` and ``ingest_token``.
 
+    Raises :class:`IngestAuthError` when the current token is rejected (401/403).
+    Raises :class:`RuntimeError` on network errors or when the endpoint is missing.
+    """
+    client = session or requests.Session()
+    url = build_token_refresh_url(host)
+    try:
+        response = client.post(
+            url,
+            headers={
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+                "X-Monitoring-Token": token,
+            },
+            json={"server_slug": server_slug},
+            timeout=timeout,
+            verify=verify,
+        )
+    except requests.RequestException as exc:
+        logger.error("Token refresh request to %s failed: %s", url, exc)
+        raise RuntimeError(f"Token refresh request failed: {exc}") from exc
 
-def post_sample(
+    if response.status_code in (401, 403):
+        raise IngestAuthError(f"Token refresh rejected: HTTP {response.status_code}")
+    try:
+        data = response.json()
+    except ValueError:
+        raise RuntimeError(f"Token refresh unavailable: HTTP {response.status_code}")
+    if not response.ok or data.get("ok") is False or not data.get("ingest_token"):
+        message = data.get("error") or f"HTTP {response.status_code}"
+        raise RuntimeError(f"Token refresh failed: {message}")
+
+    logger.info("Token refreshed: server_slug=%s", data.get("server_slug"))
+    return data
+
+
+# ── Metric ingest ─────────────────────────────────────────────────────────────
+
+def _post_ingest(
     *,
     host: str,
     server_slug: str,
     token: str,
-    sample: dict,
-    agent: dict,
-    timeout: float = 5.0,
-    verify: bool = True,
-    session: requests.Session | None = None,
+    payload: dict,
+    timeout: float,
+    verify: bool,
+    session: requests.Session | None,
 ) -> dict:
     client = session or requests.Session()
     url = build_ingest_url(host, server_slug)
@@ -124,7 +196,7 @@ def post_sample(
                 "Content-Type": "application/json",
                 "X-Monitoring-Token": token,
             },
-            json={"sample": sample, "agent": agent},
+            json=payload,
             timeout=timeout,
             verify=verify,
         )
@@ -138,11 +210,65 @@ def post_sample(
     try:
         data = response.json()
     except ValueError:
+        data = None
+    if response.status_code in (429, 503):
+        schedule = data.get("schedule") if isinstance(data, dict) else None
+        retry_after = _retry_after_seconds(response)
+        logger.warning("Webapp overloaded (HTTP %s); retry in %.0fs", response.status_code, retry_after)
+        raise IngestBackoffError(f"HTTP {response.status_code}", retry_after, schedule)
+    if data is None:
         response.raise_for_status()
         raise RuntimeError("Server returned a non-JSON response")
+    if response.status_code == 409 and data.get("keyframe_required"):
+        raise KeyframeRequiredError(data.get("error") or "Keyframe required")
     if not response.ok or data.get("ok") is False:
         message = data.get("error") or f"HTTP {response.status_code}"
         logger.warning("Server responded with error: %s", message)
         raise RuntimeError(message)
-    logger.debug("Posted sample successfully: status=%s", response.status_code)
+    logger.debug("Posted ingest payload successfully: status=%s", response.status_code)
     return data
+
+
+def post_sample(
+    *,
+    host: str,
+    server_slug: str,
+    token: str,
+    sample: dict,
+    agent: dict,
+    timeout: float = 5.0,
+    verify: bool = True,
+    session: requests.Session | None = None,
+) -> dict:
+    return _post_ingest(
+        host=host,
+        server_slug=server_slug,
+        token=token,
+        payload={"sample": sample, "agent": agent},
+        timeout=timeout,
+        verify=verify,
+        session=session,
+    )
+
+
+def post_samples(
+    *,
+    host: str,
+    server_slug: str,
+    token: str,
+    samples: list[dict],
+    agent: dict,
+    timeout: float = 5.0,
+    verify: bool = True,
+    session: requests.Session | None = None,
+) -> dict:
+    """Send several samples in one request (requires a webapp advertising ``max_batch``)."""
+    return _post_ingest(
+        host=host,
+        server_slug=server_slug,
+        token=token,
+        payload={"samples": samples, "agent": agent},
+        timeout=timeout,
+        verify=verify,
+        session=session,
+    )
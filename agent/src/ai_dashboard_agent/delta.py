@@ -0,0 +1,117 @@
+"""Keyframe/delta encoding of samples on the wire.
+
+Most of a sample never changes between ticks: CPU counts, memory and swap
+totals, GPU names, UUIDs, memory totals and power limits, fan labels.
+:class:`DeltaEncoder` sends a full *keyframe* now and then and, in between,
+only a JSON merge patch (RFC 7386) against the last keyframe the webapp has
+acknowledged:
+
+- keyframe: ``{"seq": N, "keyframe": true, ...full sample}``
+- delta:    ``{"seq": M, "base_seq": N, "delta": {...changed fields}}``
+
+Device lists (``gpus``, ``disks``, ``fans``) are diffed as objects keyed by
+``gpu_index`` / ``device`` / ``label`` so an unchanged device costs nothing.
+Deltas are always taken against the keyframe, not the previous sample, so a
+lost request never breaks the chain.  The webapp answers a delta whose base
+it does not hold with ``409 keyframe_required`` and the encoder starts over.
+
+Deltas are only sent after the webapp has acknowledged a keyframe, so older
+webapps keep receiving full samples.
+"""
+from __future__ import annotations
+
+from typing import Any
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Device lists travel as objects keyed by these fields so a delta can address one device.
+LIST_KEYS = {"gpus": "gpu_index", "disks": "device", "fans": "label"}
+
+_MISSING = object()
+
+
+def _index_lists(sample: dict[str, Any]) -> dict[str, Any]:
+    indexed = dict(sample)
+    for name, key in LIST_KEYS.items():
+        items = sample.get(name)
+        if isinstance(items, list):
+            keyed: dict[str, Any] = {}
+            for item in items:
+                if not isinstance(item, dict):
+                    continue
+                ident = str(item.get(key))
+                while ident in keyed:  # e.g. two sensors both labelled "fan1"
+                    ident += "#"
+                keyed[ident] = item
+            indexed[name] = keyed
+    return indexed
+
+
+def diff(base: dict[str, Any], current: dict[str, Any]) -> dict[str, Any]:
+    """Return the merge patch that turns ``base`` into ``current``."""
+    patch: dict[str, Any] = {}
+    for key, value in current.items():
+        old = base.get(key, _MISSING)
+        if isinstance(value, dict) and isinstance(old, dict):
+            nested = diff(old, value)
+            if nested:
+                patch[key] = nested
+        elif old is _MISSING or value != old:
+            patch[key] = value
+    for key in base:
+        if key not in current:
+            patch[key] = None
+    return patch
+
+
+class DeltaEncoder:
+    """Encodes outgoing batches and tracks which keyframe the webapp holds."""
+
+    def __init__(self, keyframe_every: int = 60) -> None:
+        self.keyframe_every = max(1, int(keyframe_every))
+        self._base: tuple[int, dict[str, Any]] | None = None  # acknowledged by the webapp
+        self._pending: tuple[int, dict[str, Any]] | None = None  # sent, not yet acknowledged
+        self._since_keyframe = 0
+        self._supported = False
+
+    def reset(self) -> None:
+        """Forget the keyframe; the next sample is sent in full."""
+        self._base = None
+        self._pending = None
+
+    def encode(self, samples: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        base = self._base if self._since_keyframe < self.keyframe_every else None
+        self._pending = None
+        wire: list[dict[str, Any]] = []
+        for sample in samples:
+            seq = sample.get("seq")
+            if not isinstance(seq, int):
+                wire.append(sample)
+                continue
+            body = {k: v for k, v in sample.items() if k != "seq"}
+            if base is None:
+                wire.append({**sample, "keyframe": True})
+                base = self._pending = (seq, _index_lists(body))
+                if not self._supported:
+                    # Unknown webapp: keep the rest of this batch in full.
+                    wire.extend(samples[len(wire):])
+                    break
+                continue
+            wire.append({"seq": seq, "base_seq": base[0], "delta": diff(base[1], _index_lists(body))})
+        return wire
+
+    def acknowledge(self, result: dict[str, Any], sent: int) -> None:
+        """Update the keyframe state from an ingest response for ``sent`` samples."""
+        ack = result.get("delta") if isinstance(result, dict) else None
+        held = ack.get("keyframe_seq") if isinstance(ack, dict) else None
+        if self._pending is not None and held == self._pending[0]:
+            self._base = self._pending
+            self._since_keyframe = 0
+            if not self._supported:
+                logger.info("Webapp accepts delta-encoded samples")
+            self._supported = True
+        elif self._base is not None and held != self._base[0]:
+            self._base = None
+        self._pending = None
+        self._since_keyframe += sent
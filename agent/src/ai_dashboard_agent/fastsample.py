@@ -0,0 +1,277 @@
+"""High-frequency sampling of cheap metrics between report ticks.
+
+At the default 2 s report interval, short GPU utilization dips (dataloader
+stalls of 100-500 ms) average away.  :class:`FastSampler` runs a background
+thread that samples a handful of cheap readings at 10-20 Hz into fixed-size
+ring buffers:
+
+- ``gpu_util_percent``   -- highest GPU utilization across devices (NVML only)
+- ``cpu_usage_percent``  -- overall CPU busy percentage
+- ``cpu_iowait_percent`` -- CPU iowait percentage
+- ``disk_util_percent``  -- busiest tracked disk
+
+Each report tick calls :meth:`FastSampler.drain`, which returns
+``{metric: {"min", "avg", "max", "p95", "count"}}`` for the samples gathered
+since the previous drain and resets the buffers.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+import warnings
+from array import array
+from typing import Any
+import logging
+
+import psutil
+
+from .collector import detect_tracked_disks
+from .procfs import _ProcFile, _cpu_total, _parse_cpu_times, procfs_available
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_METRICS = ("gpu_util_percent", "cpu_usage_percent", "cpu_iowait_percent", "disk_util_percent")
+
+
+class RingBuffer:
+    """Fixed-capacity float buffer; once full, the oldest values are overwritten."""
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = max(1, int(capacity))
+        self._values = array("d", bytes(8 * self.capacity))
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, value: float) -> None:
+        self._values[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+
+    def clear(self) -> None:
+        self._next = 0
+        self._count = 0
+
+    def resize(self, capacity: int) -> None:
+        """Change the capacity, keeping the newest values that still fit."""
+        capacity = max(1, int(capacity))
+        if capacity == self.capacity:
+            return
+        if self._count < self.capacity:
+            ordered = self._values[: self._count]
+        else:
+            ordered = self._values[self._next :] + self._values[: self._next]
+        kept = ordered[max(0, len(ordered) - capacity) :]
+        self._values = array("d", bytes(8 * capacity))
+        self._values[: len(kept)] = kept
+        self.capacity = capacity
+        self._count = len(kept)
+        self._next = self._count % capacity
+
+    def summary(self) -> dict[str, float | int] | None:
+        if not self._count:
+            return None
+        values = sorted(self._values[: self._count]) if self._count < self.capacity else sorted(self._values)
+        p95_index = min(len(values) - 1, max(0, math.ceil(0.95 * len(values)) - 1))
+        return {
+            "min": round(values[0], 2),
+            "avg": round(sum(values) / len(values), 2),
+            "max": round(values[-1], 2),
+            "p95": round(values[p95_index], 2),
+            "count": len(values),
+        }
+
+
+class _NvmlUtilization:
+    """Keeps NVML initialised and device handles cached for cheap per-tick reads."""
+
+    def __init__(self) -> None:
+        self._nvml: Any = None
+        self._handles: list[Any] = []
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=FutureWarning)
+            try:
+                import pynvml  # type: ignore
+            except Exception:
+                logger.debug("pynvml not available; fast sampler skips GPU utilization")
+                return
+        try:
+            pynvml.nvmlInit()
+            self._handles = [
+                pynvml.nvmlDeviceGetHandleByIndex(idx) for idx in range(pynvml.nvmlDeviceGetCount())
+            ]
+            self._nvml = pynvml
+        except Exception:
+            logger.debug("pynvml initialization failed; fast sampler skips GPU utilization")
+
+    def read_max(self) -> float | None:
+        if self._nvml is None:
+            return None
+        best: float | None = None
+        for handle in self._handles:
+            try:
+                util = float(self._nvml.nvmlDeviceGetUtilizationRates(handle).gpu)
+            except Exception:
+                continue
+            best = util if best is None else max(best, util)
+        return best
+
+    def close(self) -> None:
+        if self._nvml is not None:
+            try:
+                self._nvml.nvmlShutdown()
+            except Exception:
+                pass
+            self._nvml = None
+
+
+class FastSampler:
+    """Background sampler feeding per-metric ring buffers at ``hz`` samples/second."""
+
+    def __init__(
+        self,
+        *,
+        hz: float,
+        report_interval: float,
+        disk_filters: list[str] | None = None,
+    ) -> None:
+        self.hz = max(1.0, min(50.0, float(hz)))
+        self._buffers = {name: RingBuffer(self._capacity(report_interval)) for name in SUMMARY_METRICS}
+        self._disk_filters = disk_filters
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self._stat: _ProcFile | None = None
+        self._diskstats: _ProcFile | None = None
+        if procfs_available():
+            self._stat = _ProcFile("/proc/stat")
+            self._diskstats = _ProcFile("/proc/diskstats", size=16384)
+        self._gpu: _NvmlUtilization | None = None
+        self._prev_cpu: list[int] | None = None
+        self._prev_busy: dict[str, int] = {}
+        self._prev_at = 0.0
+
+    def _capacity(self, report_interval: float) -> int:
+        # Room for two report intervals so a late drain does not lose the window.
+        return int(math.ceil(self.hz * max(0.5, report_interval) * 2))
+
+    def set_report_interval(self, report_interval: float) -> None:
+        """Resize the buffers for a new drain interval (e.g. stretched by webapp back-pressure).
+
+        Without this, a stretched interval would summarise only the newest
+        samples that fit the startup-sized buffers.
+        """
+        capacity = self._capacity(report_interval)
+        with self._lock:
+            for buf in self._buffers.values():
+                buf.resize(capacity)
+
+    # -- raw readers -----------------------------------------------------------
+
+    def _cpu_times(self) -> list[int]:
+        if self._stat is not None:
+            return _parse_cpu_times(self._stat.read())
+        t = psutil.cpu_times()
+        # Same column order as /proc/stat; unit differences cancel out in ratios.
+        return [
+            int(getattr(t, name, 0.0) * 1000)
+            for name in ("user", "nice", "system", "idle", "iowait", "irq", "softirq", "steal", "guest", "guest_nice")
+        ]
+
+    def _disk_busy(self) -> dict[str, int]:
+        if self._diskstats is not None:
+            busy: dict[str, int] = {}
+            for line in self._diskstats.read().splitlines():
+                fields = line.split()
+                if len(fields) >= 14:
+                    busy[fields[2].decode("ascii", errors="replace")] = int(fields[12])
+        else:
+            counters = psutil.disk_io_counters(perdisk=True, nowrap=True) or {}
+            busy = {name: int(getattr(c, "busy_time", 0)) for name, c in counters.items()}
+        tracked = detect_tracked_disks(busy, self._disk_filters)
+        return {name: busy[name] for name in tracked}
+
+    # -- sampling loop ---------------------------------------------------------
+
+    def sample_once(self) -> None:
+        now = time.monotonic()
+        cpu = self._cpu_times()
+        busy = self._disk_busy()
+        gpu_util = self._gpu.read_max() if self._gpu is not None else None
+
+        if self._prev_cpu is not None:
+            total = _cpu_total(cpu) - _cpu_total(self._prev_cpu)
+            dt_ms = (now - self._prev_at) * 1000.0
+            with self._lock:
+                if total > 0:
+                    idle = cpu[3] - self._prev_cpu[3]
+                    iowait = cpu[4] - self._prev_cpu[4]
+                    self._buffers["cpu_usage_percent"].append(
+                        max(0.0, min(100.0, (total - idle - iowait) / total * 100.0))
+                    )
+                    self._buffers["cpu_iowait_percent"].append(max(0.0, min(100.0, iowait / total * 100.0)))
+                if busy and dt_ms > 0:
+                    utils = [
+                        max(0, value - self._prev_busy[name]) / dt_ms * 100.0
+                        for name, value in busy.items()
+                        if name in self._prev_busy
+                    ]
+                    if utils:
+                        self._buffers["disk_util_percent"].append(min(100.0, max(utils)))
+                if gpu_util is not None:
+                    self._buffers["gpu_util_percent"].append(gpu_util)
+
+        self._prev_cpu = cpu
+        self._prev_busy = busy
+        self._prev_at = now
+
+    def _run(self) -> None:
+        self._gpu = _NvmlUtilization()
+        period = 1.0 / self.hz
+        next_at = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                try:
+                    self.sample_once()
+                except Exception:
+                    logger.debug("fast sample failed", exc_info=True)
+                next_at += period
+                delay = next_at - time.monotonic()
+                if delay < 0:
+                    # Fell behind (e.g. suspended); resynchronise instead of bursting.
+                    next_at = time.monotonic()
+                    delay = 0.0
+                self._stop.wait(delay)
+        finally:
+            self._gpu.close()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="ai-dashboard-fast-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        for handle in (self._stat, self._diskstats):
+            if handle is not None:
+                handle.close()
+
+    def drain(self) -> dict[str, dict[str, float | int]]:
+        """Return summaries for the samples since the last drain and reset the buffers."""
+        summaries: dict[str, dict[str, float | int]] = {}
+        with self._lock:
+            for name, buf in self._buffers.items():
+                summary = buf.summary()
+                if summary is not None:
+                    summaries[name] = summary
+                buf.clear()
+        return summaries
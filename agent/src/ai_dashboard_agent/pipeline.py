@@ -0,0 +1,167 @@
+"""Producer/consumer plumbing that decouples collection from sending.
+
+:class:`Sampler` runs in a background thread and produces one sample per
+interval on a monotonic-clock schedule, so a slow webapp never delays the
+next collection or skews ``collected_at`` spacing.  Samples go into a
+:class:`SampleQueue`; the sender (the agent's main loop) drains it, batching
+whatever backlog has built up.  When the queue is full the oldest sample is
+dropped.
+
+Ticks are aligned to the wall clock at ``k * interval + phase``.  The phase
+is stable per machine (see :func:`stable_phase_fraction`) or assigned by the
+webapp, so agents restarted together still spread their requests across
+the interval instead of arriving in the same few milliseconds.  A small
+random jitter is added on top of every tick.
+"""
+from __future__ import annotations
+
+import hashlib
+import math
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SampleQueue:
+    """Bounded FIFO with a drop-oldest overflow policy."""
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = max(1, int(capacity))
+        self._items: deque[dict[str, Any]] = deque()
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+    def _trim(self) -> None:
+        while len(self._items) > self.capacity:
+            self._items.popleft()
+            self.dropped += 1
+
+    def put(self, sample: dict[str, Any]) -> None:
+        with self._cond:
+            self._items.append(sample)
+            self._trim()
+            self._cond.notify()
+
+    def requeue(self, samples: list[dict[str, Any]]) -> None:
+        """Put unsent samples back at the head, still honouring drop-oldest."""
+        with self._cond:
+            self._items.extendleft(reversed(samples))
+            self._trim()
+            self._cond.notify()
+
+    def get_batch(self, max_items: int, timeout: float | None = None) -> list[dict[str, Any]]:
+        """Wait up to ``timeout`` for at least one sample and return up to ``max_items``."""
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            batch: list[dict[str, Any]] = []
+            while self._items and len(batch) < max(1, max_items):
+                batch.append(self._items.popleft())
+            return batch
+
+    def stats(self) -> dict[str, int]:
+        with self._cond:
+            return {"depth": len(self._items), "capacity": self.capacity, "dropped": self.dropped}
+
+
+def stable_phase_fraction(key: str) -> float:
+    """Map ``key`` (e.g. the machine-id) to a fixed fraction of the interval in [0, 1)."""
+    digest = hashlib.sha256(key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2**64
+
+
+def default_jitter(interval: float) -> float:
+    """Per-tick jitter bound: 5% of the interval, at most 250 ms."""
+    return min(0.25, 0.05 * interval)
+
+
+class Sampler:
+    """Background thread calling ``produce()`` every ``interval`` seconds into a queue."""
+
+    def __init__(
+        self,
+        produce: Callable[[], dict[str, Any]],
+        queue: SampleQueue,
+        *,
+        interval: float,
+        phase_fraction: float = 0.0,
+        jitter: float = 0.0,
+    ) -> None:
+        self._produce = produce
+        self._queue = queue
+        self.interval = interval
+        self.phase_fraction = phase_fraction % 1.0
+        self.jitter = max(0.0, jitter)
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.errors = 0
+
+    def set_schedule(self, *, interval: float | None = None, phase_fraction: float | None = None) -> None:
+        """Change interval and/or phase; the next tick is re-aligned to the new schedule."""
+        changed = False
+        if interval is not None and interval > 0 and not math.isclose(interval, self.interval):
+            self.interval = interval
+            changed = True
+        if phase_fraction is not None and not math.isclose(phase_fraction % 1.0, self.phase_fraction):
+            self.phase_fraction = phase_fraction % 1.0
+            changed = True
+        if changed:
+            logger.info(
+                "Sampler schedule: interval=%.2fs phase=%.3fs", self.interval, self.phase_fraction * self.interval
+            )
+            self._wake.set()
+
+    def _aligned_tick(self) -> float:
+        """Monotonic time of the next wall-clock tick at ``k * interval + phase``."""
+        interval = self.interval
+        phase = self.phase_fraction * interval
+        wall = time.time()
+        mono = time.monotonic()
+        tick = (math.floor((wall - phase) / interval) + 1) * interval + phase
+        return mono + (tick - wall)
+
+    def _run(self) -> None:
+        next_at = self._aligned_tick()
+        while not self._stop.is_set():
+            delay = next_at - time.monotonic()
+            if self.jitter:
+                delay += random.uniform(0.0, self.jitter)
+            if self._wake.wait(max(0.0, delay)):
+                self._wake.clear()
+                next_at = self._aligned_tick()
+                continue
+            try:
+                self._queue.put(self._produce())
+            except Exception:
+                self.errors += 1
+                logger.exception("Sample collection failed")
+            next_at += self.interval
+            now = time.monotonic()
+            if next_at < now:
+                # Collection overran one or more ticks; skip them rather than bursting.
+                missed = int((now - next_at) // self.interval) + 1
+                logger.debug("Sampler fell behind by %d tick(s)", missed)
+                next_at += missed * self.interval
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="ai-dashboard-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
@@ -0,0 +1,298 @@
+"""Linux fast-path collector that reads /proc directly.
+
+The psutil path re-opens and re-parses /proc files for every call.  This
+collector keeps one file descriptor per source open for the life of the agent
+and reads each file with a single ``preadv`` into a reused buffer:
+
+- ``/proc/stat``      -> CPU usage and per-state percentages
+- ``/proc/meminfo``   -> memory + swap
+- ``/proc/diskstats`` -> per-disk counters
+- ``/proc/net/dev``   -> network byte counters
+- ``/proc/loadavg``   -> load averages
+
+``process_count`` still lists ``/proc`` each tick, counting the same PID
+directories as ``len(psutil.pids())`` without building the list.
+
+The sample it returns has exactly the same keys and value types as
+:func:`ai_dashboard_agent.collector.collect_raw_metrics`.  GPU, fan, CPU
+temperature and CPU frequency readings come from the same helpers as the
+psutil path, so only the host counters differ in how they are read.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any
+import logging
+
+import psutil
+
+from .collector import (
+    _collect_fan_speeds,
+    _read_cpu_temperature_c,
+    _to_float,
+    collect_gpu_metrics,
+    detect_tracked_disks,
+)
+
+logger = logging.getLogger(__name__)
+
+# /proc/diskstats reports 512-byte sectors regardless of the device block size.
+_SECTOR_SIZE = 512
+
+# /proc/stat "cpu" line column order (clock ticks).
+_CPU_FIELDS = (
+    "user", "nice", "system", "idle", "iowait",
+    "irq", "softirq", "steal", "guest", "guest_nice",
+)
+
+
+def procfs_available() -> bool:
+    """Return True when every /proc source used by :class:`ProcfsCollector` is readable."""
+    if not sys.platform.startswith("linux") or not hasattr(os, "preadv"):
+        return False
+    return all(
+        os.access(path, os.R_OK)
+        for path in ("/proc/stat", "/proc/meminfo", "/proc/diskstats", "/proc/net/dev", "/proc/loadavg")
+    )
+
+
+class _ProcFile:
+    """A /proc file held open and re-read from offset 0 into a reused buffer."""
+
+    def __init__(self, path: str, size: int = 8192) -> None:
+        self.path = path
+        self._fd = os.open(path, os.O_RDONLY | getattr(os, "O_CLOEXEC", 0))
+        self._buf = bytearray(size)
+
+    def read(self) -> bytes:
+        while True:
+            n = os.preadv(self._fd, [self._buf], 0)
+            if n < len(self._buf):
+                return bytes(memoryview(self._buf)[:n])
+            # Buffer was filled completely: the file may be longer. Grow and retry.
+            self._buf = bytearray(len(self._buf) * 2)
+
+    def close(self) -> None:
+        try:
+            os.close(self._fd)
+        except OSError:
+            pass
+
+
+class _NoWrap:
+    """Mirror psutil's ``nowrap=True``: keep counters monotonic across kernel wraps."""
+
+    def __init__(self) -> None:
+        self._last: dict[tuple[str, int], int] = {}
+        self._offset: dict[tuple[str, int], int] = {}
+
+    def __call__(self, name: str, values: list[int]) -> list[int]:
+        out: list[int] = []
+        for idx, value in enumerate(values):
+            key = (name, idx)
+            last = self._last.get(key)
+            if last is not None and value < last:
+                self._offset[key] = self._offset.get(key, 0) + last
+            self._last[key] = value
+            out.append(value + self._offset.get(key, 0))
+        return out
+
+
+def _parse_cpu_times(data: bytes) -> list[int]:
+    # First line is the aggregate "cpu" row.
+    line = data.split(b"\n", 1)[0]
+    values = [int(v) for v in line.split()[1:]]
+    values.extend([0] * (len(_CPU_FIELDS) - len(values)))
+    return values[: len(_CPU_FIELDS)]
+
+
+def _cpu_total(times: list[int]) -> int:
+    # guest/guest_nice are already accounted for in user/nice (same as psutil).
+    return sum(times) - times[8] - times[9]
+
+
+def _parse_meminfo(data: bytes) -> dict[bytes, int]:
+    mems: dict[bytes, int] = {}
+    for line in data.splitlines():
+        fields = line.split()
+        if len(fields) >= 2:
+            mems[fields[0]] = int(fields[1]) * 1024
+    return mems
+
+
+def _usage_percent(used: int, total: int) -> float:
+    return round(used / total * 100.0, 1) if total else 0.0
+
+
+class ProcfsCollector:
+    """Stateful collector that reuses /proc file descriptors between ticks.
+
+    Differences from the psutil path worth knowing about:
+
+    - ``cpu_user_percent`` / ``cpu_system_percent`` / ``cpu_iowait_percent``
+      are computed against the previous tick, which is what
+      ``psutil.cpu_times_percent(interval=None)`` also does.
+    """
+
+    def __init__(self) -> None:
+        self._stat = _ProcFile("/proc/stat")
+        self._meminfo = _ProcFile("/proc/meminfo")
+        self._diskstats = _ProcFile("/proc/diskstats", size=16384)
+        self._netdev = _ProcFile("/proc/net/dev")
+        self._loadavg = _ProcFile("/proc/loadavg", size=256)
+        self._nowrap = _NoWrap()
+        self._prev_cpu_times = _parse_cpu_times(self._stat.read())
+        # Static for the life of the process.
+        self._cpu_count_logical = psutil.cpu_count(logical=True) or 0
+        self._cpu_count_physical = psutil.cpu_count(logical=False)
+
+    def close(self) -> None:
+        for handle in (self._stat, self._meminfo, self._diskstats, self._netdev, self._loadavg):
+            handle.close()
+
+    # -- individual sources ----------------------------------------------------
+
+    def read_cpu_times(self) -> list[int]:
+        return _parse_cpu_times(self._stat.read())
+
+    def _cpu_percentages(self, cpu_sample_interval: float) -> tuple[float, dict[str, float]]:
+        before = self.read_cpu_times()
+        if cpu_sample_interval > 0:
+            time.sleep(cpu_sample_interval)
+        after = self.read_cpu_times()
+
+        all_delta = _cpu_total(after) - _cpu_total(before)
+        if all_delta > 0:
+            busy_delta = all_delta - (after[3] - before[3]) - (after[4] - before[4])
+            usage = round(max(0.0, min(100.0, busy_delta / all_delta * 100.0)), 1)
+        else:
+            usage = 0.0
+
+        prev = self._prev_cpu_times
+        self._prev_cpu_times = after
+        window = _cpu_total(after) - _cpu_total(prev)
+        states: dict[str, float] = {}
+        for idx, name in enumerate(_CPU_FIELDS[:5]):
+            pct = (after[idx] - prev[idx]) / window * 100.0 if window > 0 else 0.0
+            states[name] = round(max(0.0, min(100.0, pct)), 1)
+        return usage, states
+
+    def read_disk_counters(self) -> dict[str, list[int]]:
+        """Return ``{device: [reads, writes, read_bytes, write_bytes, busy_ms]}``."""
+        disks: dict[str, list[int]] = {}
+        for line in self._diskstats.read().splitlines():
+            fields = line.split()
+            if len(fields) < 14:
+                continue
+            name = fields[2].decode("ascii", errors="replace")
+            raw = [
+                int(fields[3]),
+                int(fields[7]),
+                int(fields[5]) * _SECTOR_SIZE,
+                int(fields[9]) * _SECTOR_SIZE,
+                int(fields[12]),
+            ]
+            disks[name] = self._nowrap(name, raw)
+        return disks
+
+    def _network_totals(self) -> tuple[int, int]:
+        rx_total = 0
+        tx_total = 0
+        for line in self._netdev.read().splitlines()[2:]:
+            name, sep, rest = line.partition(b":")
+            if not sep:
+                continue
+            fields = rest.split()
+            if len(fields) < 9:
+                continue
+            rx, tx = self._nowrap("net:" + name.strip().decode("ascii", errors="replace"), [int(fields[0]), int(fields[8])])
+            rx_total += rx
+            tx_total += tx
+        return rx_total, tx_total
+
+    def _load_averages(self) -> tuple[float | None, float | None, float | None]:
+        fields = self._loadavg.read().split()
+        try:
+            return float(fields[0]), float(fields[1]), float(fields[2])
+        except (IndexError, ValueError):
+            return None, None, None
+
+    @staticmethod
+    def _process_count() -> int:
+        # Thread-group leaders only, as psutil.pids(); /proc/loadavg's task total includes threads.
+        try:
+            return sum(1 for name in os.listdir(b"/proc") if name.isdigit())
+        except OSError:
+            return 0
+
+    # -- full sample -----------------------------------------------------------
+
+    def collect(
+        self,
+        *,
+        disk_filters: list[str] | None = None,
+        cpu_sample_interval: float = 0.2,
+    ) -> dict[str, Any]:
+        cpu_usage_percent, cpu_states = self._cpu_percentages(max(0.0, cpu_sample_interval))
+        cpu_freq = psutil.cpu_freq()
+        cpu_temperature_c = _read_cpu_temperature_c()
+
+        mems = _parse_meminfo(self._meminfo.read())
+        mem_total = mems.get(b"MemTotal:", 0)
+        mem_available = mems.get(b"MemAvailable:", mems.get(b"MemFree:", 0))
+        if mem_available > mem_total:
+            mem_available = mems.get(b"MemFree:", 0)
+        mem_used = mem_total - mem_available
+        swap_total = mems.get(b"SwapTotal:", 0)
+        swap_used = swap_total - mems.get(b"SwapFree:", 0)
+
+        load1, load5, load15 = self._load_averages()
+
+        per_disk_counters = self.read_disk_counters()
+        disk_rows: list[dict[str, Any]] = []
+        for device in detect_tracked_disks(per_disk_counters, disk_filters):
+            reads, writes, read_bytes, write_bytes, busy_ms = per_disk_counters[device]
+            disk_rows.append(
+                {
+                    "device": device,
+                    "read_bytes_total": read_bytes,
+                    "write_bytes_total": write_bytes,
+                    "read_count_total": reads,
+                    "write_count_total": writes,
+                    "busy_time_ms_total": busy_ms,
+                }
+            )
+
+        rx_total, tx_total = self._network_totals()
+        gpus = collect_gpu_metrics()
+        fans = _collect_fan_speeds()
+        return {
+            "collected_at": datetime.now(timezone.utc).isoformat(),
+            "cpu_usage_percent": float(cpu_usage_percent),
+            "cpu_user_percent": cpu_states["user"],
+            "cpu_system_percent": cpu_states["system"],
+            "cpu_iowait_percent": cpu_states["iowait"],
+            "cpu_load_1": load1,
+            "cpu_load_5": load5,
+            "cpu_load_15": load15,
+            "cpu_frequency_mhz": _to_float(getattr(cpu_freq, "current", None) if cpu_freq else None),
+            "cpu_temperature_c": cpu_temperature_c,
+            "cpu_count_logical": self._cpu_count_logical,
+            "cpu_count_physical": self._cpu_count_physical,
+            "memory_total_bytes": int(mem_total),
+            "memory_used_bytes": int(mem_used),
+            "memory_available_bytes": int(mem_available),
+            "memory_percent": _usage_percent(mem_used, mem_total),
+            "swap_total_bytes": int(swap_total),
+            "swap_used_bytes": int(swap_used),
+            "swap_percent": _usage_percent(swap_used, swap_total),
+            "network_rx_bytes_total": rx_total,
+            "network_tx_bytes_total": tx_total,
+            "process_count": self._process_count(),
+            "disks": disk_rows,
+            "gpus": gpus,
+            "fans": fans,
+        }
@@ -0,0 +1,137 @@
+"""Agent-side counter deltas.
+
+The webapp can derive disk and network rates from the previous stored
+snapshot, but that forces every ingest to read it back from the database.
+:class:`RateTracker` keeps the previous counters in memory instead and adds
+ready-made rates to each sample:
+
+- per disk: ``read_bps``, ``write_bps``, ``read_iops``, ``write_iops``, ``util_percent``
+- top level: ``network_rx_bps``, ``network_tx_bps`` and ``interval_seconds``
+
+No rates are attached to the first sample, or to the first sample after a
+reboot or a counter reset.  The webapp then falls back to its own derivation.
+"""
+from __future__ import annotations
+
+import time
+from typing import Any
+import logging
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+_WRAP_32 = 2**32
+
+
+def _counter_delta(current: int, previous: int) -> int | None:
+    """Return the increase of a monotonic counter, or None if it was reset.
+
+    A counter that goes backwards from the upper half of the 32-bit range is
+    treated as a wrap (e.g. ``io_ticks`` on older kernels); any other decrease
+    is a reset (reboot, driver reload, device hot-swap).
+    """
+    if current >= previous:
+        return current - previous
+    if _WRAP_32 // 2 <= previous < _WRAP_32 and current < _WRAP_32 // 2:
+        return current + _WRAP_32 - previous
+    return None
+
+
+def _boot_time() -> float | None:
+    try:
+        return float(psutil.boot_time())
+    except Exception:
+        return None
+
+
+class RateTracker:
+    """Remembers the previous sample's counters and annotates new samples with rates."""
+
+    def __init__(self) -> None:
+        self._prev_at: float | None = None
+        self._prev_boot: float | None = None
+        self._prev_disks: dict[str, dict[str, int]] = {}
+        self._prev_net: tuple[int, int] | None = None
+
+    def reset(self) -> None:
+        self._prev_at = None
+        self._prev_disks = {}
+        self._prev_net = None
+
+    def apply(self, sample: dict[str, Any], *, now: float | None = None) -> bool:
+        """Add rate fields to ``sample`` in place.  Returns True if rates were added."""
+        now = time.monotonic() if now is None else now
+        boot = _boot_time()
+        disks = [d for d in sample.get("disks") or [] if isinstance(d, dict)]
+        net = (int(sample.get("network_rx_bytes_total") or 0), int(sample.get("network_tx_bytes_total") or 0))
+
+        rebooted = boot is not None and self._prev_boot is not None and abs(boot - self._prev_boot) > 1.0
+        if rebooted:
+            logger.info("Boot time changed; resetting counter baseline")
+            self.reset()
+
+        prev_at = self._prev_at
+        prev_disks = self._prev_disks
+        prev_net = self._prev_net
+
+        self._prev_at = now
+        self._prev_boot = boot
+        self._prev_disks = {
+            str(d.get("device")): {
+                "read_bytes_total": int(d.get("read_bytes_total") or 0),
+                "write_bytes_total": int(d.get("write_bytes_total") or 0),
+                "read_count_total": int(d.get("read_count_total") or 0),
+                "write_count_total": int(d.get("write_count_total") or 0),
+                "busy_time_ms_total": int(d.get("busy_time_ms_total") or 0),
+            }
+            for d in disks
+        }
+        self._prev_net = net
+
+        if prev_at is None or prev_net is None:
+            return False
+        dt = now - prev_at
+        if dt <= 0:
+            return False
+
+        rx = _counter_delta(net[0], prev_net[0])
+        tx = _counter_delta(net[1], prev_net[1])
+        if rx is None or tx is None:
+            logger.info("Network counters reset; skipping local rates for this sample")
+            return False
+
+        disk_rates: list[tuple[dict[str, Any], dict[str, float]]] = []
+        for disk in disks:
+            device = str(disk.get("device"))
+            current = self._prev_disks[device]
+            previous = prev_disks.get(device)
+            if previous is None:
+                # New device: no baseline yet, report zero like the webapp does.
+                disk_rates.append((disk, dict.fromkeys(
+                    ("read_bps", "write_bps", "read_iops", "write_iops", "util_percent"), 0.0
+                )))
+                continue
+            deltas = {key: _counter_delta(current[key], previous[key]) for key in current}
+            if any(value is None for value in deltas.values()):
+                logger.info("Disk counters reset for %s; skipping local rates for this sample", device)
+                return False
+            disk_rates.append(
+                (
+                    disk,
+                    {
+                        "read_bps": deltas["read_bytes_total"] / dt,
+                        "write_bps": deltas["write_bytes_total"] / dt,
+                        "read_iops": deltas["read_count_total"] / dt,
+                        "write_iops": deltas["write_count_total"] / dt,
+                        "util_percent": max(0.0, min(100.0, deltas["busy_time_ms_total"] / (dt * 1000.0) * 100.0)),
+                    },
+                )
+            )
+
+        for disk, rates in disk_rates:
+            disk.update(rates)
+        sample["interval_seconds"] = dt
+        sample["network_rx_bps"] = rx / dt
+        sample["network_tx_bps"] = tx / dt
+        return True
@@ -0,0 +1,225 @@
+"""HTTP transport used for enrollment, token refresh and ingest.
+
+Remote agents usually talk to the webapp through a TLS-terminating nginx,
+where a fresh TCP + TLS handshake costs more than the request itself.
+:func:`build_session` returns a client tuned to keep one connection alive
+for the life of the agent:
+
+- a single-host pool (``pool_maxsize=2``) with TCP keep-alive probes, so a
+  silently dropped connection is noticed instead of hanging the next send
+- bounded retries with exponential backoff on connection failures only; a
+  request that may have reached the webapp (even one answered ``502`` by
+  nginx, which cannot tell whether the upstream stored it) is never resent
+  here, the agent's queue re-sends it on the next tick
+- optional HTTP/2 through ``httpx`` (``pip install 'httpx[http2]'``)
+
+Both variants count requests, new connections, TLS handshakes and retries
+in a :class:`TransportStats`, which the agent reports as ``transport`` in its
+metadata.
+"""
+from __future__ import annotations
+
+import importlib.util
+import socket
+import threading
+from typing import Any
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+def _keepalive_socket_options() -> list[tuple[int, int, int]]:
+    """TCP_NODELAY plus keep-alive probes after 30 s idle, every 10 s, 3 misses."""
+    options = list(HTTPConnection.default_socket_options)
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    idle = getattr(socket, "TCP_KEEPIDLE", None) or getattr(socket, "TCP_KEEPALIVE", None)  # Linux / macOS
+    if idle is not None:
+        options.append((socket.IPPROTO_TCP, idle, 30))
+    if hasattr(socket, "TCP_KEEPINTVL"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 10))
+    if hasattr(socket, "TCP_KEEPCNT"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3))
+    return options
+
+
+class TransportStats:
+    """Thread-safe counters describing how well connections are being reused."""
+
+    def __init__(self, http_version: str) -> None:
+        self.http_version = http_version
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+        self.retries = 0
+
+    def add(self, *, requests: int = 0, connections: int = 0, tls_handshakes: int = 0, retries: int = 0) -> None:
+        with self._lock:
+            self.requests += requests
+            self.connections += connections
+            self.tls_handshakes += tls_handshakes
+            self.retries += retries
+
+    def as_dict(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "http_version": self.http_version,
+                "requests": self.requests,
+                "connections": self.connections,
+                "reused": max(0, self.requests - self.connections),
+                "tls_handshakes": self.tls_handshakes,
+                "retries": self.retries,
+            }
+
+
+class _CountingRetry(Retry):
+    """Retry policy that reports every retry to the session's stats."""
+
+    stats: TransportStats | None = None
+
+    def increment(self, *args: Any, **kwargs: Any) -> Retry:
+        if self.stats is not None:
+            self.stats.add(retries=1)
+        return super().increment(*args, **kwargs)
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter with keep-alive sockets that counts new connections per request."""
+
+    def __init__(self, stats: TransportStats, **kwargs: Any) -> None:
+        self._stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        kwargs["socket_options"] = _keepalive_socket_options()
+        super().init_poolmanager(*args, **kwargs)
+
+    def _opened_connections(self) -> int:
+        pools = self.poolmanager.pools
+        return sum(getattr(pools.get(key), "num_connections", 0) for key in list(pools.keys()))
+
+    def send(self, request: requests.PreparedRequest, *args: Any, **kwargs: Any) -> requests.Response:
+        before = self._opened_connections()
+        try:
+            return super().send(request, *args, **kwargs)
+        finally:
+            opened = max(0, self._opened_connections() - before)
+            tls = opened if (request.url or "").startswith("https:") else 0
+            self._stats.add(requests=1, connections=opened, tls_handshakes=tls)
+
+
+class _Http2Response:
+    """The subset of :class:`requests.Response` the agent client uses."""
+
+    def __init__(self, response: Any) -> None:
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def json(self) -> Any:
+        return self._response.json()
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            raise requests.HTTPError(f"HTTP {self.status_code}", response=None)
+
+
+class Http2Session:
+    """Drop-in for the ``requests.Session.post`` calls in :mod:`.client`, backed by httpx.
+
+    TLS verification is fixed when the session is built; the per-request
+    ``verify`` argument is accepted for compatibility and ignored.
+    """
+
+    def __init__(self, *, verify: bool, retries: int, stats: TransportStats) -> None:
+        import httpx  # type: ignore
+
+        self._httpx = httpx
+        self._stats = stats
+        transport = httpx.HTTPTransport(
+            http2=True,
+            verify=verify,
+            retries=retries,
+            socket_options=_keepalive_socket_options(),
+            limits=httpx.Limits(max_connections=2, max_keepalive_connections=1),
+        )
+        self._client = httpx.Client(http2=True, transport=transport)
+
+    def _trace(self, event: str, info: dict[str, Any]) -> None:
+        if event == "connection.connect_tcp.complete":
+            self._stats.add(connections=1)
+        elif event == "connection.start_tls.complete":
+            self._stats.add(tls_handshakes=1)
+        elif event == "connection.connect_tcp.failed":
+            self._stats.add(retries=1)
+
+    def post(
+        self,
+        url: str,
+        *,
+        headers: dict[str, str] | None = None,
+        json: Any = None,
+        timeout: float | None = None,
+        verify: bool = True,
+    ) -> _Http2Response:
+        self._stats.add(requests=1)
+        try:
+            response = self._client.post(
+                url,
+                headers=headers,
+                json=json,
+                timeout=timeout,
+                extensions={"trace": self._trace},
+            )
+        except self._httpx.HTTPError as exc:
+            raise requests.ConnectionError(str(exc)) from exc
+        return _Http2Response(response)
+
+    def close(self) -> None:
+        self._client.close()
+
+
+def http2_available() -> bool:
+    return all(importlib.util.find_spec(name) is not None for name in ("httpx", "h2"))
+
+
+def build_session(
+    *,
+    http2: bool = False,
+    verify: bool = True,
+    retries: int = 2,
+    backoff: float = 0.5,
+) -> tuple[requests.Session | Http2Session, TransportStats]:
+    """Return a pooled keep-alive client and the stats object it reports into."""
+    retries = max(0, int(retries))
+    if http2:
+        if http2_available():
+            stats = TransportStats("HTTP/2")
+            return Http2Session(verify=verify, retries=retries, stats=stats), stats
+        logger.warning("HTTP/2 requested but httpx[http2] is not installed; using HTTP/1.1")
+
+    stats = TransportStats("HTTP/1.1")
+    retry_cls = type("_SessionRetry", (_CountingRetry,), {"stats": stats})
+    # Only failures to connect are retried: the request was never sent.
+    retry = retry_cls(
+        total=retries,
+        connect=retries,
+        read=0,
+        status=0,
+        other=0,
+        backoff_factor=backoff,
+        raise_on_status=False,
+    )
+    session = requests.Session()
+    adapter = _PooledAdapter(stats, pool_connections=1, pool_maxsize=2, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session, stats
@@ -0,0 +1,80 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from ai_dashboard_agent import cli
+
+
+class SequenceTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.state = Path(tmp.name) / "state.json"
+        patcher = mock.patch.object(cli, "_state_path", return_value=self.state)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_starts_at_wall_clock_ms(self):
+        with mock.patch.object(cli.time, "time", return_value=1_700_000_000.0):
+            sequence = cli._Sequence()
+        self.assertEqual([next(sequence), next(sequence)], [1_700_000_000_000, 1_700_000_000_001])
+
+    def test_clock_step_back_does_not_reuse_numbers(self):
+        with mock.patch.object(cli.time, "time", return_value=1_700_000_000.0):
+            sequence = cli._Sequence()
+        sent = [next(sequence) for _ in range(3)]
+
+        with mock.patch.object(cli.time, "time", return_value=1_699_999_000.0):  # clock stepped back
+            restarted = cli._Sequence()
+        self.assertGreater(next(restarted), max(sent))
+
+    def test_reservation_is_written_ahead(self):
+        with mock.patch.object(cli.time, "time", return_value=1_700_000_000.0):
+            sequence = cli._Sequence()
+        for _ in range(cli._SEQ_RESERVE + 2):
+            last = next(sequence)
+        self.assertGreaterEqual(json.loads(self.state.read_text())["seq_reserved"], last)
+
+    def test_enrollment_keeps_reservation(self):
+        self.state.write_text(json.dumps({"seq_reserved": 42}))
+        cli._save_state(cli._enrollment_state("http://dash", "mid", "gpu-01", "token"))
+        state = json.loads(self.state.read_text())
+        self.assertEqual((state["server_slug"], state["seq_reserved"]), ("gpu-01", 42))
+
+
+class ResumeFromStateTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.state = Path(tmp.name) / "state.json"
+        self.state.write_text(json.dumps(cli._enrollment_state("http://dash", "mid", "gpu-01", "old")))
+        patcher = mock.patch.object(cli, "_state_path", return_value=self.state)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def resume(self, **refresh):
+        with mock.patch.object(cli, "refresh_token", **refresh):
+            return cli._resume_from_state(host="http://dash", machine_id="mid", verify=True, timeout=1.0, session=None)
+
+    def test_refreshed_token_is_saved(self):
+        self.assertEqual(self.resume(return_value={"server_slug": "gpu-01", "ingest_token": "new"}), ("gpu-01", "new"))
+        self.assertEqual(json.loads(self.state.read_text())["ingest_token"], "new")
+
+    def test_rejected_token_falls_back_to_enrollment(self):
+        self.assertIsNone(self.resume(side_effect=cli.IngestAuthError("HTTP 401")))
+
+    def test_unreachable_webapp_keeps_saved_token(self):
+        self.assertEqual(self.resume(side_effect=RuntimeError("connection refused")), ("gpu-01", "old"))
+
+    def test_state_for_another_machine_is_ignored(self):
+        with mock.patch.object(cli, "refresh_token") as refresh:
+            result = cli._resume_from_state(host="http://dash", machine_id="other", verify=True, timeout=1.0,
+                                            session=None)
+        self.assertIsNone(result)
+        refresh.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import json
+import unittest
+
+import requests
+
+from ai_dashboard_agent.client import (
+    IngestAuthError,
+    IngestBackoffError,
+    KeyframeRequiredError,
+    post_sample,
+    post_samples,
+    refresh_token,
+)
+
+
+def _response(status, body=None, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response._content = body if isinstance(body, bytes) else json.dumps(body).encode() if body is not None else b""
+    response.headers.update(headers or {})
+    return response
+
+
+class _Session:
+    """Stands in for ``requests.Session``: records requests and returns canned responses."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def post(self, url, **kwargs):
+        self.requests.append((url, kwargs))
+        return self.responses.pop(0)
+
+
+class RefreshTokenTests(unittest.TestCase):
+    def refresh(self, response):
+        session = _Session(response)
+        return refresh_token(host="http://dash", server_slug="gpu-01", token="old", session=session), session
+
+    def test_returns_new_token(self):
+        data, session = self.refresh(_response(200, {"ok": True, "server_slug": "gpu-01", "ingest_token": "new"}))
+        self.assertEqual(data["ingest_token"], "new")
+        url, kwargs = session.requests[0]
+        self.assertEqual(url, "http://dash/api/agent/token/refresh/")
+        self.assertEqual(kwargs["headers"]["X-Monitoring-Token"], "old")
+
+    def test_rejected_token_raises_auth_error(self):
+        for status in (401, 403):
+            with self.assertRaises(IngestAuthError):
+                self.refresh(_response(status, {"ok": False, "error": "Invalid token"}))
+
+    def test_missing_endpoint_raises_runtime_error(self):
+        with self.assertRaises(RuntimeError) as ctx:
+            self.refresh(_response(404, b"<html>Not Found</html>"))
+        self.assertNotIsInstance(ctx.exception, IngestAuthError)
+
+
+class PostIngestTests(unittest.TestCase):
+    def post(self, response, samples=None):
+        self.session = _Session(response)
+        if samples is None:
+            return post_sample(host="http://dash", server_slug="gpu-01", token="t", sample={"seq": 1}, agent={},
+                               session=self.session)
+        return post_samples(host="http://dash", server_slug="gpu-01", token="t", samples=samples, agent={},
+                            session=self.session)
+
+    def test_success_returns_body(self):
+        self.assertEqual(self.post(_response(200, {"ok": True, "max_batch": 50}))["max_batch"], 50)
+        self.post(_response(200, {"ok": True}), samples=[{"seq": 1}, {"seq": 2}])
+        url, kwargs = self.session.requests[0]
+        self.assertEqual(url, "http://dash/api/ingest/servers/gpu-01/metrics/")
+        self.assertEqual(len(kwargs["json"]["samples"]), 2)
+
+    def test_401_raises_auth_error(self):
+        with self.assertRaises(IngestAuthError):
+            self.post(_response(401, {"ok": False, "error": "Invalid ingest token"}))
+
+    def test_409_requires_keyframe(self):
+        with self.assertRaises(KeyframeRequiredError):
+            self.post(_response(409, {"ok": False, "keyframe_required": True, "error": "Unknown base_seq"}))
+
+    def test_overload_honours_retry_after(self):
+        for status in (429, 503):
+            schedule = {"interval_seconds": 10, "retry_after_seconds": 30}
+            with self.assertRaises(IngestBackoffError) as ctx:
+                self.post(_response(status, {"ok": False, "schedule": schedule}, {"Retry-After": "30"}))
+            self.assertEqual((ctx.exception.retry_after, ctx.exception.schedule), (30.0, schedule), status)
+
+    def test_overload_without_json_or_retry_after(self):
+        with self.assertRaises(IngestBackoffError) as ctx:
+            self.post(_response(503, b"Service Unavailable", {"Retry-After": "Wed, 21 Oct 2026 07:28:00 GMT"}))
+        self.assertEqual((ctx.exception.retry_after, ctx.exception.schedule), (5.0, {}))
+
+    def test_other_errors_raise_runtime_error(self):
+        with self.assertRaises(RuntimeError):
+            self.post(_response(400, {"ok": False, "error": "Bad sample"}))
+        with self.assertRaises(requests.HTTPError):
+            self.post(_response(502, b"<html>Bad Gateway</html>"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+
+from ai_dashboard_agent.delta import DeltaEncoder, diff
+
+
+def _merge(target, patch):
+    merged = dict(target)
+    for key, value in patch.items():
+        if value is None:
+            merged.pop(key, None)
+        elif isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _sample(seq, cpu=10.0, **extra):
+    return {
+        "seq": seq,
+        "cpu_percent": cpu,
+        "memory_total_bytes": 64 * 2**30,
+        "fans": [{"label": "fan1", "rpm": 1200}, {"label": "fan1", "rpm": 900}],
+        **extra,
+    }
+
+
+def _ack(keyframe_seq):
+    return {"delta": {"keyframe_seq": keyframe_seq}}
+
+
+class DiffTests(unittest.TestCase):
+    def test_removed_key_becomes_none(self):
+        patch = diff({"cpu_temperature_c": 55.0, "cpu_percent": 10.0}, {"cpu_percent": 12.0})
+        self.assertEqual(patch, {"cpu_temperature_c": None, "cpu_percent": 12.0})
+        self.assertEqual(_merge({"cpu_temperature_c": 55.0, "cpu_percent": 10.0}, patch), {"cpu_percent": 12.0})
+
+    def test_unchanged_nested_values_are_left_out(self):
+        base = {"gpus": {"0": {"name": "A100", "util": 50}}}
+        current = {"gpus": {"0": {"name": "A100", "util": 70}}}
+        self.assertEqual(diff(base, current), {"gpus": {"0": {"util": 70}}})
+
+
+class DeltaEncoderTests(unittest.TestCase):
+    def test_full_samples_until_keyframe_acknowledged(self):
+        encoder = DeltaEncoder(keyframe_every=10)
+        wire = encoder.encode([_sample(1), _sample(2)])
+        self.assertTrue(wire[0]["keyframe"])
+        self.assertEqual(wire[1], _sample(2))
+
+        encoder.acknowledge({}, sent=2)  # older webapp: no delta ack
+        wire = encoder.encode([_sample(3)])
+        self.assertTrue(wire[0]["keyframe"])
+
+    def test_deltas_against_acknowledged_keyframe(self):
+        encoder = DeltaEncoder(keyframe_every=10)
+        encoder.encode([_sample(1)])
+        encoder.acknowledge(_ack(1), sent=1)
+
+        wire = encoder.encode([_sample(2, cpu=20.0), _sample(3, cpu=30.0)])
+        self.assertEqual(wire[0], {"seq": 2, "base_seq": 1, "delta": {"cpu_percent": 20.0}})
+        self.assertEqual(wire[1], {"seq": 3, "base_seq": 1, "delta": {"cpu_percent": 30.0}})
+
+    def test_duplicate_fan_labels_are_kept_apart(self):
+        encoder = DeltaEncoder(keyframe_every=10)
+        encoder.encode([_sample(1)])
+        encoder.acknowledge(_ack(1), sent=1)
+
+        changed = _sample(2, fans=[{"label": "fan1", "rpm": 1200}, {"label": "fan1", "rpm": 950}])
+        (wire,) = encoder.encode([changed])
+        self.assertEqual(wire["delta"], {"fans": {"fan1#": {"rpm": 950}}})
+
+    def test_none_value_is_sent_as_deletion(self):
+        encoder = DeltaEncoder(keyframe_every=10)
+        encoder.encode([_sample(1, cpu_temperature_c=55.0)])
+        encoder.acknowledge(_ack(1), sent=1)
+
+        (wire,) = encoder.encode([_sample(2)])
+        self.assertEqual(wire["delta"], {"cpu_temperature_c": None})
+
+    def test_keyframe_cadence(self):
+        encoder = DeltaEncoder(keyframe_every=3)
+        encoder.encode([_sample(1)])
+        encoder.acknowledge(_ack(1), sent=1)
+
+        wire = encoder.encode([_sample(2), _sample(3)])
+        self.assertEqual([w.get("base_seq") for w in wire], [1, 1])
+        encoder.acknowledge(_ack(1), sent=2)
+
+        wire = encoder.encode([_sample(4), _sample(5)])
+        self.assertTrue(wire[0]["keyframe"])
+        self.assertEqual(wire[1]["base_seq"], 4)
+        encoder.acknowledge(_ack(4), sent=2)
+
+        (wire,) = encoder.encode([_sample(6)])
+        self.assertEqual(wire["base_seq"], 4)
+
+    def test_resync_after_keyframe_required(self):
+        encoder = DeltaEncoder(keyframe_every=10)
+        encoder.encode([_sample(1)])
+        encoder.acknowledge(_ack(1), sent=1)
+        encoder.encode([_sample(2)])
+
+        encoder.reset()  # the client raised KeyframeRequiredError (409)
+        (wire,) = encoder.encode([_sample(2)])
+        self.assertTrue(wire["keyframe"])
+        encoder.acknowledge(_ack(2), sent=1)
+        (wire,) = encoder.encode([_sample(3, cpu=11.0)])
+        self.assertEqual(wire, {"seq": 3, "base_seq": 2, "delta": {"cpu_percent": 11.0}})
+
+    def test_lost_keyframe_falls_back_to_full_sample(self):
+        encoder = DeltaEncoder(keyframe_every=10)
+        encoder.encode([_sample(1)])
+        encoder.acknowledge(_ack(1), sent=1)
+
+        encoder.acknowledge(_ack(None), sent=1)  # webapp no longer holds seq 1
+        (wire,) = encoder.encode([_sample(3)])
+        self.assertTrue(wire["keyframe"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+
+from ai_dashboard_agent.fastsample import RingBuffer
+
+
+class RingBufferTests(unittest.TestCase):
+    def fill(self, capacity, values):
+        ring = RingBuffer(capacity)
+        for value in values:
+            ring.append(float(value))
+        return ring
+
+    def test_overwrites_oldest_when_full(self):
+        ring = self.fill(3, range(5))
+        self.assertEqual(len(ring), 3)
+        self.assertEqual(ring.summary(), {"min": 2.0, "avg": 3.0, "max": 4.0, "p95": 4.0, "count": 3})
+
+    def test_p95(self):
+        ring = self.fill(100, range(1, 101))
+        self.assertEqual(ring.summary()["p95"], 95.0)
+        self.assertEqual(self.fill(10, [1.0]).summary()["p95"], 1.0)
+        self.assertIsNone(RingBuffer(4).summary())
+
+    def test_shrink_keeps_newest_values(self):
+        ring = self.fill(4, range(6))  # wrapped: holds 2, 3, 4, 5
+        ring.resize(2)
+        self.assertEqual((ring.capacity, ring.summary()["min"], ring.summary()["max"]), (2, 4.0, 5.0))
+        ring.append(6.0)
+        self.assertEqual((ring.summary()["min"], ring.summary()["max"]), (5.0, 6.0))
+
+    def test_grow_keeps_all_values(self):
+        ring = self.fill(3, range(5))  # wrapped: holds 2, 3, 4
+        ring.resize(6)
+        self.assertEqual(len(ring), 3)
+        for value in (5, 6, 7):
+            ring.append(float(value))
+        self.assertEqual(ring.summary(), {"min": 2.0, "avg": 4.5, "max": 7.0, "p95": 7.0, "count": 6})
+        ring.append(8.0)  # full again: 2 is the oldest and goes first
+        self.assertEqual(ring.summary()["min"], 3.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
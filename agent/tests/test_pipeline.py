@@ -0,0 +1,77 @@
+import unittest
+from unittest import mock
+
+from ai_dashboard_agent import pipeline
+from ai_dashboard_agent.pipeline import Sampler, SampleQueue, default_jitter, stable_phase_fraction
+
+
+class SampleQueueTests(unittest.TestCase):
+    def test_drops_oldest_when_full(self):
+        queue = SampleQueue(3)
+        for seq in range(5):
+            queue.put({"seq": seq})
+        self.assertEqual(queue.stats(), {"depth": 3, "capacity": 3, "dropped": 2})
+        self.assertEqual([s["seq"] for s in queue.get_batch(10, timeout=0)], [2, 3, 4])
+
+    def test_requeue_goes_to_the_head(self):
+        queue = SampleQueue(5)
+        for seq in range(4):
+            queue.put({"seq": seq})
+        batch = queue.get_batch(2, timeout=0)
+        queue.put({"seq": 4})
+        queue.requeue(batch)
+        self.assertEqual([s["seq"] for s in queue.get_batch(10, timeout=0)], [0, 1, 2, 3, 4])
+
+    def test_requeue_into_a_full_queue_drops_the_oldest(self):
+        queue = SampleQueue(3)
+        for seq in range(3):
+            queue.put({"seq": seq})
+        batch = queue.get_batch(2, timeout=0)
+        for seq in range(3, 5):
+            queue.put({"seq": seq})
+        queue.requeue(batch)  # 0 and 1 are older than everything queued since
+        self.assertEqual([s["seq"] for s in queue.get_batch(10, timeout=0)], [2, 3, 4])
+        self.assertEqual(queue.dropped, 2)
+
+    def test_get_batch_times_out_empty(self):
+        self.assertEqual(SampleQueue(3).get_batch(5, timeout=0.01), [])
+
+
+class ScheduleTests(unittest.TestCase):
+    def test_phase_is_stable_and_spread(self):
+        self.assertEqual(stable_phase_fraction("machine-a"), stable_phase_fraction("machine-a"))
+        phases = [stable_phase_fraction(f"machine-{n}") for n in range(1000)]
+        self.assertTrue(all(0.0 <= phase < 1.0 for phase in phases))
+        # Roughly uniform: every tenth of the interval gets a share of the fleet.
+        buckets = [sum(int(phase * 10) == bucket for phase in phases) for bucket in range(10)]
+        self.assertTrue(all(50 <= count <= 150 for count in buckets), buckets)
+
+    def test_jitter_bounds(self):
+        self.assertAlmostEqual(default_jitter(2.0), 0.1)
+        self.assertEqual(default_jitter(60.0), 0.25)
+        self.assertEqual(default_jitter(0.0), 0.0)
+
+    def test_ticks_align_to_wall_clock_plus_phase(self):
+        sampler = Sampler(dict, SampleQueue(1), interval=2.0, phase_fraction=0.25)
+        with mock.patch.object(pipeline.time, "time", return_value=100.3), \
+                mock.patch.object(pipeline.time, "monotonic", return_value=50.0):
+            self.assertAlmostEqual(sampler._aligned_tick(), 50.2)  # wall 100.5 = 50 * 2 s + 0.5 s phase
+
+    def test_jitter_is_added_within_bound(self):
+        sampler = Sampler(dict, SampleQueue(1), interval=2.0, jitter=0.1)
+        delays = []
+
+        def wait(delay):
+            delays.append(delay)
+            sampler._stop.set()
+            return True
+
+        with mock.patch.object(sampler, "_aligned_tick", return_value=0.0), \
+                mock.patch.object(pipeline.time, "monotonic", return_value=0.0), \
+                mock.patch.object(sampler._wake, "wait", side_effect=wait):
+            sampler._run()
+        self.assertTrue(0.0 <= delays[0] <= 0.1, delays)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+from ai_dashboard_agent.collector import collect_raw_metrics
+from ai_dashboard_agent.procfs import ProcfsCollector, procfs_available
+
+# Counters move between the two reads; compare within these bounds.
+COUNTER_FIELDS = ("network_rx_bytes_total", "network_tx_bytes_total")
+MEMORY_FIELDS = ("memory_used_bytes", "memory_available_bytes", "swap_used_bytes")
+PERCENT_FIELDS = ("cpu_usage_percent", "cpu_user_percent", "cpu_system_percent", "cpu_iowait_percent")
+EXACT_FIELDS = ("cpu_count_logical", "cpu_count_physical", "memory_total_bytes", "swap_total_bytes")
+
+
+@unittest.skipUnless(procfs_available(), "needs Linux /proc")
+class ProcfsParityTests(unittest.TestCase):
+    def setUp(self):
+        collector = ProcfsCollector()
+        self.addCleanup(collector.close)
+        self.procfs = collector.collect(cpu_sample_interval=0)
+        self.psutil = collect_raw_metrics(cpu_sample_interval=0)
+
+    def test_same_keys_and_types(self):
+        self.assertEqual(set(self.procfs), set(self.psutil))
+        for key, value in self.psutil.items():
+            if value is not None and self.procfs[key] is not None:
+                self.assertIs(type(self.procfs[key]), type(value), key)
+
+    def test_values_agree(self):
+        for key in EXACT_FIELDS:
+            self.assertEqual(self.procfs[key], self.psutil[key], key)
+        for key in MEMORY_FIELDS:
+            self.assertAlmostEqual(self.procfs[key], self.psutil[key], delta=self.psutil["memory_total_bytes"] * 0.02)
+        for key in COUNTER_FIELDS:
+            self.assertAlmostEqual(self.procfs[key], self.psutil[key], delta=max(1 << 20, self.psutil[key] * 0.01))
+        for key in PERCENT_FIELDS:
+            self.assertTrue(0.0 <= self.procfs[key] <= 100.0, key)
+        for key in ("cpu_load_1", "cpu_load_5", "cpu_load_15"):
+            self.assertAlmostEqual(self.procfs[key], self.psutil[key], delta=0.5)
+        # Processes, not threads: the task total in /proc/loadavg would be far off on most hosts.
+        self.assertAlmostEqual(self.procfs["process_count"], self.psutil["process_count"], delta=10)
+
+    def test_same_disks(self):
+        self.assertEqual([d["device"] for d in self.procfs["disks"]], [d["device"] for d in self.psutil["disks"]])
+        for ours, theirs in zip(self.procfs["disks"], self.psutil["disks"]):
+            for key, value in theirs.items():
+                if key != "device":
+                    self.assertLessEqual(ours[key], value, (ours["device"], key))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from unittest import mock
+
+from ai_dashboard_agent import rates
+from ai_dashboard_agent.rates import RateTracker
+
+
+def _sample(rx, busy_ms, read_bytes=0):
+    return {
+        "network_rx_bytes_total": rx,
+        "network_tx_bytes_total": 0,
+        "disks": [{"device": "nvme0n1", "read_bytes_total": read_bytes, "write_bytes_total": 0,
+                   "read_count_total": 0, "write_count_total": 0, "busy_time_ms_total": busy_ms}],
+    }
+
+
+class RateTrackerTests(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(rates, "_boot_time", return_value=1000.0)
+        self.boot_time = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rates_from_previous_sample(self):
+        tracker = RateTracker()
+        first = _sample(rx=1000, busy_ms=0)
+        self.assertFalse(tracker.apply(first, now=10.0))
+        self.assertNotIn("network_rx_bps", first)
+
+        second = _sample(rx=5000, busy_ms=500, read_bytes=8192)
+        self.assertTrue(tracker.apply(second, now=12.0))
+        self.assertEqual((second["interval_seconds"], second["network_rx_bps"]), (2.0, 2000.0))
+        self.assertEqual((second["disks"][0]["read_bps"], second["disks"][0]["util_percent"]), (4096.0, 25.0))
+
+    def test_32_bit_wrap(self):
+        tracker = RateTracker()
+        tracker.apply(_sample(rx=0, busy_ms=2**32 - 1000), now=10.0)
+        sample = _sample(rx=0, busy_ms=1000)
+        self.assertTrue(tracker.apply(sample, now=12.0))
+        self.assertEqual(sample["disks"][0]["util_percent"], 100.0)  # 2000 ms over 2 s
+
+    def test_counter_reset_skips_rates(self):
+        tracker = RateTracker()
+        tracker.apply(_sample(rx=5000, busy_ms=0), now=10.0)
+        sample = _sample(rx=100, busy_ms=0)
+        self.assertFalse(tracker.apply(sample, now=12.0))
+        self.assertNotIn("network_rx_bps", sample)
+        # The reset sample becomes the new baseline.
+        self.assertTrue(tracker.apply(_sample(rx=300, busy_ms=0), now=14.0))
+
+    def test_boot_time_change_resets_baseline(self):
+        tracker = RateTracker()
+        tracker.apply(_sample(rx=1000, busy_ms=0), now=10.0)
+        self.boot_time.return_value = 5000.0  # rebooted; counters happen to be higher
+        sample = _sample(rx=9000, busy_ms=100)
+        self.assertFalse(tracker.apply(sample, now=12.0))
+        self.assertNotIn("network_rx_bps", sample)
+        self.assertTrue(tracker.apply(_sample(rx=9000, busy_ms=100), now=14.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import socket
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import requests
+
+from ai_dashboard_agent.transport import build_session
+
+
+class _BadGateway(BaseHTTPRequestHandler):
+    posts = 0
+
+    def do_POST(self):
+        type(self).posts += 1
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.send_response(502)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class RetryTests(unittest.TestCase):
+    def test_post_answered_502_is_not_resent(self):
+        server = HTTPServer(("127.0.0.1", 0), _BadGateway)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        session, stats = build_session(retries=2, backoff=0)
+        response = session.post(f"http://127.0.0.1:{server.server_port}/api/ingest/", json={}, timeout=5)
+        self.assertEqual((response.status_code, _BadGateway.posts), (502, 1))
+        self.assertEqual(stats.as_dict()["retries"], 0)
+
+    def test_refused_connection_is_retried(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]  # nothing listens once closed
+        session, stats = build_session(retries=2, backoff=0)
+        with self.assertRaises(requests.ConnectionError):
+            session.post(f"http://127.0.0.1:{port}/api/ingest/", json={}, timeout=5)
+        self.assertEqual(stats.as_dict()["retries"], 3)  # two retries, then the final failure
+
+
+if __name__ == "__main__":
+    unittest.main()
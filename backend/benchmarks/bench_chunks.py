@@ -0,0 +1,176 @@
+"""Compression ratio and decode throughput of compacted history chunks.
+
+Run from ``backend/``::
+
+    python benchmarks/bench_chunks.py --servers 2 --hours 2 --interval 5
+
+Builds a fresh SQLite database, ingests ``--hours`` of samples per server
+through the collector (8 GPUs, 4 disks, 2 fans each), then runs
+``compact_metrics`` with ``--window-minutes`` chunks.  Reports:
+
+- database size before and after compaction (both after ``VACUUM``) and
+  the bytes per sample of the chunk payloads alone
+- decode throughput of :func:`~monitoring.services.chunks.decode_chunk`
+  (samples per second, all columns and devices)
+- time of a full-range history read from raw rows vs from chunks
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def _setup_django(db_path: str, storage: str) -> None:
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    os.environ["MONITORING_DEVICE_STORAGE"] = storage
+    os.environ["MONITORING_INGEST_SINGLE_WRITER"] = "0"
+    from django.conf import settings
+
+    settings.DATABASES["default"]["NAME"] = db_path
+    import django
+
+    django.setup()
+    logging.disable(logging.CRITICAL)
+
+
+def _sample(rnd: random.Random, tick: int, at: datetime) -> dict:
+    return {
+        "collected_at": at.isoformat(),
+        "cpu_usage_percent": round(rnd.uniform(20, 90), 1),
+        "cpu_iowait_percent": round(rnd.uniform(0, 5), 2),
+        "load_avg_1m": round(rnd.uniform(4, 12), 2),
+        "memory_total_bytes": 512 * 2**30,
+        "memory_used_bytes": (200 + tick % 40) * 2**30,
+        "memory_percent": 40.0 + tick % 40,
+        "network_rx_bytes_total": tick * 625_000_000 + rnd.randrange(1_000_000),
+        "network_tx_bytes_total": tick * 125_000_000 + rnd.randrange(1_000_000),
+        "disks": [
+            {
+                "device": f"nvme{d}n1",
+                "read_bytes_total": tick * 2_000_000_000 + rnd.randrange(10_000_000),
+                "write_bytes_total": tick * 500_000_000 + rnd.randrange(10_000_000),
+                "read_count_total": tick * 15_000 + rnd.randrange(100),
+                "write_count_total": tick * 4_000 + rnd.randrange(100),
+                "busy_time_ms_total": tick * 1_500 + rnd.randrange(500),
+            }
+            for d in range(4)
+        ],
+        "gpus": [
+            {
+                "gpu_index": g,
+                "name": "NVIDIA H100 80GB HBM3",
+                "uuid": f"GPU-bench-{g}",
+                "utilization_gpu_percent": float(rnd.choice((0, 97, 98, 99, 100))),
+                "utilization_memory_percent": float(rnd.randrange(30, 60)),
+                "memory_total_bytes": 85_899_345_920,
+                "memory_used_bytes": 60_000_000_000 + rnd.randrange(4) * 2**20,
+                "memory_percent": 69.8,
+                "temperature_c": float(rnd.randrange(55, 75)),
+                "power_w": round(rnd.uniform(300, 700), 2),
+                "power_limit_w": 700.0,
+            }
+            for g in range(8)
+        ],
+        "fans": [{"label": f"fan{f}", "speed_rpm": 1200 + rnd.randrange(-40, 40)} for f in range(2)],
+    }
+
+
+def _db_bytes() -> int:
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute("VACUUM")
+        cursor.execute("PRAGMA page_count")
+        pages = cursor.fetchone()[0]
+        cursor.execute("PRAGMA page_size")
+        return pages * cursor.fetchone()[0]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--servers", type=int, default=2)
+    parser.add_argument("--hours", type=float, default=2.0, help="history per server")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between samples")
+    parser.add_argument("--window-minutes", type=int, default=60)
+    parser.add_argument("--storage", choices=("rows", "packed"), default="rows")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "bench.sqlite3")
+        _setup_django(db_path, args.storage)
+        from django.core.management import call_command
+        from django.utils import timezone as dj_timezone
+
+        from monitoring.models import MetricChunk, MetricSnapshot, MonitoredServer
+        from monitoring.services.chunks import decode_chunk, history_snapshots
+        from monitoring.services.collector import ingest_samples_for_server
+        from monitoring.services.devices import load_devices
+
+        call_command("migrate", verbosity=0)
+        ticks = int(args.hours * 3600 / args.interval)
+        start = dj_timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=args.hours + 2)
+        rnd = random.Random(42)
+        servers = []
+        began = time.perf_counter()
+        for index in range(args.servers):
+            server = MonitoredServer.objects.create(slug=f"bench-{index:04d}", name=f"Bench {index}")
+            servers.append(server)
+            for first in range(0, ticks, 100):
+                samples = [
+                    _sample(rnd, tick, start + timedelta(seconds=tick * args.interval))
+                    for tick in range(first, min(ticks, first + 100))
+                ]
+                ingest_samples_for_server(server, {"samples": samples})
+        total = MetricSnapshot.objects.count()
+        print(f"ingested {total} samples ({args.storage}) in {time.perf_counter() - began:.1f} s")
+
+        since = start - timedelta(minutes=1)
+        began = time.perf_counter()
+        for server in servers:
+            load_devices(history_snapshots(server, since))
+        raw_read = time.perf_counter() - began
+        before = _db_bytes()
+
+        began = time.perf_counter()
+        with open(os.devnull, "w") as devnull:
+            call_command("compact_metrics", window_minutes=args.window_minutes, older_than_hours=1, stdout=devnull)
+        compact_time = time.perf_counter() - began
+        after = _db_bytes()
+        chunks = list(MetricChunk.objects.all())
+        compacted = sum(chunk.sample_count for chunk in chunks)
+        payload = sum(len(chunk.data) for chunk in chunks)
+
+        began = time.perf_counter()
+        decoded = sum(len(decode_chunk(chunk.data)) for chunk in chunks)
+        decode_time = time.perf_counter() - began
+        began = time.perf_counter()
+        for server in servers:
+            history_snapshots(server, since)
+        chunk_read = time.perf_counter() - began
+
+    print(f"compacted {compacted} samples into {len(chunks)} chunks in {compact_time:.1f} s")
+    print(
+        f"database {before / 1e6:.2f} MB -> {after / 1e6:.2f} MB  "
+        f"(ratio {before / after:.1f}x, {before / total:.0f} -> {after / total:.0f} B/sample)"
+    )
+    print(f"chunk payload {payload / max(1, compacted):.0f} B/sample ({payload / 1e6:.2f} MB)")
+    print(
+        f"decode {decoded / decode_time:,.0f} samples/s  "
+        f"({payload / decode_time / 1e6:.2f} MB/s of chunk payload)"
+    )
+    print(f"history read: raw {raw_read * 1000:.0f} ms, chunks {chunk_read * 1000:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,90 @@
+"""Sustained ingest throughput for growing synthetic fleets.
+
+Run from ``backend/``::
+
+    python benchmarks/bench_fleet_ingest.py --agents 10 50 200 --samples 20
+
+For every fleet size a fresh SQLite database is migrated and
+``loadtest_ingest --flood`` sends ``--samples`` samples per agent (8 GPUs,
+4 disks, 4 fans, seed 0) through the in-process ingest view.  The samples
+are the same on every run, so results compare like with like across
+commits and machines.  Reports accepted samples/s, request latency
+percentiles, database bytes per sample and errors.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def _run_worker(args: argparse.Namespace) -> int:
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    from django.conf import settings
+
+    settings.DATABASES["default"]["NAME"] = args.db
+    import django
+
+    django.setup()
+    from django.core.management import call_command
+
+    call_command("migrate", verbosity=0)
+    call_command(
+        "loadtest_ingest",
+        agents=args.agents[0],
+        samples=args.samples,
+        duration=0,
+        flood=True,
+        batch=args.batch,
+        concurrency=args.concurrency,
+        seed=0,
+        json=True,
+    )
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--agents", type=int, nargs="+", default=[10, 50, 200], help="fleet sizes to run")
+    parser.add_argument("--samples", type=int, default=20, help="samples per agent")
+    parser.add_argument("--batch", type=int, default=1, help="samples per request")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--role", choices=("bench", "worker"), default="bench", help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.role == "worker":
+        return _run_worker(args)
+
+    print(f"samples/agent={args.samples} batch={args.batch} concurrency={args.concurrency}")
+    for agents in args.agents:
+        # One process per fleet size: a fresh database and no warm caches from the previous size.
+        with tempfile.TemporaryDirectory() as tmp:
+            output = subprocess.run(
+                [
+                    sys.executable, __file__, "--role", "worker", "--db", str(Path(tmp) / "bench.sqlite3"),
+                    "--agents", str(agents), "--samples", str(args.samples),
+                    "--batch", str(args.batch), "--concurrency", str(args.concurrency),
+                ],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        errors = {code: n for code, n in result["status"].items() if code != "200"}
+        print(
+            f"{agents:5d} agents {result['samples_per_sec']:8.1f} samples/s  "
+            f"p50 {result['p50_ms']:7.1f} ms  p95 {result['p95_ms']:7.1f} ms  p99 {result['p99_ms']:7.1f} ms  "
+            f"{result['db_bytes_per_sample'] or 0:6d} B/sample  errors {errors or 0}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
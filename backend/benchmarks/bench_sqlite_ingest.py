@@ -0,0 +1,251 @@
+"""Ingest throughput on SQLite: default settings vs the production profile.
+
+Run from ``backend/``::
+
+    python benchmarks/bench_sqlite_ingest.py --processes 3 --threads 2 --servers 24 --samples 40
+
+Mirrors the gunicorn deployment (``--workers 3 --threads 2``): every
+profile gets a fresh database, then ``--processes`` worker processes post
+single samples to the ingest view through Django's test client while one
+reader thread per process re-reads recent history of every server every
+``--read-interval`` seconds, like open dashboards.  Each thread owns a
+disjoint set of servers and sends their samples in time order.
+
+The ingest view is CPU-bound in Python, so on a machine with fewer cores
+than ``--processes`` both profiles converge; the difference shows in the
+latency tail and in ``503`` (database locked) answers.
+
+- ``default``: SQLite defaults (rollback journal, deferred transactions),
+  every request thread writes on its own connection
+- ``tuned``: ``MONITORING_SQLITE_TUNED=1`` (WAL and pragmas) plus the
+  single ingest writer thread per process
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+PROFILES = {
+    "default": {"MONITORING_SQLITE_TUNED": "0", "MONITORING_INGEST_SINGLE_WRITER": "0"},
+    "tuned": {"MONITORING_SQLITE_TUNED": "1", "MONITORING_INGEST_SINGLE_WRITER": "1"},
+}
+
+
+def _setup_django(db_path: str) -> None:
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    from django.conf import settings
+
+    settings.DATABASES["default"]["NAME"] = db_path
+    import django
+
+    django.setup()
+    logging.disable(logging.CRITICAL)
+
+
+def _token(index: int) -> str:
+    return f"bench-token-{index:04d}"
+
+
+def _sample(index: int, tick: int, start: datetime) -> dict:
+    return {
+        "collected_at": (start + timedelta(seconds=5 * tick)).isoformat(),
+        "seq": 1_000 + tick,
+        "cpu_usage_percent": 35.0 + (tick * 7 + index) % 50,
+        "memory_total_bytes": 512 * 2**30,
+        "memory_used_bytes": (200 + tick % 40) * 2**30,
+        "memory_percent": 40.0 + tick % 40,
+        "network_rx_bytes_total": tick * 625_000_000,
+        "network_tx_bytes_total": tick * 125_000_000,
+        "disks": [
+            {
+                "device": f"nvme{d}n1",
+                "read_bytes_total": tick * 2_000_000_000,
+                "write_bytes_total": tick * 500_000_000,
+                "read_count_total": tick * 15_000,
+                "write_count_total": tick * 4_000,
+                "busy_time_ms_total": tick * 1_500,
+            }
+            for d in range(4)
+        ],
+        "gpus": [
+            {
+                "gpu_index": g,
+                "name": "NVIDIA H100 80GB HBM3",
+                "utilization_gpu_percent": 80.0 + (tick + g) % 20,
+                "memory_total_bytes": 85_899_345_920,
+                "memory_used_bytes": 60_000_000_000,
+                "memory_percent": 69.8,
+                "power_w": 550.0,
+            }
+            for g in range(8)
+        ],
+    }
+
+
+def _run_setup(args: argparse.Namespace) -> int:
+    _setup_django(args.db)
+    from django.core.management import call_command
+
+    from monitoring.models import MonitoredServer
+
+    call_command("migrate", verbosity=0)
+    for index in range(args.servers):
+        server = MonitoredServer(slug=f"bench-{index:04d}", name=f"Bench {index}")
+        server.set_api_token(_token(index))
+        server.save()
+    return 0
+
+
+def _run_worker(args: argparse.Namespace) -> int:
+    _setup_django(args.db)
+    from django.db import connection
+    from django.test import Client
+
+    from monitoring.models import MetricSnapshot, MonitoredServer
+
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    lanes = args.processes * args.threads
+    latencies: list[float] = []
+    status_counts: dict[str, int] = {}
+    lock = threading.Lock()
+    done = threading.Event()
+    reads = [0]
+
+    def send(lane: int) -> None:
+        client = Client()
+        mine = [i for i in range(args.servers) if i % lanes == lane]
+        for tick in range(args.samples):
+            for index in mine:
+                body = json.dumps({"sample": _sample(index, tick, start)})
+                began = time.perf_counter()
+                response = client.post(
+                    f"/api/ingest/servers/bench-{index:04d}/metrics/",
+                    data=body,
+                    content_type="application/json",
+                    headers={"X-Monitoring-Token": _token(index)},
+                )
+                elapsed = (time.perf_counter() - began) * 1000.0
+                with lock:
+                    latencies.append(elapsed)
+                    key = str(response.status_code)
+                    status_counts[key] = status_counts.get(key, 0) + 1
+        connection.close()
+
+    def read() -> None:
+        server_ids = list(MonitoredServer.objects.values_list("id", flat=True))
+        while not done.wait(args.read_interval):
+            for server_id in server_ids:
+                list(MetricSnapshot.objects.filter(server_id=server_id).order_by("-collected_at")[:120])
+                reads[0] += 1
+        connection.close()
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    began = time.perf_counter()
+    senders = [
+        threading.Thread(target=send, args=(args.worker_index * args.threads + t,)) for t in range(args.threads)
+    ]
+    for thread in senders:
+        thread.start()
+    for thread in senders:
+        thread.join()
+    wall = time.perf_counter() - began
+    done.set()
+    reader.join()
+    print(json.dumps({"latencies": latencies, "status": status_counts, "wall": wall, "reads": reads[0]}))
+    return 0
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def _run_profile(name: str, args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = str(Path(tmp) / "bench.sqlite3")
+        env = {**os.environ, **PROFILES[name]}
+        base = [sys.executable, __file__, "--db", db] + [
+            f"--{key.replace('_', '-')}={getattr(args, key)}"
+            for key in ("processes", "threads", "servers", "samples", "read_interval")
+        ]
+        subprocess.run(base + ["--role", "setup"], env=env, check=True)
+        began = time.perf_counter()
+        workers = [
+            subprocess.Popen(
+                base + ["--role", "worker", f"--worker-index={k}"], env=env, stdout=subprocess.PIPE, text=True
+            )
+            for k in range(args.processes)
+        ]
+        results = [json.loads(worker.communicate()[0]) for worker in workers]
+        wall = time.perf_counter() - began
+
+    latencies = [ms for result in results for ms in result["latencies"]]
+    status: dict[str, int] = {}
+    for result in results:
+        for key, count in result["status"].items():
+            status[key] = status.get(key, 0) + count
+    accepted = status.get("200", 0)
+    return {
+        "profile": name,
+        "accepted": accepted,
+        "samples_per_sec": accepted / wall if wall else 0.0,
+        "p50_ms": _percentile(latencies, 50),
+        "p95_ms": _percentile(latencies, 95),
+        "p99_ms": _percentile(latencies, 99),
+        "status": status,
+        "reads": sum(result["reads"] for result in results),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=2)
+    parser.add_argument("--servers", type=int, default=24)
+    parser.add_argument("--samples", type=int, default=40, help="samples per server")
+    parser.add_argument("--read-interval", type=float, default=0.5, help="seconds between dashboard reads")
+    parser.add_argument("--profile", choices=sorted(PROFILES), action="append")
+    parser.add_argument("--role", choices=("bench", "setup", "worker"), default="bench", help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-index", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.role == "setup":
+        return _run_setup(args)
+    if args.role == "worker":
+        return _run_worker(args)
+
+    print(
+        f"processes={args.processes} threads={args.threads} servers={args.servers} "
+        f"samples/server={args.samples}"
+    )
+    rows = [_run_profile(name, args) for name in args.profile or ["default", "tuned"]]
+    for row in rows:
+        errors = {code: n for code, n in row["status"].items() if code != "200"}
+        print(
+            f"{row['profile']:8s} {row['samples_per_sec']:8.1f} samples/s  "
+            f"p50 {row['p50_ms']:7.1f} ms  p95 {row['p95_ms']:7.1f} ms  p99 {row['p99_ms']:7.1f} ms  "
+            f"reads {row['reads']:6d}  errors {errors or 0}"
+        )
+    if len(rows) == 2 and rows[0]["samples_per_sec"]:
+        print(f"throughput x{rows[1]['samples_per_sec'] / rows[0]['samples_per_sec']:.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
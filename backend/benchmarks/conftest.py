@@ -0,0 +1,152 @@
+"""Fixtures for the hot-path benchmark suite (``test_hot_paths.py``).
+
+The suite runs against its own SQLite database in a temporary directory,
+seeded once per session from the synthetic fleet (``services.synthetic``)
+with a fixed seed, so every run measures the same rows and payloads.
+
+``--baseline`` compares each benchmark's median against a pytest-benchmark
+JSON file (``benchmarks/baseline.json`` by default) and prints the change;
+``--baseline-fail PCT`` also fails the run when any median is more than
+PCT percent slower.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sys
+import tempfile
+import warnings
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+SEED = 0
+SEED_SERVERS = 3
+SEED_HOURS = 25
+SEED_INTERVAL_SECONDS = 10.0
+BENCH_EMAIL = "bench@example.com"
+
+_tmp = tempfile.TemporaryDirectory(prefix="monitoring-bench-")
+_medians: dict[str, float] = {}
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("baseline")
+    group.addoption("--baseline", default=str(BASELINE), help="pytest-benchmark JSON to compare medians against")
+    group.addoption(
+        "--baseline-fail",
+        type=float,
+        default=0.0,
+        metavar="PCT",
+        help="fail when a median is more than PCT percent slower than the baseline (default: report only)",
+    )
+
+
+def pytest_configure(config):
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    os.environ["MONITORING_INGEST_SINGLE_WRITER"] = "0"
+    from django.conf import settings
+
+    settings.DATABASES["default"]["NAME"] = str(Path(_tmp.name) / "bench.sqlite3")
+    settings.DEBUG = False
+    settings.GOOGLE_ALLOWED_EMAILS = {BENCH_EMAIL}
+    import django
+
+    django.setup()
+    logging.disable(logging.CRITICAL)
+    # whitenoise warns about the missing collectstatic output on every request.
+    warnings.filterwarnings("ignore", message="No directory at")
+
+
+@pytest.fixture(scope="session")
+def seeded_servers():
+    """``SEED_SERVERS`` servers with ``SEED_HOURS`` of history each, ending now."""
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.utils import timezone
+
+    from monitoring.auth import _cached_allowlists
+    from monitoring.models import MonitoredServer
+    from monitoring.services.bulk_import import BulkImporter
+    from monitoring.services.synthetic import synthetic_fleet
+
+    call_command("migrate", verbosity=0)
+    _cached_allowlists.cache_clear()
+    get_user_model().objects.create_user("bench", BENCH_EMAIL, "bench")
+
+    # Timestamps follow the clock (history windows are relative to now); the values do not.
+    start = timezone.now().replace(microsecond=0) - timedelta(hours=SEED_HOURS)
+    count = int(SEED_HOURS * 3600 / SEED_INTERVAL_SECONDS)
+    servers = []
+    for agent in synthetic_fleet(SEED_SERVERS, prefix="bench", seed=SEED, interval=SEED_INTERVAL_SECONDS, start=start):
+        server = MonitoredServer.objects.create(slug=agent.slug, name=agent.slug)
+        importer = BulkImporter(server)
+        for _ in range(count):
+            importer.add(agent.sample())
+        importer.finish()
+        servers.append(server)
+    return servers
+
+
+@pytest.fixture
+def api_client(seeded_servers):
+    from django.contrib.auth import get_user_model
+    from django.test import Client
+
+    client = Client()
+    client.force_login(get_user_model().objects.get(email=BENCH_EMAIL))
+    return client
+
+
+@pytest.fixture(autouse=True)
+def _record_median(request):
+    yield
+    benchmark = request.node.funcargs.get("benchmark")
+    stats = getattr(getattr(benchmark, "stats", None), "stats", None)
+    if stats is not None:
+        _medians[request.node.name] = stats.median
+
+
+def pytest_sessionfinish(session, exitstatus):
+    path = Path(session.config.getoption("--baseline"))
+    if not _medians or not path.exists():
+        return
+    baseline = {entry["name"]: entry["stats"]["median"] for entry in json.loads(path.read_text())["benchmarks"]}
+    limit = session.config.getoption("--baseline-fail")
+    rows = []
+    for name, median in sorted(_medians.items()):
+        before = baseline.get(name)
+        change = None if before is None else (median / before - 1.0) * 100.0
+        rows.append((name, median, before, change, bool(limit and change is not None and change > limit)))
+    session.config._baseline_rows = (path.name, limit, rows)
+    if any(row[4] for row in rows) and exitstatus == 0:
+        session.exitstatus = 1
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    if not hasattr(config, "_baseline_rows"):
+        return
+    name, limit, rows = config._baseline_rows
+    terminalreporter.section(f"median vs {name}")
+    for test, median, before, change, slower in rows:
+        if before is None:
+            terminalreporter.write_line(f"{test:50s} {median * 1000:10.3f} ms  (not in baseline)")
+        else:
+            terminalreporter.write_line(
+                f"{test:50s} {median * 1000:10.3f} ms  was {before * 1000:10.3f} ms  {change:+7.1f}%", red=slower
+            )
+    slower = [row[0] for row in rows if row[4]]
+    if slower:
+        terminalreporter.write_line(f"slower than baseline by more than {limit:g}%: {', '.join(slower)}", red=True)
+
+
+def pytest_benchmark_update_json(config, benchmarks, output_json):
+    # Keep the committed baseline small: summary statistics only, not every round's timing.
+    for entry in output_json["benchmarks"]:
+        entry["stats"].pop("data", None)
@@ -0,0 +1,87 @@
+"""Benchmarks of the ingest and dashboard hot paths (pytest-benchmark).
+
+Run from ``backend/`` (needs ``pip install pytest pytest-benchmark``)::
+
+    python -m pytest benchmarks                       # compare with benchmarks/baseline.json
+    python -m pytest benchmarks --baseline-fail 25    # fail on a >25% slower median
+    python -m pytest benchmarks --benchmark-json=benchmarks/baseline.json   # refresh the baseline
+
+Baseline numbers are only comparable on the machine that recorded them.
+"""
+from __future__ import annotations
+
+from datetime import timedelta
+
+import pytest
+
+from monitoring.models import MetricSnapshot, MonitoredServer
+from monitoring.services.collector import _classify_bottleneck, normalize_raw_metrics, store_raw_metrics_for_server
+from monitoring.services.synthetic import SyntheticAgent
+from monitoring.views import _serialize_snapshot
+
+
+def _samples(count: int, *, seed: int = 1) -> list[dict]:
+    agent = SyntheticAgent("bench-sample", seed=seed)
+    return [agent.sample() for _ in range(count)]
+
+
+def test_normalize_raw_metrics(benchmark):
+    sample = _samples(1)[0]
+    result = benchmark(normalize_raw_metrics, sample)
+    assert len(result["gpus"]) == 8
+
+
+def test_classify_bottleneck(benchmark):
+    # One call per workload phase mix: 100 samples cover training, loading, preprocessing and idle.
+    inputs = []
+    for sample in _samples(100):
+        raw = normalize_raw_metrics(sample)
+        inputs.append(
+            {
+                "cpu_usage_percent": raw["cpu_usage_percent"],
+                "cpu_iowait_percent": raw["cpu_iowait_percent"],
+                "memory_percent": raw["memory_percent"],
+                "swap_percent": raw["swap_percent"],
+                "gpu_max_util_percent": max(gpu["utilization_gpu_percent"] for gpu in raw["gpus"]),
+                "disk_util_percent": max(disk["rates"]["util_percent"] for disk in raw["disks"]),
+                "disk_read_bps": sum(disk["rates"]["read_bps"] for disk in raw["disks"]),
+                "disk_write_bps": sum(disk["rates"]["write_bps"] for disk in raw["disks"]),
+                "summaries": raw["summaries"],
+            }
+        )
+
+    def classify_all():
+        return [_classify_bottleneck(**kwargs) for kwargs in inputs]
+
+    labels = {label for label, _, _ in benchmark(classify_all)}
+    assert len(labels) > 1
+
+
+def test_store_raw_metrics_for_server(benchmark, seeded_servers):
+    server = MonitoredServer.objects.create(slug="bench-store", name="bench-store")
+    agent = SyntheticAgent(server.slug, seed=2, start=seeded_servers[0].last_seen_at - timedelta(hours=1))
+
+    def next_sample():
+        return (server, agent.sample()), {}
+
+    benchmark.pedantic(store_raw_metrics_for_server, setup=next_sample, rounds=200, warmup_rounds=5)
+    assert MetricSnapshot.objects.filter(server=server).count() == 205
+
+
+def test_serialize_snapshot(benchmark, seeded_servers):
+    # A freshly loaded snapshot per round, as /api/metrics/latest/ has: device reads are part of the cost.
+    latest = MetricSnapshot.objects.filter(server=seeded_servers[0]).order_by("-collected_at").select_related("server")
+
+    def fresh_snapshot():
+        return (latest.first(),), {}
+
+    result = benchmark.pedantic(_serialize_snapshot, setup=fresh_snapshot, rounds=200, warmup_rounds=5)
+    assert len(result["gpu"]["devices"]) == 8
+
+
+@pytest.mark.parametrize("minutes", [60, 360, 1440])
+def test_api_metrics_history(benchmark, api_client, seeded_servers, minutes):
+    url = f"/api/metrics/history/?server={seeded_servers[0].slug}&minutes={minutes}"
+    response = benchmark(api_client.get, url)
+    assert response.status_code == 200
+    assert response.json()["point_count"] > 0
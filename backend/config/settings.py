@@ -55,6 +55,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'monitoring.middleware.TelemetryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -96,6 +97,26 @@ DATABASES = {
     }
 }
 
+# SQLite production profile (on by default; MONITORING_SQLITE_TUNED=0 restores SQLite's defaults).
+# WAL lets dashboard reads proceed while ingest writes; synchronous=NORMAL is durable
+# in WAL mode up to the last checkpoint.  Transactions stay DEFERRED: ingest takes the
+# write lock up front itself (monitoring/services/ingest_lock.py), so sessions, logins
+# and other short writes do not queue behind it for the write lock at BEGIN.
+MONITORING_SQLITE_TUNED = _env_flag("MONITORING_SQLITE_TUNED", default=True)
+MONITORING_SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("MONITORING_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+if MONITORING_SQLITE_TUNED:
+    DATABASES['default']['OPTIONS'] = {
+        'timeout': MONITORING_SQLITE_BUSY_TIMEOUT_MS / 1000.0,
+        'init_command': (
+            'PRAGMA journal_mode=WAL;'
+            'PRAGMA synchronous=NORMAL;'
+            f'PRAGMA busy_timeout={MONITORING_SQLITE_BUSY_TIMEOUT_MS};'
+            'PRAGMA cache_size=-65536;'  # 64 MiB page cache per connection
+            'PRAGMA mmap_size=268435456;'  # 256 MiB memory-mapped reads
+            'PRAGMA temp_store=MEMORY;'
+        ),
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -213,6 +234,30 @@ MONITORING_DISKS = _csv_list(os.environ.get('MONITORING_DISKS', ''))
 MONITORING_DEFAULT_HISTORY_MINUTES = int(os.environ.get('MONITORING_DEFAULT_HISTORY_MINUTES', '60'))
 MONITORING_MAX_HISTORY_MINUTES = int(os.environ.get('MONITORING_MAX_HISTORY_MINUTES', '1440'))
 MONITORING_RETENTION_DAYS = int(os.environ.get('MONITORING_RETENTION_DAYS', '14'))
+# Largest number of queued samples an agent may send in a single ingest request.
+MONITORING_INGEST_MAX_BATCH = int(os.environ.get('MONITORING_INGEST_MAX_BATCH', '100'))
+# Send interval suggested to agents in ingest responses (0 = keep each agent's configured interval).
+MONITORING_AGENT_INTERVAL_SECONDS = float(os.environ.get('MONITORING_AGENT_INTERVAL_SECONDS', '0'))
+# Back-pressure: above this p95 ingest latency agents are told to send less often, up to MAX_SLOWDOWN times.
+MONITORING_INGEST_TARGET_P95_MS = float(os.environ.get('MONITORING_INGEST_TARGET_P95_MS', '250'))
+MONITORING_INGEST_MAX_SLOWDOWN = int(os.environ.get('MONITORING_INGEST_MAX_SLOWDOWN', '8'))
+# Where per-device GPU/disk/fan readings live: "rows" (one table row per device) or "packed"
+# (one compact column on the snapshot). Reads handle both; `manage.py pack_devices` converts old rows.
+MONITORING_DEVICE_STORAGE = os.environ.get('MONITORING_DEVICE_STORAGE', 'rows').strip().lower()
+# `manage.py compact_metrics`: closed windows of this length, older than COMPACT_AFTER_HOURS, become compressed chunks.
+MONITORING_CHUNK_WINDOW_MINUTES = int(os.environ.get('MONITORING_CHUNK_WINDOW_MINUTES', '60'))
+MONITORING_COMPACT_AFTER_HOURS = float(os.environ.get('MONITORING_COMPACT_AFTER_HOURS', '24'))
+# `manage.py archive_metrics` writes days older than the retention window here as columnar files (needs numpy).
+# Empty disables the archive; when set, retention never drops a day that has not been archived.
+MONITORING_ARCHIVE_DIR = os.environ.get('MONITORING_ARCHIVE_DIR', '').strip()
+# Run every ingest write on one writer thread per worker process (see monitoring/services/writer.py).
+MONITORING_INGEST_SINGLE_WRITER = _env_flag('MONITORING_INGEST_SINGLE_WRITER', default=True)
+# Per-phase ingest timers, request latency and query counts, served at /metrics in Prometheus format.
+MONITORING_TELEMETRY = _env_flag('MONITORING_TELEMETRY', default=True)
+# Bearer token for /metrics and /metrics/fleet; empty turns both endpoints off (404).
+MONITORING_METRICS_TOKEN = os.environ.get('MONITORING_METRICS_TOKEN', '').strip()
+# How long a worker serves fleet-wide latest state from memory before re-reading the servers table.
+MONITORING_LATEST_STATE_TTL_SECONDS = float(os.environ.get('MONITORING_LATEST_STATE_TTL_SECONDS', '2'))
 
 # ── Security hardening (production defaults) ───────────────────────────────
 SESSION_COOKIE_SECURE = _env_flag("DJANGO_SESSION_COOKIE_SECURE", IS_PRODUCTION)
@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class MonitoringConfig(AppConfig):
     name = 'monitoring'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from monitoring.services.telemetry import install_query_counter
+
+        connection_created.connect(install_query_counter, dispatch_uid="monitoring-query-counter")
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from monitoring.models import MonitoredServer
+from monitoring.services.archive import archive_before, archive_enabled, archive_horizon
+from monitoring.services.partitions import drop_partitions, partition_day_for
+
+
+class Command(BaseCommand):
+    help = (
+        "Write days older than the retention window to the columnar archive (MONITORING_ARCHIVE_DIR), "
+        "optionally dropping them from the database afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=None,
+            help=f"Archive days older than this (default: MONITORING_RETENTION_DAYS={settings.MONITORING_RETENTION_DAYS})",
+        )
+        parser.add_argument("--server", default="", help="Only this server slug (default: all servers)")
+        parser.add_argument("--prune", action="store_true", help="Drop the archived days from the database")
+
+    def handle(self, *args, **options):
+        if not settings.MONITORING_ARCHIVE_DIR:
+            raise CommandError("MONITORING_ARCHIVE_DIR is not set")
+        if not archive_enabled():
+            raise CommandError("The archive needs numpy: pip install numpy")
+
+        server = None
+        if options["server"]:
+            server = MonitoredServer.objects.filter(slug=options["server"]).first()
+            if server is None:
+                raise CommandError(f"Unknown server: {options['server']}")
+
+        days = settings.MONITORING_RETENTION_DAYS if options["retention_days"] is None else options["retention_days"]
+        if days <= 0:
+            raise CommandError("Retention is disabled; pass --retention-days")
+        before = partition_day_for(timezone.now() - timedelta(days=days))
+
+        archived = archive_before(before, server=server)
+        for current, day, samples in archived:
+            self.stdout.write(f"{current.slug}  {day}  {samples:>8} samples")
+        total = sum(samples for _, _, samples in archived)
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} samples in {len(archived)} server-days before {before}."))
+
+        if options["prune"]:
+            dropped = 0
+            for current in [server] if server is not None else MonitoredServer.objects.order_by("id"):
+                dropped += drop_partitions(archive_horizon(current, before), server=current)
+            self.stdout.write(self.style.SUCCESS(f"Dropped {dropped} archived snapshots from the database."))
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from monitoring.models import MetricSnapshot, MonitoredServer
+from monitoring.services.chunks import compact_server, window_start
+
+
+class Command(BaseCommand):
+    help = (
+        "Compress closed per-server windows of raw snapshots into Gorilla-encoded chunks. "
+        "History reads decode chunks transparently."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--window-minutes",
+            type=int,
+            default=settings.MONITORING_CHUNK_WINDOW_MINUTES,
+            help=f"Chunk length (default: {settings.MONITORING_CHUNK_WINDOW_MINUTES})",
+        )
+        parser.add_argument(
+            "--older-than-hours",
+            type=float,
+            default=settings.MONITORING_COMPACT_AFTER_HOURS,
+            help=f"Only windows that ended this long ago (default: {settings.MONITORING_COMPACT_AFTER_HOURS:g})",
+        )
+        parser.add_argument("--server", default="", help="Only this server slug (default: all servers)")
+        parser.add_argument("--dry-run", action="store_true", help="Only count snapshots that would be compacted")
+
+    def handle(self, *args, **options):
+        if options["window_minutes"] <= 0 or 24 * 60 % options["window_minutes"]:
+            raise CommandError("--window-minutes must divide a day (e.g. 15, 60, 240)")
+        window = timedelta(minutes=options["window_minutes"])
+        horizon = window_start(timezone.now() - timedelta(hours=max(0.0, options["older_than_hours"])), window)
+
+        servers = MonitoredServer.objects.order_by("id")
+        if options["server"]:
+            servers = servers.filter(slug=options["server"])
+            if not servers.exists():
+                raise CommandError(f"Unknown server: {options['server']}")
+
+        if options["dry_run"]:
+            count = MetricSnapshot.objects.filter(server__in=servers, collected_at__lt=horizon).count()
+            self.stdout.write(f"Would compact {count} snapshots collected before {horizon.isoformat()}.")
+            return
+
+        total_chunks = total_samples = 0
+        for server in servers:
+            chunks = compact_server(server, horizon, window)
+            samples = sum(chunk.sample_count for chunk in chunks)
+            if chunks:
+                self.stdout.write(f"{server.slug}: {len(chunks)} chunks, {samples} samples")
+            total_chunks += len(chunks)
+            total_samples += samples
+        self.stdout.write(
+            self.style.SUCCESS(f"Compacted {total_samples} samples into {total_chunks} chunks (before {horizon.isoformat()}).")
+        )
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import sys
+from datetime import timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from monitoring.models import MonitoredServer
+from monitoring.services.export import DEFAULT_CHUNK_SIZE, EXPORT_FORMATS, EXPORT_TABLES, stream_export
+
+
+def _moment(value: str, option: str):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise CommandError(f"{option} must be an ISO 8601 timestamp")
+    return parsed if not timezone.is_naive(parsed) else parsed.replace(tzinfo=dt_timezone.utc)
+
+
+class Command(BaseCommand):
+    help = "Stream stored snapshots or per-device rows for a time range as NDJSON or CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--server", default="", help="Only this server slug (default: all active servers)")
+        parser.add_argument("--since", default="", help="ISO 8601 start (default: --days before --until)")
+        parser.add_argument("--until", default="", help="ISO 8601 end, exclusive (default: now)")
+        parser.add_argument("--days", type=float, default=1.0, help="Range length when --since is omitted (default: 1)")
+        parser.add_argument("--table", choices=EXPORT_TABLES, default="snapshots")
+        parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+        parser.add_argument("--output", default="-", help="File to write (default: stdout)")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows fetched per query round trip")
+
+    def handle(self, *args, **options):
+        until = _moment(options["until"], "--until") if options["until"] else timezone.now()
+        since = _moment(options["since"], "--since") if options["since"] else until - timedelta(days=options["days"])
+        if since >= until:
+            raise CommandError("--since must be before --until")
+
+        servers = MonitoredServer.objects.filter(is_active=True).order_by("slug")
+        if options["server"]:
+            servers = MonitoredServer.objects.filter(slug=options["server"])
+            if not servers.exists():
+                raise CommandError(f"Unknown server: {options['server']}")
+
+        blocks = stream_export(
+            servers.iterator(),
+            since,
+            until,
+            table=options["table"],
+            fmt=options["format"],
+            chunk_size=max(1, options["chunk_size"]),
+        )
+        if options["output"] == "-":
+            for block in blocks:
+                sys.stdout.write(block)
+            return
+        with open(options["output"], "w", encoding="utf-8", newline="") as handle:
+            for block in blocks:
+                handle.write(block)
+        self.stderr.write(f"Wrote {options['output']}")
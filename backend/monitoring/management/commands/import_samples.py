@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import sys
+import time
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.models import MetricSnapshot, MonitoredServer
+from monitoring.services.bulk_import import BulkImporter, deferred_indexes, iter_samples, replay_samples
+
+
+class Command(BaseCommand):
+    help = (
+        "Load recorded samples (NDJSON of collect_raw_metrics() outputs or ingest payloads) with bulk inserts, "
+        "or replay them against a running webapp's ingest endpoint at N times recorded speed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="NDJSON file, or - for stdin")
+        parser.add_argument("--server", default="", help="Server slug for lines without a \"server\" field")
+        parser.add_argument("--create-servers", action="store_true", help="Create servers that do not exist yet")
+        parser.add_argument("--batch-size", type=int, default=2000, help="Snapshots per bulk insert (default: 2000)")
+        parser.add_argument(
+            "--defer-indexes",
+            action="store_true",
+            help=(
+                "Drop secondary indexes for the load and rebuild them at the end; only into a database without "
+                "snapshots that the webapp is not serving from"
+            ),
+        )
+        parser.add_argument("--replay", default="", metavar="URL", help="Post samples to this webapp instead of importing")
+        parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier; 0 = as fast as possible")
+        parser.add_argument(
+            "--token",
+            action="append",
+            default=[],
+            help="Ingest token for replay: TOKEN (all servers) or SLUG=TOKEN; repeatable",
+        )
+        parser.add_argument("--keep-timestamps", action="store_true", help="Replay with the recorded collected_at")
+
+    def handle(self, *args, **options):
+        handle = sys.stdin if options["path"] == "-" else open(options["path"], encoding="utf-8")
+        try:
+            samples = ((slug or options["server"], sample) for slug, sample in iter_samples(handle))
+            if options["replay"]:
+                self._replay(samples, options)
+            else:
+                self._import(samples, options)
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+
+    def _server(self, slug: str, create: bool) -> MonitoredServer:
+        if not slug:
+            raise CommandError("Sample without a server: pass --server or add a \"server\" field")
+        server = MonitoredServer.objects.filter(slug=slug).first()
+        if server is None:
+            if not create:
+                raise CommandError(f"Unknown server: {slug} (pass --create-servers)")
+            server = MonitoredServer.objects.create(slug=slug, name=slug)
+        return server
+
+    def _import(self, samples, options) -> None:
+        defer = options["defer_indexes"]
+        if defer and MetricSnapshot.objects.exists():
+            raise CommandError("--defer-indexes needs a database without snapshots; import without it")
+        importers: dict[str, BulkImporter] = {}
+        started = time.perf_counter()
+        with deferred_indexes() if defer else nullcontext():
+            for slug, sample in samples:
+                importer = importers.get(slug)
+                if importer is None:
+                    importer = importers[slug] = BulkImporter(
+                        self._server(slug, options["create_servers"]), batch_size=options["batch_size"]
+                    )
+                importer.add(sample)
+            for importer in importers.values():
+                importer.finish()
+            loaded = time.perf_counter() - started
+            if defer:
+                self.stdout.write("Rebuilding indexes...")
+        elapsed = time.perf_counter() - started
+
+        for slug, importer in importers.items():
+            self.stdout.write(f"{slug}: {importer.imported} imported, {importer.skipped} skipped")
+        imported = sum(importer.imported for importer in importers.values())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {imported} samples in {elapsed:.1f} s "
+                f"({imported / loaded if loaded else 0:,.0f} samples/s before index rebuild)."
+            )
+        )
+
+    def _replay(self, samples, options) -> None:
+        tokens: dict[str, str] = {}
+        default_token = ""
+        for entry in options["token"]:
+            slug, sep, token = entry.partition("=")
+            if sep:
+                tokens[slug] = token
+            else:
+                default_token = entry
+
+        def routed():
+            for slug, sample in samples:
+                if not slug:
+                    raise CommandError("Sample without a server: pass --server or add a \"server\" field")
+                if not tokens.setdefault(slug, default_token):
+                    raise CommandError(f"No ingest token for {slug} (pass --token)")
+                yield slug, sample
+
+        result = replay_samples(
+            routed(),
+            base_url=options["replay"],
+            tokens=tokens,
+            speed=max(0.0, options["speed"]),
+            shift_to_now=not options["keep_timestamps"],
+        )
+        errors = {code: n for code, n in result["status"].items() if code != "200"}
+        self.stdout.write(
+            f"Sent {result['sent']} samples in {result['elapsed_seconds']:.1f} s "
+            f"({result['samples_per_sec']:.1f} samples/s), max lag {result['max_lag_seconds']:.2f} s"
+        )
+        if errors:
+            self.stdout.write(self.style.WARNING(f"Errors: {errors}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("All samples accepted."))
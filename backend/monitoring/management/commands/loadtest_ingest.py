@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import json
+import logging
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from monitoring.models import MonitoredServer
+from monitoring.services.synthetic import register_fleet, run_load_test, synthetic_fleet
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate N agents posting synthetic GPU/disk/fan samples to the ingest endpoint (in-process or over HTTP) "
+        "and report throughput, latency percentiles, database growth and errors. Run against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--agents", type=int, default=50, help="Virtual agents / servers (default: 50)")
+        parser.add_argument("--duration", type=float, default=60.0, help="Seconds to run (default: 60; 0 = no limit)")
+        parser.add_argument("--samples", type=int, default=0, help="Stop each agent after this many samples")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between an agent's samples")
+        parser.add_argument("--batch", type=int, default=1, help="Samples per request (default: 1)")
+        parser.add_argument(
+            "--flood",
+            action="store_true",
+            help="Send back to back instead of every --interval seconds (measures maximum throughput)",
+        )
+        parser.add_argument("--concurrency", type=int, default=16, help="Concurrent senders (default: 16)")
+        parser.add_argument("--url", default="", help="Post to a running webapp at this base URL (default: in-process)")
+        parser.add_argument("--gpus", type=int, default=8)
+        parser.add_argument("--disks", type=int, default=4)
+        parser.add_argument("--fans", type=int, default=4)
+        parser.add_argument("--seed", type=int, default=0, help="Same seed, same samples (default: 0)")
+        parser.add_argument("--prefix", default="loadtest", help="Server slug prefix (default: loadtest)")
+        parser.add_argument("--cleanup", action="store_true", help="Delete the load-test servers and their data afterwards")
+        parser.add_argument("--json", action="store_true", help="Print the result as one JSON object")
+
+    def handle(self, *args, **options):
+        if options["agents"] <= 0:
+            raise CommandError("--agents must be positive")
+        if options["interval"] <= 0:
+            raise CommandError("--interval must be positive")
+        if options["duration"] <= 0 and options["samples"] <= 0:
+            raise CommandError("Pass --duration or --samples")
+        if options["batch"] < 1:
+            raise CommandError("--batch must be at least 1")
+
+        interval = options["interval"]
+        agents = synthetic_fleet(
+            options["agents"],
+            prefix=options["prefix"],
+            seed=options["seed"],
+            gpus=options["gpus"],
+            disks=options["disks"],
+            fans=options["fans"],
+            interval=interval,
+            # The first sample is collected about now.
+            start=timezone.now() - timedelta(seconds=interval),
+        )
+        tokens = register_fleet(agents)
+        # Per-request ingest logging would dominate the run (and the output).
+        logging.disable(logging.INFO)
+        try:
+            result = run_load_test(
+                agents,
+                tokens,
+                duration=options["duration"],
+                samples_per_agent=options["samples"],
+                concurrency=options["concurrency"],
+                batch=options["batch"],
+                paced=not options["flood"],
+                base_url=options["url"],
+            )
+        finally:
+            logging.disable(logging.NOTSET)
+            if options["cleanup"]:
+                MonitoredServer.objects.filter(slug__in=list(tokens)).delete()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(result))
+            return
+        self._report(result)
+
+    def _report(self, result) -> None:
+        mode = "flood" if not result["paced"] else "paced"
+        self.stdout.write(
+            f"{result['agents']} agents, {mode}, batch {result['batch']}, concurrency {result['concurrency']}, "
+            f"{result['transport']}"
+        )
+        self.stdout.write(
+            f"{result['samples_accepted']} of {result['samples_sent']} samples accepted in "
+            f"{result['elapsed_seconds']:.1f} s: {result['samples_per_sec']:.1f} samples/s"
+        )
+        self.stdout.write(
+            f"latency per request: p50 {result['p50_ms']:.1f} ms  p95 {result['p95_ms']:.1f} ms  "
+            f"p99 {result['p99_ms']:.1f} ms  max {result['max_ms']:.1f} ms"
+        )
+        if result["paced"]:
+            self.stdout.write(f"max send lag behind schedule: {result['max_lag_seconds']:.2f} s")
+        if result["db_growth_bytes"] is not None:
+            per_sample = result["db_bytes_per_sample"]
+            self.stdout.write(
+                f"database grew {result['db_growth_bytes'] / 1e6:.2f} MB for {result['snapshots_stored']} snapshots"
+                + (f" ({per_sample} B/sample)" if per_sample is not None else "")
+            )
+        errors = {code: n for code, n in result["status"].items() if code != "200"}
+        if errors:
+            self.stdout.write(self.style.WARNING(f"errors: {errors} (error rate {result['error_rate']:.2%})"))
+        else:
+            self.stdout.write(self.style.SUCCESS("no errors"))
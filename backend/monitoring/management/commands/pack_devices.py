@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from monitoring.models import DiskMetric, FanMetric, GpuMetric, MetricSnapshot, MonitoredServer
+from monitoring.services.devices import load_devices, pack_devices, snapshot_devices
+
+
+class Command(BaseCommand):
+    help = (
+        "Move per-device GPU/disk/fan rows of existing snapshots into the packed devices column. "
+        "Use after setting MONITORING_DEVICE_STORAGE=packed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--server", default="", help="Only this server slug (default: all servers)")
+        parser.add_argument("--batch-size", type=int, default=500, help="Snapshots per transaction (default: 500)")
+        parser.add_argument("--dry-run", action="store_true", help="Only count snapshots still stored as rows")
+
+    def handle(self, *args, **options):
+        queryset = MetricSnapshot.objects.exclude(devices__has_key="v")
+        if options["server"]:
+            server = MonitoredServer.objects.filter(slug=options["server"]).first()
+            if server is None:
+                raise CommandError(f"Unknown server: {options['server']}")
+            queryset = queryset.filter(server=server)
+
+        ids = list(queryset.order_by("id").values_list("id", flat=True))
+        if options["dry_run"]:
+            self.stdout.write(f"{len(ids)} snapshots stored as rows.")
+            return
+
+        batch_size = max(1, options["batch_size"])
+        packed = 0
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start : start + batch_size]
+            with transaction.atomic():
+                snapshots = load_devices(list(MetricSnapshot.objects.filter(id__in=chunk)))
+                for snapshot in snapshots:
+                    devices = snapshot_devices(snapshot)
+                    snapshot.devices = pack_devices(devices["gpus"], devices["disks"], devices["fans"])
+                MetricSnapshot.objects.bulk_update(snapshots, ["devices"])
+                for model in (GpuMetric, DiskMetric, FanMetric):
+                    model.objects.filter(snapshot_id__in=chunk).delete()
+            packed += len(snapshots)
+            self.stdout.write(f"Packed {packed}/{len(ids)} snapshots")
+
+        self.stdout.write(self.style.SUCCESS(f"Packed {packed} snapshots."))
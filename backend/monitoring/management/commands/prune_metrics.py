@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from monitoring.models import MonitoredServer
+from monitoring.services.archive import archive_enabled, archive_horizon
+from monitoring.services.partitions import drop_partitions, list_partitions, partition_day_for
+
+
+class Command(BaseCommand):
+    help = "List day partitions of stored metrics and drop those older than the retention window."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=None,
+            help=f"Keep this many days (default: MONITORING_RETENTION_DAYS={settings.MONITORING_RETENTION_DAYS})",
+        )
+        parser.add_argument("--server", default="", help="Only this server slug (default: all servers)")
+        parser.add_argument("--list", action="store_true", help="Only list partitions and their snapshot counts")
+        parser.add_argument("--dry-run", action="store_true", help="Show what would be dropped")
+
+    def handle(self, *args, **options):
+        server = None
+        if options["server"]:
+            server = MonitoredServer.objects.filter(slug=options["server"]).first()
+            if server is None:
+                raise CommandError(f"Unknown server: {options['server']}")
+
+        days = settings.MONITORING_RETENTION_DAYS if options["retention_days"] is None else options["retention_days"]
+        before = partition_day_for(timezone.now() - timedelta(days=days)) if days and days > 0 else None
+
+        partitions = list_partitions(server)
+        for part in partitions:
+            expired = before is not None and part["partition_day"] is not None and part["partition_day"] < before
+            marker = " (expired)" if expired else ""
+            self.stdout.write(f"{part['partition_day']}  {part['snapshots']:>8} snapshots{marker}")
+
+        if options["list"]:
+            return
+        if before is None:
+            self.stdout.write(self.style.WARNING("Retention disabled; nothing to drop."))
+            return
+        expired_count = sum(
+            part["snapshots"]
+            for part in partitions
+            if part["partition_day"] is not None and part["partition_day"] < before
+        )
+        if options["dry_run"]:
+            self.stdout.write(f"Would drop {expired_count} snapshots collected before {before}.")
+            return
+        if not archive_enabled():
+            dropped = drop_partitions(before, server=server)
+            self.stdout.write(self.style.SUCCESS(f"Dropped {dropped} snapshots collected before {before}."))
+            return
+        dropped = 0
+        for current in [server] if server is not None else MonitoredServer.objects.order_by("id"):
+            horizon = archive_horizon(current, before)
+            if horizon < before:
+                self.stdout.write(
+                    self.style.WARNING(f"{current.slug}: keeping {horizon} and later, not archived yet (run archive_metrics)")
+                )
+            dropped += drop_partitions(horizon, server=current)
+        self.stdout.write(self.style.SUCCESS(f"Dropped {dropped} archived snapshots collected before {before}."))
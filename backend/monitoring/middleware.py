@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import time
+
+from monitoring.services.telemetry import (
+    http_request_queries,
+    http_request_seconds,
+    http_responses,
+    telemetry_enabled,
+    thread_query_count,
+)
+
+
+class TelemetryMiddleware:
+    """Time every request and count its queries, labelled by the resolved view name.
+
+    Unresolved paths (404s, the SPA catch-all aside) share the ``unmatched``
+    label so arbitrary URLs cannot grow the label set.  Ingest writes made
+    on the single writer thread are not counted here; their time shows in
+    the ingest phase histogram instead.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not telemetry_enabled():
+            return self.get_response(request)
+        queries = thread_query_count()
+        started = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        match = getattr(request, "resolver_match", None)
+        view = (match.view_name if match else "") or "unmatched"
+        http_request_seconds.observe(elapsed, view=view, method=request.method)
+        http_request_queries.observe(thread_query_count() - queries, view=view)
+        http_responses.inc(view=view, status=str(response.status_code))
+        return response
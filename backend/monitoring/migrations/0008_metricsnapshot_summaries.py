@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitoring", "0007_monitoredserver_agent_user"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="metricsnapshot",
+            name="summaries",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitoring", "0008_metricsnapshot_summaries"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="monitoredserver",
+            name="delta_base",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
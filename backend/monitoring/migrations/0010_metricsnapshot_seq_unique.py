@@ -0,0 +1,47 @@
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicate_snapshots(apps, schema_editor):
+    """Keep the first snapshot of every (server, collected_at) pair so the constraint can be added."""
+    MetricSnapshot = apps.get_model("monitoring", "MetricSnapshot")
+    duplicates = (
+        MetricSnapshot.objects.exclude(server=None)
+        .values("server_id", "collected_at")
+        .annotate(rows=Count("id"), keep_id=Min("id"))
+        .filter(rows__gt=1)
+    )
+    for group in duplicates.iterator():
+        MetricSnapshot.objects.filter(
+            server_id=group["server_id"], collected_at=group["collected_at"]
+        ).exclude(id=group["keep_id"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitoring", "0009_monitoredserver_delta_base"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="metricsnapshot",
+            name="seq",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(delete_duplicate_snapshots, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="metricsnapshot",
+            constraint=models.UniqueConstraint(
+                fields=("server", "collected_at"), name="uniq_snapshot_server_collected_at"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="metricsnapshot",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("seq__isnull", False)),
+                fields=("server", "seq"),
+                name="uniq_snapshot_server_seq",
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from datetime import timezone as dt_timezone
+
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def backfill_partition_day(apps, schema_editor):
+    """Assign every existing snapshot to the UTC day it was collected on (one set-based UPDATE)."""
+    MetricSnapshot = apps.get_model("monitoring", "MetricSnapshot")
+    MetricSnapshot.objects.filter(partition_day=None).update(
+        partition_day=TruncDate("collected_at", tzinfo=dt_timezone.utc)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitoring", "0010_metricsnapshot_seq_unique"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="metricsnapshot",
+            name="partition_day",
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_partition_day, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="metricsnapshot",
+            index=models.Index(fields=["partition_day", "server"], name="monitoring__partiti_84942b_idx"),
+        ),
+    ]
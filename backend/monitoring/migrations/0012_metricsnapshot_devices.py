@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitoring", "0011_metricsnapshot_partition_day"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="metricsnapshot",
+            name="devices",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
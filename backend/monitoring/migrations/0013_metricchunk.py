@@ -0,0 +1,41 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitoring", "0012_metricsnapshot_devices"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MetricChunk",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("start_at", models.DateTimeField()),
+                ("end_at", models.DateTimeField()),
+                ("partition_day", models.DateField()),
+                ("sample_count", models.IntegerField(default=0)),
+                ("data", models.BinaryField()),
+                (
+                    "server",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="chunks",
+                        to="monitoring.monitoredserver",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["start_at"],
+                "indexes": [
+                    models.Index(fields=["server", "end_at"], name="monitoring__server__1135e9_idx"),
+                    models.Index(fields=["partition_day", "server"], name="monitoring__partiti_d5a200_idx"),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(fields=("server", "start_at"), name="uniq_chunk_server_start"),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitoring", "0013_metricchunk"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="monitoredserver",
+            name="latest_state",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
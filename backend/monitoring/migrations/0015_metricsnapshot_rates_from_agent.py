@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitoring", "0014_monitoredserver_latest_state"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="metricsnapshot",
+            name="rates_from_agent",
+            field=models.BooleanField(default=False),
+        ),
+    ]
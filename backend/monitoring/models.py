@@ -32,6 +32,10 @@ class MonitoredServer(models.Model):
     last_ip = models.GenericIPAddressField(null=True, blank=True)
     last_agent_version = models.CharField(max_length=64, blank=True)
     agent_info = models.JSONField(default=dict, blank=True)
+    # Last keyframe sample from a delta-encoding agent: {"seq": int, "sample": {...}}.
+    delta_base = models.JSONField(default=dict, blank=True)
+    # Compact copy of the newest snapshot, written with last_seen_at (see services/latest_state.py).
+    latest_state = models.JSONField(default=dict, blank=True)
 
     class Meta:
         ordering = ["name", "slug"]
@@ -59,6 +63,28 @@ class MonitoredServer(models.Model):
             return False
         return hmac.compare_digest(self.api_token_hash, self.hash_token(token))
 
+    def rotate_api_token(self, current_token: str) -> str | None:
+        """Swap ``current_token`` for a fresh one; return it, or None if ``current_token`` is stale.
+
+        The swap is a single conditional UPDATE, so two concurrent refreshes with
+        the same token cannot both succeed.
+        """
+        from django.utils import timezone
+
+        if not self.check_api_token(current_token):
+            return None
+        new_token = self.generate_token()
+        new_hash = self.hash_token(new_token)
+        now = timezone.now()
+        updated = type(self).objects.filter(pk=self.pk, api_token_hash=self.api_token_hash).update(
+            api_token_hash=new_hash, updated_at=now
+        )
+        if not updated:
+            return None
+        self.api_token_hash = new_hash
+        self.updated_at = now
+        return new_token
+
     @property
     def token_hint(self) -> str:
         return f"{self.api_token_hash[:8]}..." if self.api_token_hash else ""
@@ -186,7 +212,13 @@ class MetricSnapshot(models.Model):
         related_name="snapshots",
     )
     collected_at = models.DateTimeField(db_index=True)
+    # UTC day of collected_at: retention drops whole days and history queries prune by it.
+    partition_day = models.DateField(null=True, blank=True)
+    # Agent-assigned, increasing per agent; lets replayed samples be recognised and ignored.
+    seq = models.BigIntegerField(null=True, blank=True)
     interval_seconds = models.FloatField(null=True, blank=True)
+    # Rates came with the sample (agent-side counters); a late predecessor must not re-derive them.
+    rates_from_agent = models.BooleanField(default=False)
 
     cpu_usage_percent = models.FloatField(default=0)
     cpu_user_percent = models.FloatField(null=True, blank=True)
@@ -237,12 +269,28 @@ class MetricSnapshot(models.Model):
     bottleneck_confidence = models.FloatField(default=0)
     bottleneck_reason = models.CharField(max_length=255, blank=True)
 
+    # Per-interval min/avg/max/p95 of metrics the agent sampled at high frequency,
+    # e.g. {"gpu_util_percent": {"min": 3.0, "avg": 71.2, "max": 99.0, "p95": 98.0, "count": 40}}.
+    summaries = models.JSONField(default=dict, blank=True)
+    # GPU/disk/fan readings packed into one column (MONITORING_DEVICE_STORAGE=packed) instead of
+    # GpuMetric/DiskMetric/FanMetric rows; read through monitoring.services.devices.
+    devices = models.JSONField(default=dict, blank=True)
+
     class Meta:
         ordering = ["-collected_at"]
         indexes = [
             models.Index(fields=["-collected_at"]),
             models.Index(fields=["server", "collected_at"]),
             models.Index(fields=["bottleneck", "-collected_at"]),
+            models.Index(fields=["partition_day", "server"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["server", "collected_at"], name="uniq_snapshot_server_collected_at"),
+            models.UniqueConstraint(
+                fields=["server", "seq"],
+                condition=models.Q(seq__isnull=False),
+                name="uniq_snapshot_server_seq",
+            ),
         ]
 
     def __str__(self) -> str:
@@ -250,6 +298,31 @@ class MetricSnapshot(models.Model):
         return f"{server_slug} {self.collected_at.isoformat()} ({self.bottleneck})"
 
 
+class MetricChunk(models.Model):
+    """Compressed history of one server over a closed time window (see monitoring.services.chunks)."""
+
+    id: int
+    server = models.ForeignKey(MonitoredServer, on_delete=models.CASCADE, related_name="chunks")
+    start_at = models.DateTimeField()
+    end_at = models.DateTimeField()  # exclusive
+    partition_day = models.DateField()
+    sample_count = models.IntegerField(default=0)
+    data = models.BinaryField()
+
+    class Meta:
+        ordering = ["start_at"]
+        indexes = [
+            models.Index(fields=["server", "end_at"]),
+            models.Index(fields=["partition_day", "server"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["server", "start_at"], name="uniq_chunk_server_start"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.server.slug} {self.start_at.isoformat()} ({self.sample_count} samples)"
+
+
 class GpuMetric(models.Model):
     snapshot = models.ForeignKey(MetricSnapshot, on_delete=models.CASCADE, related_name="gpus")
     gpu_index = models.IntegerField()
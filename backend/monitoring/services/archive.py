@@ -0,0 +1,342 @@
+"""Columnar archive of history older than the retention window.
+
+Each server and UTC day becomes one directory of ``.npy`` column files under
+``MONITORING_ARCHIVE_DIR``::
+
+    <archive>/<server id>/2026-01-31/
+        meta.json               {"v": 1, "count": n, ...}, written last
+        t.npy                   int64 ms since epoch, sorted
+        cpu_usage_percent.npy   one file per snapshot column
+        gpus.row.npy            sample index of every GPU reading
+        gpus.temperature_c.npy  one file per device field
+        summaries.json
+
+Reads memory-map only the requested columns and only touch the rows in the
+requested time range (binary search on ``t``).  numpy is optional: without
+it, or without ``MONITORING_ARCHIVE_DIR``, the archive is disabled and
+retention deletes history as before.
+"""
+from __future__ import annotations
+
+import json
+import shutil
+import tempfile
+from datetime import date, datetime, time as dt_time, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Iterable
+
+from django.conf import settings
+
+from monitoring.models import MetricChunk, MetricSnapshot, MonitoredServer
+from monitoring.services.chunks import (
+    BOOL_COLUMNS,
+    DEVICE_INT_FIELDS,
+    DEVICE_KEYS,
+    DEVICE_TEXT_FIELDS,
+    EPOCH,
+    FLOAT_COLUMNS,
+    INT_COLUMNS,
+    TEXT_COLUMNS,
+    history_snapshots,
+)
+from monitoring.services.devices import DEVICE_FIELDS, attach_devices, load_devices, snapshot_devices
+from monitoring.services.partitions import partition_day_for
+
+ARCHIVE_VERSION = 1
+# Stands in for NULL in integer columns.
+_INT_NULL = -(2**63)
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def archive_enabled() -> bool:
+    """True when ``MONITORING_ARCHIVE_DIR`` is set and numpy is installed."""
+    return bool(settings.MONITORING_ARCHIVE_DIR) and _numpy() is not None
+
+
+def _server_dir(server: MonitoredServer) -> Path:
+    return Path(settings.MONITORING_ARCHIVE_DIR) / str(server.pk)
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, dt_time.min, tzinfo=EPOCH.tzinfo)
+
+
+def _to_ms(moment: datetime) -> int:
+    return (moment - EPOCH) // timedelta(milliseconds=1)
+
+
+def archived_days(server: MonitoredServer) -> list[date]:
+    """Days of ``server`` present in the archive, oldest first."""
+    root = _server_dir(server)
+    if not root.is_dir():
+        return []
+    days = []
+    for entry in root.iterdir():
+        if not (entry / "meta.json").is_file():
+            continue
+        try:
+            days.append(date.fromisoformat(entry.name))
+        except ValueError:
+            continue
+    return sorted(days)
+
+
+def _live_days(server: MonitoredServer, before: date) -> set[date]:
+    days = set(
+        MetricSnapshot.objects.filter(server=server, partition_day__lt=before)
+        .values_list("partition_day", flat=True)
+        .distinct()
+    )
+    days.update(
+        MetricChunk.objects.filter(server=server, partition_day__lt=before)
+        .values_list("partition_day", flat=True)
+        .distinct()
+    )
+    days.discard(None)
+    return days
+
+
+def archive_horizon(server: MonitoredServer, before: date) -> date:
+    """The ``before`` that retention may use for ``server`` without dropping unarchived days.
+
+    With the archive disabled this is ``before`` itself.
+    """
+    if not archive_enabled():
+        return before
+    archived = set(archived_days(server))
+    for day in sorted(_live_days(server, before)):
+        if day not in archived:
+            return day
+    return before
+
+
+def _float_array(np, values: Iterable[Any]):
+    return np.array([np.nan if value is None else float(value) for value in values], dtype=np.float64)
+
+
+def _int_array(np, values: Iterable[Any]):
+    return np.array([_INT_NULL if value is None else int(value) for value in values], dtype=np.int64)
+
+
+def _text_array(np, values: Iterable[Any]):
+    return np.array(["" if value is None else str(value) for value in values], dtype=str)
+
+
+def _write_day(server: MonitoredServer, day: date, points: list[Any]) -> None:
+    np = _numpy()
+    columns: dict[str, Any] = {"t": np.array([_to_ms(point.collected_at) for point in points], dtype=np.int64)}
+    for column in FLOAT_COLUMNS:
+        columns[column] = _float_array(np, (getattr(point, column) for point in points))
+    for column in INT_COLUMNS:
+        columns[column] = _int_array(np, (getattr(point, column) for point in points))
+    for column in TEXT_COLUMNS:
+        columns[column] = _text_array(np, (getattr(point, column) for point in points))
+    for kind, fields in DEVICE_FIELDS.items():
+        rows: list[int] = []
+        items: list[Any] = []
+        for index, point in enumerate(points):
+            for item in snapshot_devices(point)[kind]:
+                rows.append(index)
+                items.append(item)
+        columns[f"{kind}.row"] = np.array(rows, dtype=np.int32)
+        for field in fields:
+            values = (getattr(item, field) for item in items)
+            if field in DEVICE_TEXT_FIELDS or field in ("device", "label"):
+                columns[f"{kind}.{field}"] = _text_array(np, values)
+            elif field in DEVICE_INT_FIELDS or field == "gpu_index":
+                columns[f"{kind}.{field}"] = _int_array(np, values)
+            else:
+                columns[f"{kind}.{field}"] = _float_array(np, values)
+
+    target = _server_dir(server) / day.isoformat()
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{day.isoformat()}-", dir=target.parent))
+    try:
+        for name, array in columns.items():
+            np.save(staging / f"{name}.npy", array, allow_pickle=False)
+        (staging / "summaries.json").write_text(json.dumps([point.summaries or {} for point in points]))
+        meta = {"v": ARCHIVE_VERSION, "count": len(points), "day": day.isoformat()}
+        (staging / "meta.json").write_text(json.dumps(meta))
+        retired = target.with_name(f".{target.name}-retired")
+        if target.exists():
+            shutil.rmtree(retired, ignore_errors=True)
+            target.rename(retired)
+        staging.rename(target)
+        shutil.rmtree(retired, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def archive_day(server: MonitoredServer, day: date) -> int:
+    """Write ``server``'s raw and chunked history of ``day`` to the archive; return samples written.
+
+    An existing archive of that day is merged with (and overridden by) what
+    is still in the database, so re-running is safe.
+    """
+    start = _day_start(day)
+    points = load_devices(history_snapshots(server, start, start + timedelta(days=1)))
+    if not points:
+        return 0
+    merged = {_to_ms(point.collected_at): point for point in _read_day(server, day)}
+    merged.update((_to_ms(point.collected_at), point) for point in points)
+    _write_day(server, day, [merged[key] for key in sorted(merged)])
+    return len(merged)
+
+
+def archive_before(before: date, *, server: MonitoredServer | None = None) -> list[tuple[MonitoredServer, date, int]]:
+    """Archive every day older than ``before`` still in the database; ``[(server, day, samples), ...]``."""
+    servers = [server] if server is not None else list(MonitoredServer.objects.order_by("id"))
+    archived = []
+    for current in servers:
+        for day in sorted(_live_days(current, before)):
+            archived.append((current, day, archive_day(current, day)))
+    return archived
+
+
+def _wanted(columns: set[str] | None) -> tuple[list[str], dict[str, list[str]], bool]:
+    """Split a column selection into snapshot columns, device fields per kind and summaries."""
+    snapshot_columns = FLOAT_COLUMNS + INT_COLUMNS + TEXT_COLUMNS
+    if columns is None:
+        return snapshot_columns, {kind: list(fields) for kind, fields in DEVICE_FIELDS.items()}, True
+    kinds: dict[str, list[str]] = {}
+    for kind, fields in DEVICE_FIELDS.items():
+        if kind in columns:
+            kinds[kind] = list(fields)
+            continue
+        selected = [field for field in fields if f"{kind}.{field}" in columns]
+        if selected:
+            kinds[kind] = [DEVICE_KEYS[kind]] + [field for field in selected if field != DEVICE_KEYS[kind]]
+    return [column for column in snapshot_columns if column in columns], kinds, "summaries" in columns
+
+
+def _read_day(
+    server: MonitoredServer,
+    day: date,
+    *,
+    since_ms: int | None = None,
+    until_ms: int | None = None,
+    stride: int = 1,
+    columns: set[str] | None = None,
+) -> list[SimpleNamespace]:
+    np = _numpy()
+    folder = _server_dir(server) / day.isoformat()
+    if np is None or not (folder / "meta.json").is_file():
+        return []
+
+    def load(name: str):
+        return np.load(folder / f"{name}.npy", mmap_mode="r", allow_pickle=False)
+
+    times = load("t")
+    lo = 0 if since_ms is None else int(np.searchsorted(times, since_ms, "left"))
+    hi = len(times) if until_ms is None else int(np.searchsorted(times, until_ms, "left"))
+    index = np.arange(lo, hi, max(1, stride))
+    if not len(index):
+        return []
+
+    snapshot_columns, kinds, with_summaries = _wanted(columns)
+    summaries = json.loads((folder / "summaries.json").read_text()) if with_summaries else None
+    points = []
+    for position, ms in enumerate(times[index].tolist()):
+        collected_at = EPOCH + timedelta(milliseconds=ms)
+        points.append(
+            SimpleNamespace(
+                id=None,
+                server=server,
+                server_id=server.pk,
+                collected_at=collected_at,
+                partition_day=partition_day_for(collected_at),
+                summaries=summaries[int(index[position])] if summaries is not None else {},
+                devices={},
+            )
+        )
+    for column in FLOAT_COLUMNS + INT_COLUMNS + TEXT_COLUMNS:
+        values = _column_values(load(column)[index]) if column in snapshot_columns else [None] * len(points)
+        if column in BOOL_COLUMNS:
+            values = [None if value is None else bool(value) for value in values]
+        for point, value in zip(points, values):
+            setattr(point, column, value)
+
+    devices = [{kind: [] for kind in DEVICE_FIELDS} for _ in points]
+    for kind, fields in kinds.items():
+        rows = load(f"{kind}.row")
+        selected = np.nonzero(np.isin(rows, index))[0]
+        owners = np.searchsorted(index, rows[selected]).tolist()
+        field_values = {field: _column_values(load(f"{kind}.{field}")[selected]) for field in fields}
+        for item_index, owner in enumerate(owners):
+            item = SimpleNamespace(**{field: None for field in DEVICE_FIELDS[kind]})
+            for field, values in field_values.items():
+                setattr(item, field, values[item_index])
+            devices[owner][kind].append(item)
+    for point, point_devices in zip(points, devices):
+        attach_devices(point, point_devices)
+    return points
+
+
+def _column_values(array) -> list[Any]:
+    values = array.tolist()
+    kind = array.dtype.kind
+    if kind == "f":
+        return [None if value != value else value for value in values]
+    if kind == "i":
+        return [None if value == _INT_NULL else value for value in values]
+    return values
+
+
+def _day_bounds(day: date, since: datetime, until: datetime | None) -> tuple[int | None, int | None]:
+    start = _day_start(day)
+    since_ms = _to_ms(since) if since > start else None
+    until_ms = _to_ms(until) if until is not None and until < start + timedelta(days=1) else None
+    return since_ms, until_ms
+
+
+def _days_in_range(server: MonitoredServer, since: datetime, until: datetime | None) -> list[date]:
+    first = partition_day_for(since)
+    last = partition_day_for(until) if until is not None else None
+    return [day for day in archived_days(server) if day >= first and (last is None or day <= last)]
+
+
+def count_archived(server: MonitoredServer, since: datetime, until: datetime | None = None) -> int:
+    """Archived samples of ``server`` in ``[since, until)``; reads only the ``t`` column."""
+    np = _numpy()
+    if np is None:
+        return 0
+    total = 0
+    for day in _days_in_range(server, since, until):
+        times = np.load(_server_dir(server) / day.isoformat() / "t.npy", mmap_mode="r", allow_pickle=False)
+        since_ms, until_ms = _day_bounds(day, since, until)
+        lo = 0 if since_ms is None else int(np.searchsorted(times, since_ms, "left"))
+        hi = len(times) if until_ms is None else int(np.searchsorted(times, until_ms, "left"))
+        total += max(0, hi - lo)
+    return total
+
+
+def read_archive(
+    server: MonitoredServer,
+    since: datetime,
+    until: datetime | None = None,
+    *,
+    columns: set[str] | None = None,
+    stride: int = 1,
+) -> list[SimpleNamespace]:
+    """Archived points of ``server`` in ``[since, until)``, oldest first, every ``stride``-th per day.
+
+    ``columns`` names snapshot columns, ``"summaries"``, whole device kinds
+    (``"gpus"``) or single device fields (``"gpus.temperature_c"``); columns
+    not selected are ``None`` and are never read from disk.
+    """
+    points: list[SimpleNamespace] = []
+    for day in _days_in_range(server, since, until):
+        since_ms, until_ms = _day_bounds(day, since, until)
+        points.extend(
+            _read_day(server, day, since_ms=since_ms, until_ms=until_ms, stride=stride, columns=columns)
+        )
+    return points
@@ -0,0 +1,258 @@
+"""Bulk import and timed replay of recorded samples (``manage.py import_samples``).
+
+Import bypasses the per-sample ingest path: rates are derived against the
+previous sample kept in memory (no neighbour lookups), snapshots are written
+with ``bulk_create`` and device rows with a plain ``executemany`` in batches,
+and (into an empty database only) secondary indexes can be dropped for the load and rebuilt once at the
+end.  Replay instead posts
+the samples to a running webapp's ingest endpoint, paced at N times the
+recorded speed.
+"""
+from __future__ import annotations
+
+import json
+import time
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Iterable, Iterator
+
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from monitoring.models import DiskMetric, FanMetric, GpuMetric, MetricSnapshot, MonitoredServer
+from monitoring.services.collector import build_snapshot, normalize_raw_metrics
+from monitoring.services.devices import attach_devices, packed_storage_enabled, snapshot_disks
+from monitoring.services.ingest_lock import serialized_ingest
+from monitoring.services.latest_state import latest_states, snapshot_state
+
+# Tables whose secondary indexes are rebuilt after a bulk load; unique constraints stay in place.
+INDEXED_MODELS = (MetricSnapshot, DiskMetric)
+
+
+def iter_samples(lines: Iterable[str]) -> Iterator[tuple[str | None, dict[str, Any]]]:
+    """``(server slug or None, sample)`` for each sample in NDJSON lines.
+
+    A line is a bare sample (``collect_raw_metrics()`` output) or an ingest
+    payload (``{"sample": ...}`` / ``{"samples": [...]}``); an optional
+    top-level ``"server"`` slug routes it to that server.
+    """
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"line {number}: {exc}") from exc
+        if not isinstance(record, dict):
+            raise ValueError(f"line {number}: expected a JSON object")
+        slug = record.get("server") if isinstance(record.get("server"), str) else None
+        if isinstance(record.get("samples"), list):
+            for sample in record["samples"]:
+                if isinstance(sample, dict):
+                    yield slug, sample
+        elif isinstance(record.get("sample"), dict):
+            yield slug, record["sample"]
+        else:
+            yield slug, record
+
+
+@contextmanager
+def deferred_indexes(models: Iterable[type] = INDEXED_MODELS) -> Iterator[None]:
+    """Drop the ``Meta.indexes`` of ``models`` for the block and rebuild each once afterwards.
+
+    If the process dies inside the block the indexes stay dropped (``migrate`` does not bring them back),
+    so only use it on a database nothing else is serving from.
+    """
+    dropped = []
+    with connection.schema_editor() as editor:
+        for model in models:
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+                dropped.append((model, index))
+    try:
+        yield
+    finally:
+        with connection.schema_editor() as editor:
+            for model, index in dropped:
+                editor.add_index(model, index)
+
+
+def _insert_rows(model: type, rows: list[Any]) -> None:
+    """``executemany`` INSERT of plain-valued rows; skips the per-value ORM preparation of ``bulk_create``."""
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    qn = connection.ops.quote_name
+    sql = (
+        f"INSERT INTO {qn(model._meta.db_table)} ({', '.join(qn(field.column) for field in fields)}) "
+        f"VALUES ({', '.join(['%s'] * len(fields))})"
+    )
+    attnames = [field.attname for field in fields]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [[getattr(row, attname) for attname in attnames] for row in rows])
+
+
+class BulkImporter:
+    """Import one server's samples, oldest first, in batches of ``batch_size`` snapshots.
+
+    Samples not newer than the previous one (including what is already
+    stored) and repeated ``seq`` values are skipped.  Stored ``seq`` values
+    are checked per batch, so memory does not grow with the server's history.
+    No notifications are raised and retention is not applied.
+    """
+
+    def __init__(self, server: MonitoredServer, *, batch_size: int = 2000, packed: bool | None = None) -> None:
+        self.server = server
+        self.batch_size = max(1, batch_size)
+        self.packed = packed_storage_enabled() if packed is None else packed
+        self.previous = MetricSnapshot.objects.filter(server=server).order_by("-collected_at").first()
+        self.previous_disks = {disk.device: disk for disk in snapshot_disks(self.previous)} if self.previous else {}
+        self.latest: MetricSnapshot | None = None
+        self.seen_seq: set[int] = set()
+        self.pending: list[tuple[MetricSnapshot, list[DiskMetric], list[GpuMetric], list[FanMetric]]] = []
+        self.imported = 0
+        self.skipped = 0
+
+    def add(self, sample: dict[str, Any]) -> None:
+        raw = normalize_raw_metrics(sample)
+        if self.previous is not None and raw["collected_at"] <= self.previous.collected_at:
+            self.skipped += 1
+            return
+        if raw["seq"] is not None:
+            if raw["seq"] in self.seen_seq:
+                self.skipped += 1
+                return
+            self.seen_seq.add(raw["seq"])
+        built = build_snapshot(
+            self.server, raw, previous=self.previous, previous_disks=self.previous_disks, packed=self.packed
+        )
+        self.previous = built[0]
+        if not self.packed:
+            attach_devices(built[0], {"gpus": built[2], "disks": built[1], "fans": built[3]})
+        self.previous_disks = {disk.device: disk for disk in built[1]}
+        self.pending.append(built)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        with serialized_ingest(self.server):
+            seqs = [built[0].seq for built in self.pending if built[0].seq is not None]
+            # A stored sample older than the newest one may share a seq (e.g. after an agent reinstall).
+            stored: set[int] = set()
+            if seqs:
+                stored.update(
+                    MetricSnapshot.objects.filter(server=self.server, seq__in=seqs).values_list("seq", flat=True)
+                )
+            if stored:
+                kept = [built for built in self.pending if built[0].seq not in stored]
+                self.skipped += len(self.pending) - len(kept)
+                self.pending = kept
+                if not kept:
+                    return
+            snapshots = MetricSnapshot.objects.bulk_create([built[0] for built in self.pending])
+            if not self.packed:
+                if not connection.features.can_return_rows_from_bulk_insert:
+                    ids = dict(
+                        MetricSnapshot.objects.filter(
+                            server=self.server, collected_at__in=[snapshot.collected_at for snapshot in snapshots]
+                        ).values_list("collected_at", "id")
+                    )
+                    for snapshot in snapshots:
+                        snapshot.pk = ids[snapshot.collected_at]
+                children: dict[type, list[Any]] = {DiskMetric: [], GpuMetric: [], FanMetric: []}
+                for snapshot, disks, gpus, fans in self.pending:
+                    for model, rows in ((DiskMetric, disks), (GpuMetric, gpus), (FanMetric, fans)):
+                        for row in rows:
+                            row.snapshot = snapshot
+                        children[model].extend(rows)
+                for model, rows in children.items():
+                    if rows:
+                        _insert_rows(model, rows)
+        self.imported += len(self.pending)
+        self.latest = self.pending[-1][0]
+        self.pending = []
+
+    def finish(self) -> None:
+        """Write the last batch and move the server's ``last_seen_at`` and latest state forward."""
+        self.flush()
+        latest = self.latest.collected_at if self.latest is not None else None
+        if latest is not None and (self.server.last_seen_at is None or self.server.last_seen_at < latest):
+            self.server.last_seen_at = latest
+            self.server.latest_state = snapshot_state(self.latest)
+            self.server.save(update_fields=["last_seen_at", "latest_state", "updated_at"])
+            latest_states.publish(self.server)
+
+
+def _collected_at(sample: dict[str, Any]) -> datetime | None:
+    value = sample.get("collected_at")
+    moment = parse_datetime(str(value)) if value else None
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, timezone.get_current_timezone())
+    return moment
+
+
+def replay_samples(
+    samples: Iterable[tuple[str, dict[str, Any]]],
+    *,
+    base_url: str,
+    tokens: dict[str, str],
+    speed: float = 1.0,
+    shift_to_now: bool = True,
+    timeout: float = 10.0,
+) -> dict[str, Any]:
+    """Post ``(server slug, sample)`` pairs to ``base_url``'s ingest endpoint in recorded order.
+
+    Gaps between consecutive ``collected_at`` values are slept for, divided by
+    ``speed`` (``0`` sends as fast as possible).  With ``shift_to_now`` the
+    timestamps are moved so the first sample is collected now and the rest
+    keep their spacing.  Returns counts by status, the achieved rate and how
+    far the sender fell behind schedule.
+    """
+    status: dict[str, int] = {}
+    sent = 0
+    lag = 0.0
+    started = time.monotonic()
+    first_at: datetime | None = None
+    shift = None
+    for slug, sample in samples:
+        collected_at = _collected_at(sample)
+        if collected_at is not None:
+            if first_at is None:
+                first_at = collected_at
+                shift = timezone.now() - collected_at
+            if speed > 0:
+                due = started + (collected_at - first_at).total_seconds() / speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    lag = max(lag, -delay)
+            if shift_to_now:
+                sample = {**sample, "collected_at": (collected_at + shift).isoformat()}
+        request = urllib.request.Request(
+            f"{base_url.rstrip('/')}/api/ingest/servers/{slug}/metrics/",
+            data=json.dumps({"sample": sample}).encode("utf-8"),
+            headers={"Content-Type": "application/json", "X-Monitoring-Token": tokens.get(slug, "")},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                key = str(response.status)
+        except urllib.error.HTTPError as exc:
+            key = str(exc.code)
+        except (urllib.error.URLError, TimeoutError, OSError) as exc:
+            key = type(exc).__name__
+        status[key] = status.get(key, 0) + 1
+        sent += 1
+    elapsed = time.monotonic() - started
+    return {
+        "sent": sent,
+        "status": status,
+        "elapsed_seconds": elapsed,
+        "samples_per_sec": sent / elapsed if elapsed else 0.0,
+        "max_lag_seconds": lag,
+    }
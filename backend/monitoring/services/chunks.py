@@ -0,0 +1,298 @@
+from __future__ import annotations
+
+import json
+import math
+import struct
+import zlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+from operator import attrgetter
+from types import SimpleNamespace
+from typing import Any, Iterable
+
+from django.db import models
+
+from monitoring.models import MetricChunk, MetricSnapshot, MonitoredServer
+from monitoring.services.devices import DEVICE_FIELDS, attach_devices, load_devices, snapshot_devices
+from monitoring.services.gorilla import decode_floats, decode_ints, encode_floats, encode_ints
+from monitoring.services.ingest_lock import serialized_ingest
+from monitoring.services.partitions import CHILD_MODELS, in_time_range, partition_day_for
+
+CHUNK_MAGIC = b"GCH1"
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# Snapshot columns that are not per-sample values.
+_SKIP_COLUMNS = {"id", "server", "collected_at", "partition_day", "summaries", "devices", "rates_from_agent"}
+
+DEVICE_KEYS = {"gpus": "gpu_index", "disks": "device", "fans": "label"}
+DEVICE_TEXT_FIELDS = {"name", "uuid"}
+DEVICE_INT_FIELDS = {
+    "memory_total_bytes",
+    "memory_used_bytes",
+    "read_bytes_total",
+    "write_bytes_total",
+    "read_count_total",
+    "write_count_total",
+    "busy_time_ms_total",
+    "speed_rpm",
+}
+
+
+def _snapshot_columns() -> tuple[list[str], list[str], list[str], set[str]]:
+    floats: list[str] = []
+    ints: list[str] = []
+    texts: list[str] = []
+    bools: set[str] = set()
+    for field in MetricSnapshot._meta.concrete_fields:
+        if field.name in _SKIP_COLUMNS:
+            continue
+        if isinstance(field, models.FloatField):
+            floats.append(field.attname)
+        elif isinstance(field, (models.IntegerField, models.BooleanField)):
+            ints.append(field.attname)
+            if isinstance(field, models.BooleanField):
+                bools.add(field.attname)
+        elif isinstance(field, models.CharField):
+            texts.append(field.attname)
+    return floats, ints, texts, bools
+
+
+FLOAT_COLUMNS, INT_COLUMNS, TEXT_COLUMNS, BOOL_COLUMNS = _snapshot_columns()
+
+
+def _to_ms(moment: datetime) -> int:
+    return (moment - EPOCH) // timedelta(milliseconds=1)
+
+
+def _runs(values: Iterable[Any]) -> list[list[Any]]:
+    runs: list[list[Any]] = []
+    for value in values:
+        if runs and runs[-1][0] == value:
+            runs[-1][1] += 1
+        else:
+            runs.append([value, 1])
+    return runs
+
+
+def _keyed(kind: str, items: list[Any]) -> dict[str, Any]:
+    """Devices of one point by key; a repeated key (two fans both labelled "fan1") gets a ``#`` suffix."""
+    keyed: dict[str, Any] = {}
+    for item in items:
+        ident = str(getattr(item, DEVICE_KEYS[kind]))
+        while ident in keyed:
+            ident += "#"
+        keyed[ident] = item
+    return keyed
+
+
+def encode_chunk(points: list[Any]) -> bytes:
+    """Compress snapshots (or decoded points) into one chunk payload.
+
+    Layout: ``GCH1``, a 4-byte header length, the zlib-compressed JSON header
+    (series directory, run-length text columns, device labels, summaries),
+    then one Gorilla stream per series.  Timestamps keep millisecond precision.
+    """
+    points = sorted(points, key=attrgetter("collected_at"))
+    series: list[tuple[Any, str, list[Any]]] = [("t", "i", [_to_ms(point.collected_at) for point in points])]
+    for column in FLOAT_COLUMNS:
+        series.append((column, "f", [getattr(point, column) for point in points]))
+    for column in INT_COLUMNS:
+        raw = [getattr(point, column) for point in points]
+        series.append((column, "i", [None if value is None else int(value) for value in raw]))
+
+    per_point = [{kind: _keyed(kind, items) for kind, items in snapshot_devices(point).items()} for point in points]
+    labels: dict[str, dict[str, dict[str, Any]]] = {}
+    for kind, fields in DEVICE_FIELDS.items():
+        ids = sorted({ident for devices in per_point for ident in devices[kind]}, key=lambda ident: (len(ident), ident))
+        labels[kind] = {}
+        for ident in ids:
+            items = [devices[kind].get(ident) for devices in per_point]
+            last = next(item for item in reversed(items) if item is not None)
+            labels[kind][ident] = {field: getattr(last, field) for field in fields if field in DEVICE_TEXT_FIELDS}
+            if ident != str(getattr(last, DEVICE_KEYS[kind])):
+                labels[kind][ident][DEVICE_KEYS[kind]] = getattr(last, DEVICE_KEYS[kind])
+            series.append(([kind, ident, ""], "i", [None if item is None else 1 for item in items]))
+            for field in fields:
+                if field == DEVICE_KEYS[kind] or field in DEVICE_TEXT_FIELDS:
+                    continue
+                kind_code = "i" if field in DEVICE_INT_FIELDS else "f"
+                values = [None if item is None else getattr(item, field) for item in items]
+                if kind_code == "i":
+                    values = [None if value is None else int(value) for value in values]
+                series.append(([kind, ident, field], kind_code, values))
+
+    directory: list[list[Any]] = []
+    streams: list[bytes] = []
+    for key, kind_code, values in series:
+        stream, gaps = (encode_ints if kind_code == "i" else encode_floats)(values)
+        directory.append([key, kind_code, gaps, len(stream)])
+        streams.append(stream)
+
+    summaries = [point.summaries or {} for point in points]
+    header = {
+        "v": 1,
+        "count": len(points),
+        "series": directory,
+        "text": {column: _runs(getattr(point, column) for point in points) for column in TEXT_COLUMNS},
+        "labels": labels,
+        "summaries": summaries if any(summaries) else None,
+    }
+    packed_header = zlib.compress(json.dumps(header, separators=(",", ":")).encode("utf-8"))
+    return CHUNK_MAGIC + struct.pack(">I", len(packed_header)) + packed_header + b"".join(streams)
+
+
+def decode_chunk(
+    data: bytes,
+    *,
+    server: MonitoredServer | None = None,
+    columns: set[str] | None = None,
+) -> list[SimpleNamespace]:
+    """Points of a chunk, oldest first, with the attributes of a ``MetricSnapshot``.
+
+    ``columns`` limits which snapshot columns are decoded (others are None);
+    device readings are always decoded and attached for ``snapshot_gpus()`` etc.
+    """
+    data = bytes(data)
+    if data[:4] != CHUNK_MAGIC:
+        raise ValueError("Not a metric chunk")
+    (header_len,) = struct.unpack(">I", data[4:8])
+    header = json.loads(zlib.decompress(data[8 : 8 + header_len]))
+    count = header["count"]
+    offset = 8 + header_len
+
+    values: dict[Any, list[Any]] = {}
+    for key, kind_code, gaps, length in header["series"]:
+        stream = data[offset : offset + length]
+        offset += length
+        if isinstance(key, str) and key != "t" and columns is not None and key not in columns:
+            continue
+        decoded = (decode_ints if kind_code == "i" else decode_floats)(stream, count, gaps)
+        values[key if isinstance(key, str) else tuple(key)] = decoded
+
+    texts = {}
+    for column, runs in header["text"].items():
+        texts[column] = [value for value, run in runs for _ in range(run)]
+    summaries = header["summaries"] or [{}] * count
+
+    points: list[SimpleNamespace] = []
+    for i, ms in enumerate(values["t"]):
+        collected_at = EPOCH + timedelta(milliseconds=ms)
+        point = SimpleNamespace(
+            id=None,
+            server=server,
+            server_id=server.pk if server is not None else None,
+            collected_at=collected_at,
+            partition_day=partition_day_for(collected_at),
+            summaries=summaries[i],
+            devices={},
+        )
+        for column in FLOAT_COLUMNS + INT_COLUMNS:
+            series_values = values.get(column)
+            value = series_values[i] if series_values is not None else None
+            setattr(point, column, bool(value) if column in BOOL_COLUMNS and value is not None else value)
+        for column in TEXT_COLUMNS:
+            setattr(point, column, texts[column][i] if column in texts else "")
+        points.append(point)
+
+    devices = [{kind: [] for kind in DEVICE_FIELDS} for _ in points]
+    for kind, fields in DEVICE_FIELDS.items():
+        key_field = DEVICE_KEYS[kind]
+        for ident, text in header["labels"].get(kind, {}).items():
+            presence = values[(kind, ident, "")]
+            field_values = {
+                field: values[(kind, ident, field)]
+                for field in fields
+                if field != key_field and field not in DEVICE_TEXT_FIELDS
+            }
+            text = dict(text)
+            key_value = text.pop(key_field) if key_field in text else int(ident) if kind == "gpus" else ident
+            for i, present in enumerate(presence):
+                if present is None:
+                    continue
+                item = SimpleNamespace(**{key_field: key_value}, **text)
+                for field, series_values in field_values.items():
+                    setattr(item, field, series_values[i])
+                devices[i][kind].append(item)
+    for point, point_devices in zip(points, devices):
+        attach_devices(point, point_devices)
+    return points
+
+
+def window_start(moment: datetime, window: timedelta) -> datetime:
+    """Start of the epoch-aligned window of length ``window`` that contains ``moment``."""
+    seconds = window.total_seconds()
+    return EPOCH + timedelta(seconds=math.floor((moment - EPOCH).total_seconds() / seconds) * seconds)
+
+
+def compact_window(server: MonitoredServer, start: datetime, end: datetime) -> MetricChunk | None:
+    """Move ``server``'s raw snapshots in ``[start, end)`` into the window's chunk.
+
+    A sample that arrived after the window was compacted is merged into the
+    existing chunk.  Runs under the per-server ingest lock, in one transaction.
+    """
+    with serialized_ingest(server):
+        snapshots = list(
+            MetricSnapshot.objects.filter(server=server, collected_at__gte=start, collected_at__lt=end).order_by(
+                "collected_at"
+            )
+        )
+        if not snapshots:
+            return None
+        load_devices(snapshots)
+        chunk = MetricChunk.objects.filter(server=server, start_at=start).first()
+        existing = decode_chunk(chunk.data, server=server) if chunk is not None else []
+        points = {_to_ms(point.collected_at): point for point in existing}
+        points.update((_to_ms(snapshot.collected_at), snapshot) for snapshot in snapshots)
+
+        if chunk is None:
+            chunk = MetricChunk(server=server, start_at=start, end_at=end, partition_day=partition_day_for(start))
+        chunk.sample_count = len(points)
+        chunk.data = encode_chunk(list(points.values()))
+        chunk.save()
+
+        ids = [snapshot.id for snapshot in snapshots]
+        for model in CHILD_MODELS:
+            model.objects.filter(snapshot_id__in=ids).delete()
+        MetricSnapshot.objects.filter(id__in=ids).delete()
+        return chunk
+
+
+def compact_server(server: MonitoredServer, older_than: datetime, window: timedelta) -> list[MetricChunk]:
+    """Compact every closed window of ``server`` that ends before ``older_than``."""
+    horizon = window_start(older_than, window)
+    chunks: list[MetricChunk] = []
+    while True:
+        first = (
+            MetricSnapshot.objects.filter(server=server, collected_at__lt=horizon)
+            .order_by("collected_at")
+            .values_list("collected_at", flat=True)
+            .first()
+        )
+        if first is None:
+            return chunks
+        start = window_start(first, window)
+        chunk = compact_window(server, start, start + window)
+        if chunk is not None:
+            chunks.append(chunk)
+
+
+def history_snapshots(
+    server: MonitoredServer,
+    since: datetime,
+    until: datetime | None = None,
+    *,
+    columns: set[str] | None = None,
+) -> list[Any]:
+    """Raw snapshots and decoded chunk points of ``server`` in ``[since, until)``, oldest first."""
+    raw = list(in_time_range(MetricSnapshot.objects.filter(server=server), since, until).order_by("collected_at"))
+    chunks = MetricChunk.objects.filter(server=server, end_at__gt=since)
+    if until is not None:
+        chunks = chunks.filter(start_at__lt=until)
+    cold = [
+        point
+        for chunk in chunks.order_by("start_at")
+        for point in decode_chunk(chunk.data, server=server, columns=columns)
+        if point.collected_at >= since and (until is None or point.collected_at < until)
+    ]
+    if not cold:
+        return raw
+    return sorted(cold + raw, key=attrgetter("collected_at"))
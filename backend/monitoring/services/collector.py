@@ -5,22 +5,55 @@ import re
 import socket
 import subprocess
 import getpass
+import logging
+import math
+import threading
 import warnings
 from datetime import datetime, timedelta
 from typing import Any
 
 import psutil
 from django.conf import settings
-from django.db import transaction
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 from django.utils.dateparse import parse_datetime
 from django.utils import timezone
 
 from monitoring.models import DiskMetric, FanMetric, GpuMetric, MetricSnapshot, MonitoredServer
+from monitoring.services.delta import expand_samples
+from monitoring.services.devices import (
+    attach_devices,
+    is_packed,
+    pack_devices,
+    packed_storage_enabled,
+    snapshot_disks,
+    snapshot_fans,
+    snapshot_gpus,
+)
+from monitoring.services.ingest_lock import serialized_ingest
+from monitoring.services.latest_state import latest_states, snapshot_state
 from monitoring.services.notifications import create_notification
+from monitoring.services.partitions import expire_partitions, partition_day_for, retention_due
+from monitoring.services.telemetry import ingest_phase, record_cache_lookup
+from monitoring.services.writer import ingest_writer
 
 
+logger = logging.getLogger(__name__)
+
 PHYSICAL_DISK_RE = re.compile(r"^(nvme\d+n\d+|sd[a-z]+|vd[a-z]+|xvd[a-z]+|md\d+)$")
 
+# Metrics an agent may sample at high frequency and summarise per report interval.
+SUMMARY_METRICS = ("gpu_util_percent", "cpu_usage_percent", "cpu_iowait_percent", "disk_util_percent")
+SUMMARY_STATS = ("min", "avg", "max", "p95")
+
+DISK_RATE_FIELDS = ("read_bps", "write_bps", "read_iops", "write_iops", "util_percent")
+
+# Snapshots dropped per retention transaction; queued ingest writes run between batches.
+RETENTION_BATCH = 2000
+_retention_guard = threading.Lock()
+_retention_queued: set[int] = set()
+
 
 def _current_user_name() -> str:
     try:
@@ -33,15 +66,17 @@ def _to_float(value: Any) -> float | None:
     if value is None:
         return None
     try:
-        return float(value)
+        number = float(value)
     except (TypeError, ValueError):
         return None
+    # NaN/inf can't go into a JSON column (latest_state, packed devices); treat them as missing.
+    return number if math.isfinite(number) else None
 
 
 def _to_int(value: Any) -> int:
     try:
         return int(value)
-    except (TypeError, ValueError):
+    except (TypeError, ValueError, OverflowError):
         return 0
 
 
@@ -406,7 +441,7 @@ def collect_raw_metrics() -> dict[str, Any]:
 
 def _derive_disk_rates(
     current: dict[str, Any],
-    previous: DiskMetric | None,
+    previous: Any | None,
     interval_seconds: float | None,
 ) -> dict[str, float]:
     if not previous or not interval_seconds or interval_seconds <= 0:
@@ -454,6 +489,88 @@ def _derive_network_rates(
     return rx_delta / dt, tx_delta / dt
 
 
+def _rederive_rates(
+    snapshot: MetricSnapshot,
+    previous: MetricSnapshot,
+    previous_disks: dict[str, Any],
+) -> None:
+    """Recompute the counter-derived rates of ``snapshot`` after ``previous`` was stored before it."""
+    interval_seconds = (snapshot.collected_at - previous.collected_at).total_seconds()
+    disks = snapshot_disks(snapshot)
+    disk_utils: list[float] = []
+    totals = {"read_bps": 0.0, "write_bps": 0.0, "read_iops": 0.0, "write_iops": 0.0}
+    for disk in disks:
+        counters = {
+            "read_bytes_total": disk.read_bytes_total,
+            "write_bytes_total": disk.write_bytes_total,
+            "read_count_total": disk.read_count_total,
+            "write_count_total": disk.write_count_total,
+            "busy_time_ms_total": disk.busy_time_ms_total,
+        }
+        rates = _derive_disk_rates(counters, previous_disks.get(disk.device), interval_seconds)
+        for field, value in rates.items():
+            setattr(disk, field, value)
+        for field in totals:
+            totals[field] += rates[field]
+        disk_utils.append(rates["util_percent"])
+    update_fields = []
+    if is_packed(snapshot):
+        snapshot.devices = pack_devices(snapshot_gpus(snapshot), disks, snapshot_fans(snapshot))
+        update_fields.append("devices")
+    elif disks:
+        DiskMetric.objects.bulk_update(disks, list(DISK_RATE_FIELDS))
+
+    snapshot.interval_seconds = interval_seconds
+    snapshot.disk_read_bps = totals["read_bps"]
+    snapshot.disk_write_bps = totals["write_bps"]
+    snapshot.disk_read_iops = totals["read_iops"]
+    snapshot.disk_write_iops = totals["write_iops"]
+    snapshot.disk_util_percent = max(disk_utils) if disk_utils else 0.0
+    snapshot.disk_avg_util_percent = (sum(disk_utils) / len(disk_utils)) if disk_utils else 0.0
+    snapshot.network_rx_bps, snapshot.network_tx_bps = _derive_network_rates(
+        snapshot.network_rx_bytes_total,
+        snapshot.network_tx_bytes_total,
+        previous,
+        interval_seconds,
+    )
+    snapshot.bottleneck, snapshot.bottleneck_confidence, snapshot.bottleneck_reason = _classify_bottleneck(
+        cpu_usage_percent=snapshot.cpu_usage_percent,
+        cpu_iowait_percent=snapshot.cpu_iowait_percent,
+        memory_percent=snapshot.memory_percent,
+        swap_percent=snapshot.swap_percent,
+        gpu_max_util_percent=snapshot.top_gpu_util_percent,
+        disk_util_percent=snapshot.disk_util_percent,
+        disk_read_bps=snapshot.disk_read_bps,
+        disk_write_bps=snapshot.disk_write_bps,
+        summaries=snapshot.summaries,
+    )
+    snapshot.save(
+        update_fields=update_fields
+        + [
+            "interval_seconds",
+            "disk_read_bps",
+            "disk_write_bps",
+            "disk_read_iops",
+            "disk_write_iops",
+            "disk_util_percent",
+            "disk_avg_util_percent",
+            "network_rx_bps",
+            "network_tx_bps",
+            "bottleneck",
+            "bottleneck_confidence",
+            "bottleneck_reason",
+        ]
+    )
+
+
+def _summary_stat(
+    summaries: dict[str, Any] | None, metric: str, stat: str, default: float | None = None
+) -> float | None:
+    entry = (summaries or {}).get(metric)
+    value = _to_float(entry.get(stat)) if isinstance(entry, dict) else None
+    return default if value is None else value
+
+
 def _classify_bottleneck(
     *,
     cpu_usage_percent: float,
@@ -464,7 +581,23 @@ def _classify_bottleneck(
     disk_util_percent: float,
     disk_read_bps: float,
     disk_write_bps: float,
+    summaries: dict[str, Any] | None = None,
 ) -> tuple[str, float, str]:
+    # High-frequency summaries describe the whole report interval, so prefer their
+    # averages over the single instantaneous reading taken at report time.
+    gpu_avg = _summary_stat(summaries, "gpu_util_percent", "avg")
+    if gpu_avg is not None:
+        gpu_max_util_percent = gpu_avg
+    cpu_avg = _summary_stat(summaries, "cpu_usage_percent", "avg")
+    if cpu_avg is not None:
+        cpu_usage_percent = cpu_avg
+    iowait_avg = _summary_stat(summaries, "cpu_iowait_percent", "avg")
+    if iowait_avg is not None:
+        cpu_iowait_percent = iowait_avg
+    disk_avg = _summary_stat(summaries, "disk_util_percent", "avg")
+    if disk_avg is not None:
+        disk_util_percent = disk_avg
+
     cpu = _clamp_pct(cpu_usage_percent)
     gpu = gpu_max_util_percent
     disk = _clamp_pct(disk_util_percent)
@@ -488,6 +621,21 @@ def _classify_bottleneck(
     if mem >= 95 or swap >= 20 or (swap >= 5 and mem >= 80):
         return "memory-pressure", 0.9, f"Memory {mem:.0f}% / swap {swap:.0f}%"
 
+    # GPU swinging between busy and near-idle within one interval means the
+    # device is waiting on input (dataloader stalls); the average hides this.
+    gpu_min = _summary_stat(summaries, "gpu_util_percent", "min")
+    gpu_peak = _summary_stat(summaries, "gpu_util_percent", "max")
+    if gpu_min is not None and gpu_peak is not None and gpu_peak >= 70 and gpu_min <= 30:
+        disk_p95 = _clamp_pct(_summary_stat(summaries, "disk_util_percent", "p95", disk))
+        iowait_p95 = _clamp_pct(_summary_stat(summaries, "cpu_iowait_percent", "p95", iowait))
+        cpu_p95 = _clamp_pct(_summary_stat(summaries, "cpu_usage_percent", "p95", cpu))
+        dips = f"GPU dipped to {gpu_min:.0f}% (avg {gpu:.0f}%, max {gpu_peak:.0f}%)"
+        if disk_p95 >= 70 or iowait_p95 >= 15:
+            return "io-bound", 0.8, f"{dips} while disk p95 {disk_p95:.0f}% / iowait p95 {iowait_p95:.0f}%"
+        if cpu_p95 >= 85:
+            return "cpu-bound", 0.78, f"{dips} while CPU p95 {cpu_p95:.0f}%"
+        return "underutilized", 0.6, f"{dips}; likely dataloader stalls"
+
     if gpu < 55:
         if disk >= 70 or iowait >= 15:
             return "io-bound", 0.88, f"GPU {gpu:.0f}% low while disk {disk:.0f}% / iowait {iowait:.0f}%"
@@ -526,7 +674,22 @@ def _parse_collected_at(value: Any) -> datetime:
     return dt
 
 
-def _normalize_raw_metrics(raw: dict[str, Any]) -> dict[str, Any]:
+def _normalize_summaries(raw: Any) -> dict[str, dict[str, float | int]]:
+    summaries: dict[str, dict[str, float | int]] = {}
+    if not isinstance(raw, dict):
+        return summaries
+    for metric in SUMMARY_METRICS:
+        entry = raw.get(metric)
+        if not isinstance(entry, dict):
+            continue
+        stats = {stat: _to_float(entry.get(stat)) for stat in SUMMARY_STATS}
+        if any(value is None for value in stats.values()):
+            continue
+        summaries[metric] = {**stats, "count": _to_int(entry.get("count", 0))}  # type: ignore[dict-item]
+    return summaries
+
+
+def normalize_raw_metrics(raw: dict[str, Any]) -> dict[str, Any]:
     raw = dict(raw or {})
     disks = raw.get("disks") or []
     gpus = raw.get("gpus") or []
@@ -538,6 +701,16 @@ def _normalize_raw_metrics(raw: dict[str, Any]) -> dict[str, Any]:
         device = str(disk.get("device", "")).strip()
         if not device:
             continue
+        # Agent-computed rates (optional); only kept when every field is present.
+        rates: dict[str, float] | None = {
+            field: max(0.0, _to_float(disk.get(field)) or 0.0)
+            for field in DISK_RATE_FIELDS
+            if disk.get(field) is not None
+        }
+        if rates is not None and len(rates) != len(DISK_RATE_FIELDS):
+            rates = None
+        if rates is not None:
+            rates["util_percent"] = _clamp_pct(rates["util_percent"])
         normalized_disks.append(
             {
                 "device": device[:64],
@@ -546,6 +719,7 @@ def _normalize_raw_metrics(raw: dict[str, Any]) -> dict[str, Any]:
                 "read_count_total": _to_int(disk.get("read_count_total", 0)),
                 "write_count_total": _to_int(disk.get("write_count_total", 0)),
                 "busy_time_ms_total": _to_int(disk.get("busy_time_ms_total", 0)),
+                "rates": rates,
             }
         )
 
@@ -582,8 +756,25 @@ def _normalize_raw_metrics(raw: dict[str, Any]) -> dict[str, Any]:
             }
         )
 
+    # Agents that track counters locally send rates with the sample; ingest then
+    # does not need the previous snapshot at all.
+    interval_seconds = _to_float(raw.get("interval_seconds"))
+    network_rx_bps = _to_float(raw.get("network_rx_bps"))
+    network_tx_bps = _to_float(raw.get("network_tx_bps"))
+    agent_rates = (
+        interval_seconds is not None
+        and interval_seconds > 0
+        and network_rx_bps is not None
+        and network_tx_bps is not None
+    )
+
+    seq = raw.get("seq")
+    if isinstance(seq, bool) or not isinstance(seq, int) or not 0 < seq < 2**63:
+        seq = None
+
     return {
         "collected_at": _parse_collected_at(raw.get("collected_at")),
+        "seq": seq,
         "cpu_usage_percent": _to_float(raw.get("cpu_usage_percent")) or 0.0,
         "cpu_user_percent": _to_float(raw.get("cpu_user_percent")),
         "cpu_system_percent": _to_float(raw.get("cpu_system_percent")),
@@ -608,30 +799,68 @@ def _normalize_raw_metrics(raw: dict[str, Any]) -> dict[str, Any]:
         "disks": normalized_disks,
         "gpus": normalized_gpus,
         "fans": normalized_fans,
+        "summaries": _normalize_summaries(raw.get("summaries")),
+        "agent_rates": agent_rates,
+        "interval_seconds": interval_seconds if agent_rates else None,
+        "network_rx_bps": max(0.0, network_rx_bps or 0.0),
+        "network_tx_bps": max(0.0, network_tx_bps or 0.0),
     }
 
 
-def store_raw_metrics_for_server(
+def _hardware_cache_key(server: MonitoredServer) -> str:
+    return f"monitoring:hw:{server.id}"
+
+
+def _previous_hardware_counts(
     server: MonitoredServer,
-    raw_metrics: dict[str, Any],
+    previous: MetricSnapshot | None,
+    previous_disks: dict[str, Any],
     *,
-    retention_days: int | None = None,
-) -> MetricSnapshot:
-    raw = _normalize_raw_metrics(raw_metrics)
+    agent_rates: bool,
+) -> tuple[int, int] | None:
+    """(gpu_count, disk_count) of the previous sample, or None when unknown.
+
+    Stateless (agent-rates) ingest never loads the previous snapshot, so it
+    relies on the counts cached by the last ingest in this process.
+    """
+    if agent_rates:
+        counts = cache.get(_hardware_cache_key(server))
+        record_cache_lookup("hardware", counts is not None)
+        return counts
+    if previous is None:
+        return 0, 0
+    return previous.gpu_count, len(previous_disks)
+
+
+def _find_stored_sample(server: MonitoredServer, raw: dict[str, Any]) -> MetricSnapshot | None:
+    match = Q(collected_at=raw["collected_at"])
+    if raw["seq"] is not None:
+        match |= Q(seq=raw["seq"])
+    return MetricSnapshot.objects.filter(server=server).filter(match).order_by("id").first()
 
-    previous = (
-        MetricSnapshot.objects.filter(server=server)
-        .order_by("-collected_at")
-        .prefetch_related("disks")
-        .first()
-    )
-    interval_seconds: float | None = None
-    if previous:
-        delta = (raw["collected_at"] - previous.collected_at).total_seconds()
-        if delta > 0:
-            interval_seconds = delta
 
-    previous_disks = {disk.device: disk for disk in (previous.disks.all() if previous else [])}
+def build_snapshot(
+    server: MonitoredServer,
+    raw: dict[str, Any],
+    *,
+    previous: MetricSnapshot | None,
+    previous_disks: dict[str, Any],
+    packed: bool | None = None,
+) -> tuple[MetricSnapshot, list[DiskMetric], list[GpuMetric], list[FanMetric]]:
+    """Unsaved snapshot and device rows for a normalized sample, rates derived against ``previous``.
+
+    ``previous`` (and its disks by device) may be unsaved objects from an
+    earlier call, which is how bulk imports derive rates without queries.
+    Device rows are not attached to the snapshot; with packed storage they
+    are also packed into ``snapshot.devices``.
+    """
+    agent_rates = raw["agent_rates"]
+    interval_seconds: float | None = raw["interval_seconds"]
+    if not agent_rates and previous is not None:
+        interval_seconds = (raw["collected_at"] - previous.collected_at).total_seconds()
+    if packed is None:
+        # Packed storage keeps these readings in one column instead of one row per device.
+        packed = packed_storage_enabled()
 
     disk_rows_to_create: list[DiskMetric] = []
     disk_read_bps_total = 0.0
@@ -641,7 +870,10 @@ def store_raw_metrics_for_server(
     disk_utils: list[float] = []
 
     for disk_row in raw["disks"]:
-        rates = _derive_disk_rates(disk_row, previous_disks.get(disk_row["device"]), interval_seconds)
+        if agent_rates:
+            rates = disk_row["rates"] or _derive_disk_rates(disk_row, None, None)
+        else:
+            rates = _derive_disk_rates(disk_row, previous_disks.get(disk_row["device"]), interval_seconds)
         disk_read_bps_total += rates["read_bps"]
         disk_write_bps_total += rates["write_bps"]
         disk_read_iops_total += rates["read_iops"]
@@ -663,12 +895,15 @@ def store_raw_metrics_for_server(
             )
         )
 
-    network_rx_bps, network_tx_bps = _derive_network_rates(
-        raw["network_rx_bytes_total"],
-        raw["network_tx_bytes_total"],
-        previous,
-        interval_seconds,
-    )
+    if agent_rates:
+        network_rx_bps, network_tx_bps = raw["network_rx_bps"], raw["network_tx_bps"]
+    else:
+        network_rx_bps, network_tx_bps = _derive_network_rates(
+            raw["network_rx_bytes_total"],
+            raw["network_tx_bytes_total"],
+            previous,
+            interval_seconds,
+        )
 
     gpus = raw["gpus"]
     gpu_utils = [gpu["utilization_gpu_percent"] for gpu in gpus if gpu["utilization_gpu_percent"] is not None]
@@ -696,174 +931,242 @@ def store_raw_metrics_for_server(
         disk_util_percent=disk_max_util,
         disk_read_bps=disk_read_bps_total,
         disk_write_bps=disk_write_bps_total,
+        summaries=raw["summaries"],
     )
 
-    with transaction.atomic():
-        snapshot = MetricSnapshot.objects.create(
-            server=server,
-            collected_at=raw["collected_at"],
-            interval_seconds=interval_seconds,
-            cpu_usage_percent=raw["cpu_usage_percent"],
-            cpu_user_percent=raw["cpu_user_percent"],
-            cpu_system_percent=raw["cpu_system_percent"],
-            cpu_iowait_percent=raw["cpu_iowait_percent"],
-            cpu_load_1=raw["cpu_load_1"],
-            cpu_load_5=raw["cpu_load_5"],
-            cpu_load_15=raw["cpu_load_15"],
-            cpu_frequency_mhz=raw["cpu_frequency_mhz"],
-            cpu_temperature_c=raw["cpu_temperature_c"],
-            cpu_count_logical=raw["cpu_count_logical"],
-            cpu_count_physical=raw["cpu_count_physical"],
-            memory_total_bytes=raw["memory_total_bytes"],
-            memory_used_bytes=raw["memory_used_bytes"],
-            memory_available_bytes=raw["memory_available_bytes"],
-            memory_percent=raw["memory_percent"],
-            swap_total_bytes=raw["swap_total_bytes"],
-            swap_used_bytes=raw["swap_used_bytes"],
-            swap_percent=raw["swap_percent"],
-            disk_read_bps=disk_read_bps_total,
-            disk_write_bps=disk_write_bps_total,
-            disk_read_iops=disk_read_iops_total,
-            disk_write_iops=disk_write_iops_total,
-            disk_util_percent=disk_max_util,
-            disk_avg_util_percent=disk_avg_util,
-            network_rx_bps=network_rx_bps,
-            network_tx_bps=network_tx_bps,
-            network_rx_bytes_total=raw["network_rx_bytes_total"],
-            network_tx_bytes_total=raw["network_tx_bytes_total"],
-            process_count=raw["process_count"],
-            fan_count=fan_count,
-            fan_max_rpm=fan_max_rpm,
-            fan_avg_rpm=fan_avg_rpm,
-            gpu_present=bool(gpus),
-            gpu_count=len(gpus),
-            top_gpu_util_percent=top_gpu_util,
-            avg_gpu_util_percent=avg_gpu_util,
-            top_gpu_memory_percent=top_gpu_mem,
-            avg_gpu_memory_percent=avg_gpu_mem,
-            bottleneck=bottleneck,
-            bottleneck_confidence=confidence,
-            bottleneck_reason=reason,
+    gpu_rows = [
+        GpuMetric(
+            gpu_index=gpu["gpu_index"],
+            name=gpu["name"],
+            uuid=gpu.get("uuid", "") or "",
+            utilization_gpu_percent=gpu.get("utilization_gpu_percent"),
+            utilization_memory_percent=gpu.get("utilization_memory_percent"),
+            memory_total_bytes=gpu.get("memory_total_bytes", 0) or 0,
+            memory_used_bytes=gpu.get("memory_used_bytes", 0) or 0,
+            memory_percent=gpu.get("memory_percent"),
+            temperature_c=gpu.get("temperature_c"),
+            fan_speed_percent=gpu.get("fan_speed_percent"),
+            power_w=gpu.get("power_w"),
+            power_limit_w=gpu.get("power_limit_w"),
         )
+        for gpu in gpus
+    ]
+    fan_rows = [FanMetric(label=fan["label"], speed_rpm=fan.get("speed_rpm", 0)) for fan in fans]
+
+    snapshot = MetricSnapshot(
+        server=server,
+        collected_at=raw["collected_at"],
+        partition_day=partition_day_for(raw["collected_at"]),
+        seq=raw["seq"],
+        interval_seconds=interval_seconds,
+        rates_from_agent=agent_rates,
+        cpu_usage_percent=raw["cpu_usage_percent"],
+        cpu_user_percent=raw["cpu_user_percent"],
+        cpu_system_percent=raw["cpu_system_percent"],
+        cpu_iowait_percent=raw["cpu_iowait_percent"],
+        cpu_load_1=raw["cpu_load_1"],
+        cpu_load_5=raw["cpu_load_5"],
+        cpu_load_15=raw["cpu_load_15"],
+        cpu_frequency_mhz=raw["cpu_frequency_mhz"],
+        cpu_temperature_c=raw["cpu_temperature_c"],
+        cpu_count_logical=raw["cpu_count_logical"],
+        cpu_count_physical=raw["cpu_count_physical"],
+        memory_total_bytes=raw["memory_total_bytes"],
+        memory_used_bytes=raw["memory_used_bytes"],
+        memory_available_bytes=raw["memory_available_bytes"],
+        memory_percent=raw["memory_percent"],
+        swap_total_bytes=raw["swap_total_bytes"],
+        swap_used_bytes=raw["swap_used_bytes"],
+        swap_percent=raw["swap_percent"],
+        disk_read_bps=disk_read_bps_total,
+        disk_write_bps=disk_write_bps_total,
+        disk_read_iops=disk_read_iops_total,
+        disk_write_iops=disk_write_iops_total,
+        disk_util_percent=disk_max_util,
+        disk_avg_util_percent=disk_avg_util,
+        network_rx_bps=network_rx_bps,
+        network_tx_bps=network_tx_bps,
+        network_rx_bytes_total=raw["network_rx_bytes_total"],
+        network_tx_bytes_total=raw["network_tx_bytes_total"],
+        process_count=raw["process_count"],
+        fan_count=fan_count,
+        fan_max_rpm=fan_max_rpm,
+        fan_avg_rpm=fan_avg_rpm,
+        gpu_present=bool(gpus),
+        gpu_count=len(gpus),
+        top_gpu_util_percent=top_gpu_util,
+        avg_gpu_util_percent=avg_gpu_util,
+        top_gpu_memory_percent=top_gpu_mem,
+        avg_gpu_memory_percent=avg_gpu_mem,
+        bottleneck=bottleneck,
+        bottleneck_confidence=confidence,
+        bottleneck_reason=reason,
+        summaries=raw["summaries"],
+        devices=pack_devices(gpu_rows, disk_rows_to_create, fan_rows) if packed else {},
+    )
+    return snapshot, disk_rows_to_create, gpu_rows, fan_rows
 
-        for row in disk_rows_to_create:
-            row.snapshot = snapshot
-        if disk_rows_to_create:
-            DiskMetric.objects.bulk_create(disk_rows_to_create)
-
-        gpu_rows = [
-            GpuMetric(
-                snapshot=snapshot,
-                gpu_index=gpu["gpu_index"],
-                name=gpu["name"],
-                uuid=gpu.get("uuid", "") or "",
-                utilization_gpu_percent=gpu.get("utilization_gpu_percent"),
-                utilization_memory_percent=gpu.get("utilization_memory_percent"),
-                memory_total_bytes=gpu.get("memory_total_bytes", 0) or 0,
-                memory_used_bytes=gpu.get("memory_used_bytes", 0) or 0,
-                memory_percent=gpu.get("memory_percent"),
-                temperature_c=gpu.get("temperature_c"),
-                fan_speed_percent=gpu.get("fan_speed_percent"),
-                power_w=gpu.get("power_w"),
-                power_limit_w=gpu.get("power_limit_w"),
-            )
-            for gpu in gpus
-        ]
-        if gpu_rows:
-            GpuMetric.objects.bulk_create(gpu_rows)
 
-        fan_rows = [
-            FanMetric(snapshot=snapshot, label=fan["label"], speed_rpm=fan.get("speed_rpm", 0))
-            for fan in fans
-        ]
-        if fan_rows:
-            FanMetric.objects.bulk_create(fan_rows)
+def store_raw_metrics_for_server(
+    server: MonitoredServer,
+    raw_metrics: dict[str, Any],
+) -> MetricSnapshot:
+    with ingest_phase("normalize"):
+        raw = normalize_raw_metrics(raw_metrics)
+    agent_rates = raw["agent_rates"]
+
+    # Samples may arrive late (agent buffering, backfills): derive rates against the
+    # snapshot just before this one in time, not the newest one, and re-derive the
+    # snapshot just after it.  Both lookups are seeks on the (server, collected_at) index.
+    # Agent rates need no predecessor, but the successor still marks the sample late.
+    with ingest_phase("lookup"):
+        previous: MetricSnapshot | None = None
+        if not agent_rates:
+            previous = (
+                MetricSnapshot.objects.filter(server=server, collected_at__lt=raw["collected_at"])
+                .order_by("-collected_at")
+                .first()
+            )
+        successor = (
+            MetricSnapshot.objects.filter(server=server, collected_at__gt=raw["collected_at"])
+            .order_by("collected_at")
+            .first()
+        )
 
-        days = settings.MONITORING_RETENTION_DAYS if retention_days is None else retention_days
-        if days and days > 0:
-            cutoff = raw["collected_at"] - timedelta(days=days)
-            MetricSnapshot.objects.filter(server=server, collected_at__lt=cutoff).delete()
+        previous_disks = {disk.device: disk for disk in (snapshot_disks(previous) if previous else [])}
+    with ingest_phase("build"):
+        snapshot, disk_rows_to_create, gpu_rows, fan_rows = build_snapshot(
+            server, raw, previous=previous, previous_disks=previous_disks
+        )
+    packed = bool(snapshot.devices)
+    if not packed:
+        # The rows are still in memory: latest-state and callers need no query to read them back.
+        attach_devices(snapshot, {"gpus": gpu_rows, "disks": disk_rows_to_create, "fans": fan_rows})
+    disk_max_util = snapshot.disk_util_percent
+    top_gpu_util = snapshot.top_gpu_util_percent
+    gpus = raw["gpus"]
 
-    # Notifications (outside transaction to avoid delays on ingest)
     try:
-        # High utilization alerts
-        if raw["cpu_usage_percent"] >= 90:
-            create_notification(
-                level="warning",
-                title="High CPU usage",
-                message=f"CPU at {raw['cpu_usage_percent']:.0f}% on {server.name}",
-                code="high_cpu",
-                server=server,
-            )
-        if raw["memory_percent"] >= 90:
-            create_notification(
-                level="warning",
-                title="High memory usage",
-                message=f"Memory at {raw['memory_percent']:.0f}% on {server.name}",
-                code="high_mem",
-                server=server,
-            )
-        if disk_max_util >= 90:
-            create_notification(
-                level="warning",
-                title="High disk utilization",
-                message=f"Disk util at {disk_max_util:.0f}% on {server.name}",
-                code="high_disk",
-                server=server,
-            )
-        if top_gpu_util and top_gpu_util >= 95:
-            create_notification(
-                level="warning",
-                title="High GPU utilization",
-                message=f"GPU util at {top_gpu_util:.0f}% on {server.name}",
-                code="high_gpu",
-                server=server,
-            )
+        with transaction.atomic():
+            with ingest_phase("insert"):
+                snapshot.save(force_insert=True)
+
+                if not packed:
+                    for rows in (disk_rows_to_create, gpu_rows, fan_rows):
+                        for row in rows:
+                            row.snapshot = snapshot
+                    if disk_rows_to_create:
+                        DiskMetric.objects.bulk_create(disk_rows_to_create)
+                    if gpu_rows:
+                        GpuMetric.objects.bulk_create(gpu_rows)
+                    if fan_rows:
+                        FanMetric.objects.bulk_create(fan_rows)
+
+                if successor is not None:
+                    if not successor.rates_from_agent:
+                        _rederive_rates(successor, snapshot, {row.device: row for row in disk_rows_to_create})
+                    snapshot.late = True
+    except IntegrityError:
+        # Replayed sample: (server, seq) or (server, collected_at) is already stored.
+        existing = _find_stored_sample(server, raw)
+        if existing is None:
+            raise
+        existing.deduplicated = True
+        return existing
+
+    # Notifications run after commit, outside the transaction, so slow alerting
+    # (e.g. email) never holds database locks.
+    @ingest_phase("notify")
+    def notify() -> None:
+        try:
+            # High utilization alerts
+            if raw["cpu_usage_percent"] >= 90:
+                create_notification(
+                    level="warning",
+                    title="High CPU usage",
+                    message=f"CPU at {raw['cpu_usage_percent']:.0f}% on {server.name}",
+                    code="high_cpu",
+                    server=server,
+                )
+            if raw["memory_percent"] >= 90:
+                create_notification(
+                    level="warning",
+                    title="High memory usage",
+                    message=f"Memory at {raw['memory_percent']:.0f}% on {server.name}",
+                    code="high_mem",
+                    server=server,
+                )
+            if disk_max_util >= 90:
+                create_notification(
+                    level="warning",
+                    title="High disk utilization",
+                    message=f"Disk util at {disk_max_util:.0f}% on {server.name}",
+                    code="high_disk",
+                    server=server,
+                )
+            if top_gpu_util and top_gpu_util >= 95:
+                create_notification(
+                    level="warning",
+                    title="High GPU utilization",
+                    message=f"GPU util at {top_gpu_util:.0f}% on {server.name}",
+                    code="high_gpu",
+                    server=server,
+                )
 
-        # Hardware changes (additions only)
-        prev_gpu_count = previous.gpu_count if previous else 0
-        curr_gpu_count = len(gpus)
-        if curr_gpu_count > prev_gpu_count:
-            create_notification(
-                level="info",
-                title="New GPU detected",
-                message=f"{curr_gpu_count} GPU(s) present (was {prev_gpu_count}) on {server.name}",
-                code="gpu_added",
-                server=server,
-                cooldown_minutes=60,
-                email=False,
-            )
+            # Hardware changes (additions only); a late sample says nothing about current hardware.
+            if successor is not None:
+                return
+            curr_gpu_count = len(gpus)
+            curr_disk_count = len(raw["disks"])
+            baseline = _previous_hardware_counts(server, previous, previous_disks, agent_rates=agent_rates)
+            cache.set(_hardware_cache_key(server), (curr_gpu_count, curr_disk_count), timeout=None)
+            prev_gpu_count, prev_disk_count = baseline if baseline is not None else (curr_gpu_count, curr_disk_count)
+            if curr_gpu_count > prev_gpu_count:
+                create_notification(
+                    level="info",
+                    title="New GPU detected",
+                    message=f"{curr_gpu_count} GPU(s) present (was {prev_gpu_count}) on {server.name}",
+                    code="gpu_added",
+                    server=server,
+                    cooldown_minutes=60,
+                    email=False,
+                )
 
-        prev_disk_count = len(previous_disks) if previous else 0
-        curr_disk_count = len(raw["disks"])
-        if curr_disk_count > prev_disk_count:
-            create_notification(
-                level="info",
-                title="New disk detected",
-                message=f"{curr_disk_count} disk(s) present (was {prev_disk_count}) on {server.name}",
-                code="disk_added",
-                server=server,
-                cooldown_minutes=60,
-                email=False,
-            )
-    except Exception:
-        # Alerting failures should not block metric ingest
-        pass
+            if curr_disk_count > prev_disk_count:
+                create_notification(
+                    level="info",
+                    title="New disk detected",
+                    message=f"{curr_disk_count} disk(s) present (was {prev_disk_count}) on {server.name}",
+                    code="disk_added",
+                    server=server,
+                    cooldown_minutes=60,
+                    email=False,
+                )
+        except Exception:
+            # Alerting failures should not block metric ingest
+            pass
+
+    transaction.on_commit(notify)
 
     return snapshot
 
 
+@ingest_phase("heartbeat")
 def _update_server_heartbeat(
     server: MonitoredServer,
     *,
     collected_at: datetime | None = None,
     source_ip: str | None = None,
     agent_info: dict[str, Any] | None = None,
+    latest: MetricSnapshot | None = None,
 ) -> None:
     updates: list[str] = []
     if collected_at and server.last_seen_at != collected_at:
         server.last_seen_at = collected_at
         updates.append("last_seen_at")
+    if latest is not None:
+        server.latest_state = snapshot_state(latest)
+        updates.append("latest_state")
     if source_ip and server.last_ip != source_ip:
         server.last_ip = source_ip
         updates.append("last_ip")
@@ -889,6 +1192,59 @@ def _update_server_heartbeat(
             updates.append("agent_info")
     if updates:
         server.save(update_fields=list(dict.fromkeys(updates + ["updated_at"])))
+    if latest is not None:
+        transaction.on_commit(lambda: latest_states.publish(server))
+
+
+def _newest_fresh(snapshots: list[MetricSnapshot]) -> MetricSnapshot | None:
+    """Newest snapshot stored by this call: late samples and replays never replace the latest state."""
+    fresh = [
+        snap for snap in snapshots if not getattr(snap, "late", False) and not getattr(snap, "deduplicated", False)
+    ]
+    return max(fresh, key=lambda snap: snap.collected_at, default=None)
+
+
+def _schedule_retention(server: MonitoredServer, collected_at: datetime) -> None:
+    """Drop ``server``'s expired day partitions, after (never inside) the ingest transaction.
+
+    With the single writer the drop is queued behind the pending writes in
+    batches of ``RETENTION_BATCH`` snapshots, each batch re-queued after the
+    writes that arrived meanwhile.  Without it, each ingest request drops one
+    batch until the server is done.
+    """
+    days = settings.MONITORING_RETENTION_DAYS
+    if not days or days <= 0:
+        return
+    cutoff = collected_at - timedelta(days=days)
+    if not retention_due(server, cutoff):
+        return
+    with _retention_guard:
+        if server.pk in _retention_queued:
+            return
+        _retention_queued.add(server.pk)
+    if not settings.MONITORING_INGEST_SINGLE_WRITER:
+        _retention_step(server, cutoff)
+    elif not ingest_writer.submit(_retention_step, server, cutoff):
+        with _retention_guard:
+            _retention_queued.discard(server.pk)
+
+
+def _retention_step(server: MonitoredServer, cutoff: datetime) -> None:
+    more = False
+    try:
+        with ingest_phase("retention"):
+            more = expire_partitions(server, cutoff, limit=RETENTION_BATCH) >= RETENTION_BATCH
+    except Exception:
+        # Retention is retried by the next ingest; it must never fail one.
+        logger.exception("Retention failed for server=%s", server.slug)
+    if more and ingest_writer.submit(_retention_step, server, cutoff):
+        return
+    with _retention_guard:
+        _retention_queued.discard(server.pk)
+
+
+def _agent_info(payload: Any) -> dict[str, Any]:
+    return payload.get("agent") if isinstance(payload, dict) and isinstance(payload.get("agent"), dict) else {}
 
 
 def ingest_sample_for_server(
@@ -900,21 +1256,58 @@ def ingest_sample_for_server(
     sample = payload.get("sample") if isinstance(payload, dict) else None
     if not isinstance(sample, dict):
         sample = payload if isinstance(payload, dict) else {}
-    agent_info = payload.get("agent") if isinstance(payload, dict) and isinstance(payload.get("agent"), dict) else {}
-    retention_days = payload.get("retention_days") if isinstance(payload, dict) else None
-    if not isinstance(retention_days, int):
-        retention_days = None
-
-    snapshot = store_raw_metrics_for_server(server, sample, retention_days=retention_days)
-    _update_server_heartbeat(
-        server,
-        collected_at=snapshot.collected_at,
-        source_ip=source_ip,
-        agent_info=agent_info,
-    )
+    agent_info = _agent_info(payload)
+    with serialized_ingest(server):
+        with ingest_phase("expand"):
+            sample = expand_samples(server, [sample])[0]
+        snapshot = store_raw_metrics_for_server(server, sample)
+        latest = _newest_fresh([snapshot])
+        _update_server_heartbeat(
+            server,
+            collected_at=latest.collected_at if latest is not None else None,
+            source_ip=source_ip,
+            agent_info=agent_info,
+            latest=latest,
+        )
+    if latest is not None:
+        _schedule_retention(server, latest.collected_at)
     return snapshot
 
 
+def ingest_samples_for_server(
+    server: MonitoredServer,
+    payload: dict[str, Any],
+    *,
+    source_ip: str | None = None,
+) -> list[MetricSnapshot]:
+    """Store a batch of queued samples (oldest first) sent in one request.
+
+    Each sample derives its rates from the stored sample just before it in
+    time, so batches may overlap or arrive out of order.  The batch is one
+    transaction; the heartbeat update runs once per batch.
+    """
+    agent_info = _agent_info(payload)
+
+    snapshots: list[MetricSnapshot] = []
+    with serialized_ingest(server):
+        with ingest_phase("expand"):
+            samples = expand_samples(server, [s for s in payload.get("samples") or [] if isinstance(s, dict)])
+        for sample in samples:
+            snapshots.append(store_raw_metrics_for_server(server, sample))
+        if snapshots:
+            latest = _newest_fresh(snapshots)
+            _update_server_heartbeat(
+                server,
+                collected_at=latest.collected_at if latest is not None else None,
+                source_ip=source_ip,
+                agent_info=agent_info,
+                latest=latest,
+            )
+    if snapshots and latest is not None:
+        _schedule_retention(server, latest.collected_at)
+    return snapshots
+
+
 def _get_or_create_local_server() -> MonitoredServer:
     slug = os.environ.get("MONITORING_LOCAL_SERVER_SLUG", "local")
     name = os.environ.get("MONITORING_LOCAL_SERVER_NAME", "Local Host")
@@ -929,14 +1322,22 @@ def collect_and_store(
 ) -> MetricSnapshot:
     target_server = server or _get_or_create_local_server()
     raw = collect_raw_metrics()
-    snapshot = store_raw_metrics_for_server(target_server, raw, retention_days=retention_days)
-    _update_server_heartbeat(
-        target_server,
-        collected_at=snapshot.collected_at,
-        agent_info={
-            "hostname": socket.gethostname(),
-            "user": _current_user_name(),
-            "version": "django-local-collector",
-        },
-    )
+    with serialized_ingest(target_server):
+        snapshot = store_raw_metrics_for_server(target_server, raw)
+        _update_server_heartbeat(
+            target_server,
+            collected_at=snapshot.collected_at,
+            agent_info={
+                "hostname": socket.gethostname(),
+                "user": _current_user_name(),
+                "version": "django-local-collector",
+            },
+            latest=_newest_fresh([snapshot]),
+        )
+    # Outside the sample's transaction: the collector is a background loop, not a request.
+    days = settings.MONITORING_RETENTION_DAYS if retention_days is None else retention_days
+    if days and days > 0:
+        cutoff = snapshot.collected_at - timedelta(days=days)
+        if retention_due(target_server, cutoff):
+            expire_partitions(target_server, cutoff)
     return snapshot
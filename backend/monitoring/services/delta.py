@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import copy
+from typing import Any
+
+from monitoring.models import MonitoredServer
+
+# Device lists travel as objects keyed by these fields so a delta can address one device.
+LIST_KEYS = {"gpus": "gpu_index", "disks": "device", "fans": "label"}
+# Keys that make a sample part of the keyframe/delta protocol rather than a plain full sample.
+_WIRE_KEYS = ("keyframe", "base_seq", "delta")
+
+
+class KeyframeRequired(Exception):
+    """A delta sample referenced a keyframe this webapp does not hold."""
+
+
+def _index_lists(sample: dict[str, Any]) -> dict[str, Any]:
+    indexed = dict(sample)
+    for name, key in LIST_KEYS.items():
+        items = sample.get(name)
+        if isinstance(items, list):
+            keyed: dict[str, Any] = {}
+            for item in items:
+                if not isinstance(item, dict):
+                    continue
+                ident = str(item.get(key))
+                while ident in keyed:  # e.g. two sensors both labelled "fan1"
+                    ident += "#"
+                keyed[ident] = item
+            indexed[name] = keyed
+    return indexed
+
+
+def _unindex_lists(sample: dict[str, Any]) -> dict[str, Any]:
+    plain = dict(sample)
+    for name in LIST_KEYS:
+        items = sample.get(name)
+        if isinstance(items, dict):
+            plain[name] = [item for item in items.values() if isinstance(item, dict)]
+    return plain
+
+
+def _merge_patch(target: Any, patch: Any) -> Any:
+    """RFC 7386 JSON merge patch: objects merge recursively, ``null`` deletes a key."""
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = _merge_patch(result.get(key), value)
+    return result
+
+
+def expand_samples(server: MonitoredServer, samples: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Turn keyframe/delta wire samples back into full samples, in order.
+
+    - ``{"keyframe": true, "seq": N, ...}`` is a full sample that becomes the
+      server's new base (persisted on the server row, so every worker sees it)
+    - ``{"base_seq": N, "delta": {...}}`` is a merge patch against base ``N``
+    - anything else is a plain full sample and passes through unchanged
+
+    All samples are expanded before any is stored, so a stale delta anywhere
+    in a batch rejects the whole batch and the agent can resend it intact.
+    Call it under ``serialized_ingest``: the base is re-read there, since
+    ``server`` was loaded before the lock and an overlapping request may have
+    moved it.
+    """
+    if not any(key in sample for sample in samples for key in _WIRE_KEYS):
+        return samples
+    server.refresh_from_db(fields=["delta_base"])
+    base = server.delta_base if isinstance(server.delta_base, dict) else {}
+    new_base: dict[str, Any] | None = None
+    expanded: list[dict[str, Any]] = []
+    for sample in samples:
+        if isinstance(sample.get("delta"), dict):
+            if base.get("seq") is None or sample.get("base_seq") != base.get("seq"):
+                raise KeyframeRequired(f"No keyframe {sample.get('base_seq')!r} for server {server.slug}")
+            full = _unindex_lists(_merge_patch(base["sample"], sample["delta"]))
+            if "seq" in sample:
+                full["seq"] = sample["seq"]
+            expanded.append(full)
+            continue
+        full = {k: v for k, v in sample.items() if k not in ("keyframe", "base_seq")}
+        if sample.get("keyframe") and isinstance(sample.get("seq"), int):
+            base = {"seq": sample["seq"], "sample": _index_lists({k: v for k, v in full.items() if k != "seq"})}
+            new_base = base
+        expanded.append(full)
+
+    if new_base is not None:
+        server.delta_base = new_base
+        server.save(update_fields=["delta_base"])
+    return expanded
+
+
+def keyframe_seq(server: MonitoredServer) -> int | None:
+    base = server.delta_base if isinstance(server.delta_base, dict) else {}
+    seq = base.get("seq")
+    return seq if isinstance(seq, int) else None
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import math
+from types import SimpleNamespace
+from typing import Any, Iterable
+
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+
+from monitoring.models import MetricSnapshot
+
+# Packed layout version 1: one positional array per device, fields in this order.
+PACKED_VERSION = 1
+GPU_FIELDS = (
+    "gpu_index",
+    "name",
+    "uuid",
+    "utilization_gpu_percent",
+    "utilization_memory_percent",
+    "memory_total_bytes",
+    "memory_used_bytes",
+    "memory_percent",
+    "temperature_c",
+    "fan_speed_percent",
+    "power_w",
+    "power_limit_w",
+)
+DISK_FIELDS = (
+    "device",
+    "read_bytes_total",
+    "write_bytes_total",
+    "read_count_total",
+    "write_count_total",
+    "busy_time_ms_total",
+    "read_bps",
+    "write_bps",
+    "read_iops",
+    "write_iops",
+    "util_percent",
+)
+FAN_FIELDS = ("label", "speed_rpm")
+DEVICE_FIELDS = {"gpus": GPU_FIELDS, "disks": DISK_FIELDS, "fans": FAN_FIELDS}
+
+_DECODED_ATTR = "_decoded_devices"
+
+
+def packed_storage_enabled() -> bool:
+    """True when new snapshots keep GPU/disk/fan readings in ``MetricSnapshot.devices``."""
+    return str(settings.MONITORING_DEVICE_STORAGE).strip().lower() == "packed"
+
+
+def pack_devices(gpus: Iterable[Any], disks: Iterable[Any], fans: Iterable[Any]) -> dict[str, Any]:
+    """Pack device readings (model rows or namespaces) into the compact ``devices`` column.
+
+    ``{"v": 1, "gpus": [[0, "NVIDIA H100", ...], ...], "disks": [...], "fans": [...]}``:
+    one array per device in ``*_FIELDS`` order, so field names are not
+    repeated per device and a snapshot costs one column instead of ~20 rows.
+    NaN and infinite readings are packed as ``None``, as row storage keeps
+    them: JSON has no way to spell them.
+    """
+    packed: dict[str, Any] = {"v": PACKED_VERSION}
+    for kind, items in (("gpus", gpus), ("disks", disks), ("fans", fans)):
+        fields = DEVICE_FIELDS[kind]
+        packed[kind] = [[_json_value(getattr(item, field)) for field in fields] for item in items]
+    return packed
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _unpack(packed: dict[str, Any]) -> dict[str, list[SimpleNamespace]]:
+    decoded: dict[str, list[SimpleNamespace]] = {}
+    for kind, fields in DEVICE_FIELDS.items():
+        decoded[kind] = [SimpleNamespace(**dict(zip(fields, row))) for row in packed.get(kind) or []]
+    return decoded
+
+
+def is_packed(snapshot: MetricSnapshot) -> bool:
+    return bool(snapshot.devices) and snapshot.devices.get("v") == PACKED_VERSION
+
+
+def _device_list(snapshot: MetricSnapshot, kind: str) -> list[Any]:
+    decoded = getattr(snapshot, _DECODED_ATTR, None)
+    if decoded is None:
+        decoded = _unpack(snapshot.devices) if is_packed(snapshot) else {}
+        setattr(snapshot, _DECODED_ATTR, decoded)
+    if kind not in decoded:
+        decoded[kind] = list(getattr(snapshot, kind).all())
+    return decoded[kind]
+
+
+def snapshot_devices(snapshot: MetricSnapshot) -> dict[str, list[Any]]:
+    """``{"gpus": [...], "disks": [...], "fans": [...]}`` for a snapshot in either storage mode.
+
+    Packed snapshots are decoded in one pass and the result is kept on the
+    instance; row-stored snapshots read their (ideally prefetched) child rows.
+    Items expose the same attributes either way.
+    """
+    return {kind: _device_list(snapshot, kind) for kind in DEVICE_FIELDS}
+
+
+def snapshot_gpus(snapshot: MetricSnapshot) -> list[Any]:
+    return _device_list(snapshot, "gpus")
+
+
+def snapshot_disks(snapshot: MetricSnapshot) -> list[Any]:
+    return _device_list(snapshot, "disks")
+
+
+def snapshot_fans(snapshot: MetricSnapshot) -> list[Any]:
+    return _device_list(snapshot, "fans")
+
+
+def attach_devices(snapshot: Any, devices: dict[str, list[Any]]) -> None:
+    """Give a snapshot-like object (e.g. a point decoded from a chunk) its device readings."""
+    setattr(snapshot, _DECODED_ATTR, devices)
+
+
+def load_devices(snapshots: list[Any]) -> list[Any]:
+    """Prefetch child rows for the row-stored snapshots only; packed or decoded ones need no query."""
+    unpacked = [
+        snapshot
+        for snapshot in snapshots
+        if getattr(snapshot, _DECODED_ATTR, None) is None and not is_packed(snapshot)
+    ]
+    if unpacked:
+        prefetch_related_objects(unpacked, "gpus", "disks", "fans")
+    return snapshots
+
@@ -0,0 +1,178 @@
+"""Streaming export of stored metrics as NDJSON or CSV.
+
+Rows are produced from ``values_list`` projections read with
+``.iterator(chunk_size=...)``, merged in time order with compacted chunks
+(decoded one at a time) and archived days (read one day at a time), and
+written out in blocks of ``chunk_size`` lines.  Memory stays flat however
+long the range is.
+"""
+from __future__ import annotations
+
+import csv
+import heapq
+import json
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+from operator import itemgetter
+from typing import Any, Iterable, Iterator
+
+from monitoring.models import DiskMetric, FanMetric, GpuMetric, MetricChunk, MetricSnapshot, MonitoredServer
+from monitoring.services.archive import archive_enabled, read_archive
+from monitoring.services.chunks import FLOAT_COLUMNS, INT_COLUMNS, TEXT_COLUMNS, decode_chunk
+from monitoring.services.devices import DEVICE_FIELDS, PACKED_VERSION, snapshot_devices
+from monitoring.services.history import live_since
+from monitoring.services.partitions import in_time_range, partition_day_for
+
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_TABLES = ("snapshots", "gpus", "disks", "fans")
+DEFAULT_CHUNK_SIZE = 2000
+
+SNAPSHOT_COLUMNS = ("collected_at", *FLOAT_COLUMNS, *INT_COLUMNS, *TEXT_COLUMNS, "summaries")
+_DEVICE_MODELS = {"gpus": GpuMetric, "disks": DiskMetric, "fans": FanMetric}
+
+
+def export_columns(table: str) -> tuple[str, ...]:
+    """Column names of an export table, after the leading ``server`` column."""
+    if table == "snapshots":
+        return SNAPSHOT_COLUMNS
+    return ("collected_at", *DEVICE_FIELDS[table])
+
+
+def _point_rows(points: Iterable[Any], table: str) -> Iterator[tuple]:
+    """Rows of decoded points (chunks, archive) in the same layout as the database projections."""
+    for point in points:
+        if table == "snapshots":
+            yield tuple(getattr(point, column) for column in SNAPSHOT_COLUMNS)
+            continue
+        for item in snapshot_devices(point)[table]:
+            yield (point.collected_at, *(getattr(item, field) for field in DEVICE_FIELDS[table]))
+
+
+def _chunk_rows(server: MonitoredServer, since: datetime, until: datetime | None, table: str) -> Iterator[tuple]:
+    chunks = MetricChunk.objects.filter(server=server, end_at__gt=since)
+    if until is not None:
+        chunks = chunks.filter(start_at__lt=until)
+    for data in chunks.order_by("start_at").values_list("data", flat=True).iterator(chunk_size=1):
+        columns = set(SNAPSHOT_COLUMNS) if table == "snapshots" else set()
+        points = (
+            point
+            for point in decode_chunk(data, server=server, columns=columns)
+            if point.collected_at >= since and (until is None or point.collected_at < until)
+        )
+        yield from _point_rows(points, table)
+
+
+def _archive_rows(server: MonitoredServer, since: datetime, until: datetime, table: str) -> Iterator[tuple]:
+    columns = set(SNAPSHOT_COLUMNS) if table == "snapshots" else {table}
+    day = partition_day_for(since)
+    while day <= partition_day_for(until):
+        day_start = datetime.combine(day, dt_time.min, tzinfo=dt_timezone.utc)
+        start, end = max(since, day_start), min(until, day_start + timedelta(days=1))
+        if start < end:
+            yield from _point_rows(read_archive(server, start, end, columns=columns), table)
+        day += timedelta(days=1)
+
+
+def _live_rows(
+    server: MonitoredServer,
+    since: datetime,
+    until: datetime | None,
+    table: str,
+    chunk_size: int,
+) -> Iterator[tuple]:
+    snapshots = in_time_range(MetricSnapshot.objects.filter(server=server), since, until).order_by("collected_at")
+    if table == "snapshots":
+        raw = snapshots.values_list(*SNAPSHOT_COLUMNS).iterator(chunk_size=chunk_size)
+        return heapq.merge(raw, _chunk_rows(server, since, until, table), key=itemgetter(0))
+
+    fields = DEVICE_FIELDS[table]
+    key_field = fields[0]
+    packed = (
+        (collected_at, *row)
+        for collected_at, devices in snapshots.filter(devices__has_key="v")
+        .values_list("collected_at", "devices")
+        .iterator(chunk_size=chunk_size)
+        if devices.get("v") == PACKED_VERSION
+        for row in devices.get(table) or []
+    )
+    device_rows = _DEVICE_MODELS[table].objects.filter(
+        snapshot__server=server,
+        snapshot__collected_at__gte=since,
+        snapshot__partition_day__gte=partition_day_for(since),
+    )
+    if until is not None:
+        device_rows = device_rows.filter(
+            snapshot__collected_at__lt=until, snapshot__partition_day__lte=partition_day_for(until)
+        )
+    rows = (
+        device_rows.order_by("snapshot__collected_at", key_field)
+        .values_list("snapshot__collected_at", *fields)
+        .iterator(chunk_size=chunk_size)
+    )
+    return heapq.merge(packed, rows, _chunk_rows(server, since, until, table), key=itemgetter(0))
+
+
+def export_rows(
+    server: MonitoredServer,
+    since: datetime,
+    until: datetime,
+    table: str = "snapshots",
+    *,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[tuple]:
+    """Rows of ``table`` for ``server`` in ``[since, until)``, oldest first, as ``export_columns`` tuples.
+
+    Covers every storage tier: raw snapshots (row or packed devices),
+    compacted chunks and, when enabled, the columnar archive.
+    """
+    live_from: datetime | None = since
+    if archive_enabled():
+        boundary = live_since(server)
+        live_from = None if boundary is None else max(since, boundary)
+        archive_until = until if boundary is None else min(until, boundary)
+        if since < archive_until:
+            yield from _archive_rows(server, since, archive_until, table)
+    if live_from is not None and live_from < until:
+        yield from _live_rows(server, live_from, until, table, chunk_size)
+
+
+def _json_value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the CSV line back to the caller."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def stream_export(
+    servers: Iterable[MonitoredServer],
+    since: datetime,
+    until: datetime,
+    *,
+    table: str = "snapshots",
+    fmt: str = "ndjson",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[str]:
+    """Encoded export text in blocks of up to ``chunk_size`` lines (a header line first for CSV)."""
+    columns = ("server", *export_columns(table))
+    writer = csv.writer(_Echo()) if fmt == "csv" else None
+    if writer is not None:
+        yield writer.writerow(columns)
+    for server in servers:
+        block: list[str] = []
+        for row in export_rows(server, since, until, table, chunk_size=chunk_size):
+            if writer is not None:
+                values = [server.slug, row[0].isoformat()]
+                values.extend(json.dumps(value) if isinstance(value, dict) else value for value in row[1:])
+                block.append(writer.writerow(values))
+            else:
+                record = {"server": server.slug}
+                record.update(zip(columns[1:], map(_json_value, row)))
+                block.append(json.dumps(record, separators=(",", ":")) + "\n")
+            if len(block) >= chunk_size:
+                yield "".join(block)
+                block = []
+        if block:
+            yield "".join(block)
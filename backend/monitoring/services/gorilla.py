@@ -0,0 +1,192 @@
+"""Gorilla-style time-series compression (Pelkonen et al., VLDB 2015).
+
+Two codecs over a shared bit stream:
+
+- :func:`encode_ints` stores the first value in full, then the
+  delta-of-delta of each value in a variable-size bucket.  Regular
+  timestamps and steadily increasing counters cost one bit per sample.
+- :func:`encode_floats` stores the first value in full, then the XOR with
+  the previous value.  Repeated values cost one bit; small changes reuse
+  the previous leading/trailing-zero window.
+
+Both accept ``None`` entries: a presence bitmap is written first when the
+series has gaps, and only present values are encoded.
+"""
+from __future__ import annotations
+
+import struct
+from typing import Sequence
+
+# Delta-of-delta buckets: (prefix, prefix bits, value bits); anything larger uses ESCAPE.
+_DOD_BUCKETS = ((0b10, 2, 7), (0b110, 3, 9), (0b1110, 4, 12))
+_DOD_ESCAPE = (0b1111, 4, 68)
+
+
+class BitWriter:
+    def __init__(self) -> None:
+        self._buf = bytearray()
+        self._acc = 0
+        self._bits = 0
+
+    def write(self, value: int, nbits: int) -> None:
+        self._acc = (self._acc << nbits) | (value & ((1 << nbits) - 1))
+        self._bits += nbits
+        if self._bits >= 64:
+            whole = self._bits - self._bits % 8
+            self._bits -= whole
+            self._buf += (self._acc >> self._bits).to_bytes(whole // 8, "big")
+            self._acc &= (1 << self._bits) - 1
+
+    def getvalue(self) -> bytes:
+        data = bytes(self._buf)
+        if self._bits:
+            whole = (self._bits + 7) // 8
+            data += (self._acc << (whole * 8 - self._bits)).to_bytes(whole, "big")
+        return data
+
+
+class BitReader:
+    """Reads from a ``'0101...'`` string: slicing and ``int(s, 2)`` are the fastest pure-Python bit ops."""
+
+    def __init__(self, data: bytes) -> None:
+        self._bits = format(int.from_bytes(data, "big"), f"0{len(data) * 8}b") if data else ""
+        self.pos = 0
+
+    def read(self, nbits: int) -> int:
+        pos = self.pos
+        self.pos = pos + nbits
+        return int(self._bits[pos : pos + nbits], 2)
+
+    def read_bit(self) -> bool:
+        pos = self.pos
+        self.pos = pos + 1
+        return self._bits[pos] == "1"
+
+    def read_signed(self, nbits: int) -> int:
+        value = self.read(nbits)
+        return value - (1 << nbits) if value >> (nbits - 1) else value
+
+
+def _write_presence(writer: BitWriter, values: Sequence[object]) -> None:
+    for value in values:
+        writer.write(value is not None, 1)
+
+
+def _read_presence(reader: BitReader, count: int) -> list[bool]:
+    return [reader.read_bit() for _ in range(count)]
+
+
+def encode_ints(values: Sequence[int | None]) -> tuple[bytes, bool]:
+    """Return ``(stream, has_gaps)`` for a series of integers (or ``None``)."""
+    writer = BitWriter()
+    has_gaps = any(value is None for value in values)
+    if has_gaps:
+        _write_presence(writer, values)
+    present = [int(value) for value in values if value is not None]
+    if present:
+        writer.write(present[0], 64)
+        prev, prev_delta = present[0], 0
+        for value in present[1:]:
+            delta = value - prev
+            dod = delta - prev_delta
+            if dod == 0:
+                writer.write(0, 1)
+            else:
+                for prefix, prefix_bits, nbits in _DOD_BUCKETS:
+                    if -(1 << (nbits - 1)) <= dod < (1 << (nbits - 1)):
+                        break
+                else:
+                    prefix, prefix_bits, nbits = _DOD_ESCAPE
+                writer.write(prefix, prefix_bits)
+                writer.write(dod, nbits)
+            prev, prev_delta = value, delta
+    return writer.getvalue(), has_gaps
+
+
+def decode_ints(stream: bytes, count: int, has_gaps: bool) -> list[int | None]:
+    reader = BitReader(stream)
+    presence = _read_presence(reader, count) if has_gaps else None
+    present = sum(presence) if presence is not None else count
+    values: list[int] = []
+    if present:
+        prev = reader.read_signed(64)
+        values.append(prev)
+        delta = 0
+        for _ in range(present - 1):
+            if reader.read_bit():
+                if not reader.read_bit():
+                    dod = reader.read_signed(7)
+                elif not reader.read_bit():
+                    dod = reader.read_signed(9)
+                elif not reader.read_bit():
+                    dod = reader.read_signed(12)
+                else:
+                    dod = reader.read_signed(68)
+                delta += dod
+            prev += delta
+            values.append(prev)
+    return _with_gaps(values, presence)
+
+
+def _float_bits(values: Sequence[float]) -> list[int]:
+    return list(struct.unpack(f">{len(values)}Q", struct.pack(f">{len(values)}d", *values)))
+
+
+def encode_floats(values: Sequence[float | None]) -> tuple[bytes, bool]:
+    """Return ``(stream, has_gaps)`` for a series of floats (or ``None``)."""
+    writer = BitWriter()
+    has_gaps = any(value is None for value in values)
+    if has_gaps:
+        _write_presence(writer, values)
+    present = _float_bits([float(value) for value in values if value is not None])
+    if present:
+        prev = present[0]
+        writer.write(prev, 64)
+        lead = trail = -1
+        for bits in present[1:]:
+            xor = bits ^ prev
+            if xor == 0:
+                writer.write(0, 1)
+            else:
+                leading = min(64 - xor.bit_length(), 31)
+                trailing = (xor & -xor).bit_length() - 1
+                if lead >= 0 and leading >= lead and trailing >= trail:
+                    writer.write(0b10, 2)
+                    writer.write(xor >> trail, 64 - lead - trail)
+                else:
+                    lead, trail = leading, trailing
+                    meaningful = 64 - leading - trailing
+                    writer.write(0b11, 2)
+                    writer.write(leading, 5)
+                    writer.write(meaningful & 63, 6)  # 64 meaningful bits are stored as 0
+                    writer.write(xor >> trailing, meaningful)
+            prev = bits
+    return writer.getvalue(), has_gaps
+
+
+def decode_floats(stream: bytes, count: int, has_gaps: bool) -> list[float | None]:
+    reader = BitReader(stream)
+    presence = _read_presence(reader, count) if has_gaps else None
+    present = sum(presence) if presence is not None else count
+    bits_out: list[int] = []
+    if present:
+        prev = reader.read(64)
+        bits_out.append(prev)
+        lead = trail = 0
+        for _ in range(present - 1):
+            if reader.read_bit():
+                if reader.read_bit():
+                    lead = reader.read(5)
+                    meaningful = reader.read(6) or 64
+                    trail = 64 - lead - meaningful
+                prev ^= reader.read(64 - lead - trail) << trail
+            bits_out.append(prev)
+    values = list(struct.unpack(f">{len(bits_out)}d", struct.pack(f">{len(bits_out)}Q", *bits_out)))
+    return _with_gaps(values, presence)
+
+
+def _with_gaps(values: list, presence: list[bool] | None) -> list:
+    if presence is None:
+        return values
+    it = iter(values)
+    return [next(it) if present else None for present in presence]
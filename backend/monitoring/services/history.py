@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import math
+from datetime import datetime, time as dt_time, timezone as dt_timezone
+from typing import Any
+
+from monitoring.models import MetricChunk, MetricSnapshot, MonitoredServer
+from monitoring.services.archive import archive_enabled, count_archived, read_archive
+from monitoring.services.chunks import history_snapshots
+
+
+def live_since(server: MonitoredServer) -> datetime | None:
+    """Start of the oldest day of ``server`` still in the database (raw or chunked), or None."""
+    days = [
+        MetricSnapshot.objects.filter(server=server)
+        .order_by("collected_at")
+        .values_list("partition_day", flat=True)
+        .first(),
+        MetricChunk.objects.filter(server=server).order_by("end_at").values_list("partition_day", flat=True).first(),
+    ]
+    days = [day for day in days if day is not None]
+    if not days:
+        return None
+    return datetime.combine(min(days), dt_time.min, tzinfo=dt_timezone.utc)
+
+
+def history_points(
+    server: MonitoredServer,
+    since: datetime,
+    until: datetime | None = None,
+    *,
+    columns: set[str] | None = None,
+    max_points: int | None = None,
+) -> tuple[list[Any], int]:
+    """History of ``server`` in ``[since, until)`` routed across storage tiers; ``(points, stride)``.
+
+    Days still in the database are read from raw snapshots and compacted
+    chunks (``services.chunks``); older days from the columnar archive
+    (``services.archive``).  With ``max_points`` every ``stride``-th point is
+    kept; archived points are skipped on disk rather than decoded.
+    """
+    use_archive = False
+    archive_until = until
+    live_from: datetime | None = since
+    if archive_enabled():
+        boundary = live_since(server)
+        if boundary is None:
+            use_archive, live_from = True, None
+        elif since < boundary:
+            use_archive, live_from = True, boundary
+            archive_until = boundary if until is None else min(until, boundary)
+    archived = count_archived(server, since, archive_until) if use_archive else 0
+
+    live: list[Any] = []
+    if live_from is not None and (until is None or live_from < until):
+        live = history_snapshots(server, live_from, until, columns=columns)
+
+    stride = 1
+    total = archived + len(live)
+    if max_points is not None and total > max_points:
+        stride = math.ceil(total / max_points)
+        live = live[::stride]
+    cold = read_archive(server, since, archive_until, columns=columns, stride=stride) if archived else []
+    return cold + live, stride
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Any
+
+from django.conf import settings
+
+# Only samples from the last minute count towards the current load.
+LOAD_HORIZON_SECONDS = 60.0
+
+
+class IngestLoad:
+    """Recent ingest latency and database lock failures for this process.
+
+    Every worker process keeps its own window.  That is enough for
+    back-pressure: agents are spread over all workers, so each worker sees a
+    representative slice of the load.
+    """
+
+    def __init__(self, window: int = 512) -> None:
+        self._lock = threading.Lock()
+        self._latencies: deque[tuple[float, float]] = deque(maxlen=window)
+        self._lock_errors: deque[float] = deque(maxlen=window)
+
+    def record(self, duration_ms: float) -> None:
+        with self._lock:
+            self._latencies.append((time.monotonic(), duration_ms))
+
+    def record_lock_error(self) -> None:
+        with self._lock:
+            self._lock_errors.append(time.monotonic())
+
+    def reset(self) -> None:
+        with self._lock:
+            self._latencies.clear()
+            self._lock_errors.clear()
+
+    def stats(self) -> dict[str, Any]:
+        cutoff = time.monotonic() - LOAD_HORIZON_SECONDS
+        with self._lock:
+            durations = sorted(ms for at, ms in self._latencies if at >= cutoff)
+            lock_errors = sum(1 for at in self._lock_errors if at >= cutoff)
+        p95 = durations[min(len(durations) - 1, math.ceil(0.95 * len(durations)) - 1)] if durations else 0.0
+        return {"samples": len(durations), "p95_ms": round(p95, 1), "lock_errors": lock_errors}
+
+    def load_factor(self) -> float:
+        """1.0 or less means healthy; 2.0 means roughly twice the load the target allows."""
+        stats = self.stats()
+        target = max(1.0, float(settings.MONITORING_INGEST_TARGET_P95_MS))
+        factor = stats["p95_ms"] / target if stats["samples"] >= 5 else 0.0
+        if stats["lock_errors"]:
+            factor = max(factor, 1.0 + stats["lock_errors"] / 5.0)
+        return factor
+
+
+ingest_load = IngestLoad()
+
+
+def ingest_advice(base_interval: float) -> dict[str, Any]:
+    """Interval and retry-after hints for agents, scaled by the current ingest load.
+
+    The interval is stretched in power-of-two steps (2x, 4x, ...) up to
+    ``MONITORING_INGEST_MAX_SLOWDOWN`` so it does not flap with every
+    latency wobble.  ``retry_after_seconds`` is only set once the maximum
+    slowdown is reached and agents should hold their queued samples a while.
+    """
+    factor = ingest_load.load_factor()
+    if factor <= 1.0:
+        return {"interval_seconds": None, "retry_after_seconds": None, "load_factor": round(factor, 2)}
+    max_slowdown = max(1, int(settings.MONITORING_INGEST_MAX_SLOWDOWN))
+    slowdown = min(max_slowdown, 2 ** math.ceil(math.log2(factor)))
+    interval = round(base_interval * slowdown, 2)
+    return {
+        "interval_seconds": interval,
+        "retry_after_seconds": math.ceil(interval) if slowdown >= max_slowdown else None,
+        "load_factor": round(factor, 2),
+    }
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from monitoring.models import MonitoredServer
+from monitoring.services.telemetry import record_phase
+
+# Servers share a fixed set of striped locks, so memory stays flat however many
+# servers a long-running process has seen.  Two servers on one stripe only wait
+# for each other; ingest never holds two servers' locks at once.
+LOCK_STRIPES = 256
+_server_locks = tuple(threading.Lock() for _ in range(LOCK_STRIPES))
+
+
+def _server_lock(server_id: int) -> threading.Lock:
+    return _server_locks[server_id % LOCK_STRIPES]
+
+
+@contextmanager
+def serialized_ingest(server: MonitoredServer) -> Iterator[None]:
+    """Run one server's ingest writes one at a time, inside a single transaction.
+
+    Threads of this process wait on a lock per server (striped, see
+    ``LOCK_STRIPES``), so different servers keep ingesting in parallel.  Across worker processes the server row is
+    locked with ``SELECT ... FOR UPDATE`` before anything is read, which makes
+    "read the neighbouring snapshots, then insert" atomic per server.  SQLite
+    has no row locks; there a no-op UPDATE of the row takes the database write
+    lock up front, which is the only write concurrency SQLite offers anyway.
+    """
+    started = time.perf_counter()
+    with _server_lock(server.pk), transaction.atomic():
+        rows = MonitoredServer.objects.filter(pk=server.pk)
+        if connection.features.has_select_for_update:
+            list(rows.select_for_update().values_list("pk", flat=True))
+        else:
+            rows.update(updated_at=F("updated_at"))
+        record_phase("lock", time.perf_counter() - started)
+        yield
@@ -0,0 +1,252 @@
+"""The newest reading of every server, kept where reading it costs nothing.
+
+Ingest writes a compact copy of the newest snapshot (headline columns plus
+the packed device readings) to ``MonitoredServer.latest_state`` in the same
+``UPDATE`` that moves ``last_seen_at``, and publishes it to an in-process
+store after commit.  Fleet-wide readers use :data:`latest_states`: their cost
+is one ``values()`` query over the servers table at most every
+``MONITORING_LATEST_STATE_TTL_SECONDS`` (for samples stored by other worker
+processes), and never a read of the snapshots table.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Iterable
+
+from django.conf import settings
+
+from monitoring.models import MetricSnapshot, MonitoredServer
+from monitoring.services.devices import (
+    DEVICE_FIELDS,
+    is_packed,
+    load_devices,
+    pack_devices,
+    snapshot_devices,
+)
+from monitoring.services.telemetry import Labels, format_labels, format_value, render_metric
+
+STATE_FIELDS = (
+    "cpu_usage_percent",
+    "cpu_iowait_percent",
+    "cpu_load_1",
+    "cpu_temperature_c",
+    "memory_percent",
+    "memory_used_bytes",
+    "memory_total_bytes",
+    "swap_percent",
+    "disk_util_percent",
+    "disk_read_bps",
+    "disk_write_bps",
+    "network_rx_bps",
+    "network_tx_bps",
+    "gpu_count",
+    "top_gpu_util_percent",
+    "avg_gpu_util_percent",
+    "top_gpu_memory_percent",
+    "fan_max_rpm",
+    "bottleneck",
+    "bottleneck_confidence",
+)
+ENTRY_FIELDS = ("id", "slug", "name", "hostname", "latest_state")
+
+
+def snapshot_state(snapshot: MetricSnapshot) -> dict[str, Any]:
+    """Compact JSON copy of ``snapshot`` for ``MonitoredServer.latest_state``.
+
+    ``devices`` uses the packed layout (``devices.DEVICE_FIELDS``) whichever
+    storage mode the snapshot itself was written in.
+    """
+    state: dict[str, Any] = {
+        "collected_at": snapshot.collected_at.isoformat(),
+        "ts": snapshot.collected_at.timestamp(),
+    }
+    for field in STATE_FIELDS:
+        state[field] = getattr(snapshot, field)
+    if is_packed(snapshot):
+        state["devices"] = snapshot.devices
+    else:
+        devices = snapshot_devices(snapshot)
+        state["devices"] = pack_devices(devices["gpus"], devices["disks"], devices["fans"])
+    return state
+
+
+class LatestStateStore:
+    """``latest_state`` of every active server, cached in this worker process.
+
+    :meth:`publish` applies this process's own ingests immediately; the
+    periodic refresh from the servers table picks up everything else (other
+    workers, disabled or deleted servers).  Servers stored before the column
+    existed get their state built once from their newest snapshot.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: dict[int, dict[str, Any]] = {}
+        self._loaded_at: float | None = None
+        self._backfilled: set[int] = set()
+
+    def publish(self, server: MonitoredServer) -> None:
+        entry = {field: getattr(server, field) for field in ENTRY_FIELDS}
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            current = self._entries.get(server.id)
+            if current is None or _ts(current) <= _ts(entry):
+                self._entries[server.id] = entry
+
+    def entries(self) -> list[dict[str, Any]]:
+        """Every active server's entry (``ENTRY_FIELDS``), ordered by slug."""
+        ttl = max(0.0, float(settings.MONITORING_LATEST_STATE_TTL_SECONDS))
+        with self._lock:
+            fresh = self._loaded_at is not None and time.monotonic() - self._loaded_at < ttl
+            if fresh:
+                return sorted(self._entries.values(), key=lambda entry: entry["slug"])
+        self._refresh()
+        with self._lock:
+            return sorted(self._entries.values(), key=lambda entry: entry["slug"])
+
+    def _refresh(self) -> None:
+        started = time.monotonic()
+        rows = list(MonitoredServer.objects.filter(is_active=True).values(*ENTRY_FIELDS, "last_seen_at"))
+        missing = [row for row in rows if not row["latest_state"] and row["last_seen_at"] is not None]
+        missing = [row for row in missing if row["id"] not in self._backfilled]
+        if missing:
+            self._backfill(missing)
+        with self._lock:
+            entries: dict[int, dict[str, Any]] = {}
+            for row in rows:
+                row.pop("last_seen_at")
+                current = self._entries.get(row["id"])
+                # A publish that landed while the query ran is newer than what it returned.
+                entries[row["id"]] = current if current is not None and _ts(current) > _ts(row) else row
+            self._entries = entries
+            self._loaded_at = started
+
+    def _backfill(self, rows: list[dict[str, Any]]) -> None:
+        for row in rows:
+            self._backfilled.add(row["id"])
+            snapshot = MetricSnapshot.objects.filter(server_id=row["id"]).order_by("-collected_at").first()
+            if snapshot is None:
+                continue
+            load_devices([snapshot])
+            row["latest_state"] = snapshot_state(snapshot)
+            MonitoredServer.objects.filter(pk=row["id"], latest_state={}).update(latest_state=row["latest_state"])
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries = {}
+            self._loaded_at = None
+            self._backfilled = set()
+
+
+def _ts(entry: dict[str, Any]) -> float:
+    return float((entry.get("latest_state") or {}).get("ts") or 0.0)
+
+
+latest_states = LatestStateStore()
+
+
+def unpack_state_devices(state: dict[str, Any], kind: str) -> list[dict[str, Any]]:
+    fields = DEVICE_FIELDS[kind]
+    return [dict(zip(fields, row)) for row in (state.get("devices") or {}).get(kind) or []]
+
+
+# (metric suffix, help text, state field); every value is a gauge labelled by server.
+SERVER_GAUGES = (
+    ("last_seen_timestamp_seconds", "Collection time of the newest sample (Unix seconds).", "ts"),
+    ("cpu_usage_percent", "CPU utilization.", "cpu_usage_percent"),
+    ("cpu_iowait_percent", "CPU time waiting on I/O.", "cpu_iowait_percent"),
+    ("cpu_load1", "1-minute load average.", "cpu_load_1"),
+    ("cpu_temperature_celsius", "CPU package temperature.", "cpu_temperature_c"),
+    ("memory_used_percent", "Memory in use.", "memory_percent"),
+    ("memory_used_bytes", "Memory in use.", "memory_used_bytes"),
+    ("memory_total_bytes", "Installed memory.", "memory_total_bytes"),
+    ("swap_used_percent", "Swap in use.", "swap_percent"),
+    ("disk_max_util_percent", "Busiest disk's utilization.", "disk_util_percent"),
+    ("network_receive_bytes_per_second", "Network receive rate.", "network_rx_bps"),
+    ("network_transmit_bytes_per_second", "Network transmit rate.", "network_tx_bps"),
+    ("gpu_count", "GPUs reported by the agent.", "gpu_count"),
+    ("gpu_max_utilization_percent", "Busiest GPU's utilization.", "top_gpu_util_percent"),
+    ("bottleneck_confidence", "Confidence of the bottleneck classification (0-1).", "bottleneck_confidence"),
+)
+# (metric suffix, help text, device field) per device kind; labels come from _device_labels().
+DEVICE_GAUGES = {
+    "gpus": (
+        ("gpu_utilization_percent", "GPU core utilization.", "utilization_gpu_percent"),
+        ("gpu_memory_utilization_percent", "GPU memory controller utilization.", "utilization_memory_percent"),
+        ("gpu_memory_used_bytes", "GPU memory in use.", "memory_used_bytes"),
+        ("gpu_memory_total_bytes", "GPU memory installed.", "memory_total_bytes"),
+        ("gpu_temperature_celsius", "GPU temperature.", "temperature_c"),
+        ("gpu_fan_speed_percent", "GPU fan speed.", "fan_speed_percent"),
+        ("gpu_power_watts", "GPU power draw.", "power_w"),
+        ("gpu_power_limit_watts", "GPU power limit.", "power_limit_w"),
+    ),
+    "disks": (
+        ("disk_read_bytes_per_second", "Disk read rate.", "read_bps"),
+        ("disk_write_bytes_per_second", "Disk write rate.", "write_bps"),
+        ("disk_read_iops", "Disk read operations per second.", "read_iops"),
+        ("disk_write_iops", "Disk write operations per second.", "write_iops"),
+        ("disk_util_percent", "Disk busy time.", "util_percent"),
+    ),
+    "fans": (("fan_speed_rpm", "Fan speed.", "speed_rpm"),),
+}
+
+
+def _device_labels(kind: str, device: dict[str, Any], seen: dict[str, int]) -> Labels:
+    """Label set of one device; ``seen`` counts fan labels already used on this server.
+
+    Two sensors can share a label (both "fan1"): the second becomes "fan1#2"
+    so each fan stays its own series.
+    """
+    if kind == "gpus":
+        return (("gpu", str(device["gpu_index"])), ("uuid", device["uuid"] or ""), ("model", device["name"] or ""))
+    if kind == "disks":
+        return (("device", device["device"]),)
+    label = device["label"]
+    seen[label] = count = seen.get(label, 0) + 1
+    return (("fan", label if count == 1 else f"{label}#{count}"),)
+
+
+def render_fleet_metrics(entries: Iterable[dict[str, Any]], prefix: str = "monitoring_fleet_") -> str:
+    """Latest reading per server and per device in Prometheus text format.
+
+    Missing readings (e.g. no CPU temperature sensor) are left out rather
+    than reported as zero.  Each label set is formatted once per device, not
+    once per sample: a 500-server fleet is tens of thousands of lines.
+    """
+    families: dict[str, tuple[str, list[str]]] = {
+        "info": ("Server name and hostname; always 1.", []),
+        "bottleneck": ("Current bottleneck classification; always 1.", []),
+    }
+    for gauges in (SERVER_GAUGES, *DEVICE_GAUGES.values()):
+        for suffix, help_text, _ in gauges:
+            families[suffix] = (help_text, [])
+
+    def add(suffix: str, labels: str, value: Any) -> None:
+        if value is not None:
+            families[suffix][1].append(f"{prefix}{suffix}{labels} {format_value(value)}")
+
+    for entry in entries:
+        state = entry["latest_state"]
+        if not state:
+            continue
+        server = (("server", entry["slug"]),)
+        add("info", format_labels(server + (("name", entry["name"]), ("hostname", entry["hostname"] or ""))), 1)
+        add("bottleneck", format_labels(server + (("bottleneck", state.get("bottleneck") or "unknown"),)), 1)
+        labels = format_labels(server)
+        for suffix, _, field in SERVER_GAUGES:
+            add(suffix, labels, state.get(field))
+        for kind, gauges in DEVICE_GAUGES.items():
+            seen: dict[str, int] = {}
+            for device in unpack_state_devices(state, kind):
+                labels = format_labels(server + _device_labels(kind, device, seen))
+                for suffix, _, field in gauges:
+                    add(suffix, labels, device.get(field))
+
+    lines: list[str] = []
+    for suffix, (help_text, samples) in families.items():
+        if samples:
+            lines.extend(render_metric(prefix + suffix, "gauge", help_text, ()))
+            lines.extend(samples)
+    return "\n".join(lines) + "\n"
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 from typing import Iterable
 
@@ -8,6 +9,11 @@ from django.core.mail import send_mail
 from django.utils import timezone
 
 from monitoring.models import MonitoredServer, Notification
+from monitoring.services.telemetry import ingest_phase
+
+# Alert emails go out on their own thread: ingest (and so notify) runs on the
+# single writer thread, where one slow SMTP server would stall every server's writes.
+_mail_sender = ThreadPoolExecutor(max_workers=1, thread_name_prefix="notification-mail")
 
 
 def _should_cooldown(server: MonitoredServer | None, code: str, window_minutes: int) -> bool:
@@ -44,15 +50,20 @@ def create_notification(
     if email:
         recipients: Iterable[str] = getattr(settings, "NOTIFICATION_EMAILS", []) or []
         if recipients:
-            try:
-                send_mail(
-                    subject=title,
-                    message=message or title,
-                    from_email=getattr(settings, "DEFAULT_FROM_EMAIL", None),
-                    recipient_list=list(recipients),
-                    fail_silently=True,
-                )
-            except Exception:
-                pass
+            _mail_sender.submit(_send_email, title, message or title, list(recipients))
 
     return note
+
+
+def _send_email(subject: str, message: str, recipients: list[str]) -> None:
+    try:
+        with ingest_phase("email"):
+            send_mail(
+                subject=subject,
+                message=message,
+                from_email=getattr(settings, "DEFAULT_FROM_EMAIL", None),
+                recipient_list=recipients,
+                fail_silently=True,
+            )
+    except Exception:
+        pass
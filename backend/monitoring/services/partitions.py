@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, QuerySet
+
+from monitoring.models import DiskMetric, FanMetric, GpuMetric, MetricChunk, MetricSnapshot, MonitoredServer
+from monitoring.services.telemetry import record_cache_lookup
+
+# Rows that hang off a snapshot; dropped together with it.
+CHILD_MODELS = (GpuMetric, DiskMetric, FanMetric)
+
+
+def partition_day_for(moment: datetime) -> date:
+    """The day partition (UTC date) a sample collected at ``moment`` belongs to."""
+    return moment.astimezone(dt_timezone.utc).date()
+
+
+def in_time_range(
+    queryset: QuerySet[MetricSnapshot], since: datetime, until: datetime | None = None
+) -> QuerySet[MetricSnapshot]:
+    """Restrict snapshots to ``[since, until)`` and prune day partitions outside that range."""
+    queryset = queryset.filter(collected_at__gte=since, partition_day__gte=partition_day_for(since))
+    if until is not None:
+        queryset = queryset.filter(collected_at__lt=until, partition_day__lte=partition_day_for(until))
+    return queryset
+
+
+def list_partitions(server: MonitoredServer | None = None) -> list[dict]:
+    """``[{"partition_day": date, "snapshots": n}, ...]``, oldest first."""
+    queryset = MetricSnapshot.objects.all()
+    if server is not None:
+        queryset = queryset.filter(server=server)
+    return list(
+        queryset.order_by().values("partition_day").annotate(snapshots=Count("id")).order_by("partition_day")
+    )
+
+
+def drop_partitions(before: date, *, server: MonitoredServer | None = None, limit: int | None = None) -> int:
+    """Delete every day partition older than ``before`` (for one server, or all); return snapshots dropped.
+
+    Compacted chunks (see ``services.chunks``) of those days go with them.
+
+    One set-based DELETE per table on the ``partition_day`` index: no rows are
+    loaded into Python and no per-row cascade is collected.  The database still
+    deletes (and on SQLite holds the write lock for) every row of the dropped
+    days; ``limit`` caps the snapshots deleted by one call (oldest first), so a
+    large backlog can be dropped in several short transactions.
+    """
+    qn = connection.ops.quote_name
+    snapshots = qn(MetricSnapshot._meta.db_table)
+    where = f"{qn('partition_day')} < %s"
+    params: list[object] = [before]
+    if server is not None:
+        where += f" AND {qn('server_id')} = %s"
+        params.append(server.pk)
+    selected = f"SELECT {qn('id')} FROM {snapshots} WHERE {where}"
+    selected_params = params
+    if limit is not None:
+        selected = f"SELECT {qn('id')} FROM {snapshots} WHERE {where} ORDER BY {qn('id')} LIMIT %s"
+        selected_params = [*params, limit]
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model in CHILD_MODELS:
+            cursor.execute(
+                f"DELETE FROM {qn(model._meta.db_table)} WHERE {qn('snapshot_id')} IN ({selected})", selected_params
+            )
+        cursor.execute(f"DELETE FROM {snapshots} WHERE {qn('id')} IN ({selected})", selected_params)
+        dropped = cursor.rowcount
+        cursor.execute(f"DELETE FROM {qn(MetricChunk._meta.db_table)} WHERE {where}", params)
+        return dropped
+
+
+def _expired_key(server: MonitoredServer) -> str:
+    return f"monitoring:partitions:{server.pk}"
+
+
+def retention_due(server: MonitoredServer, cutoff: datetime) -> bool:
+    """False when this process already dropped ``server``'s partitions up to ``cutoff``'s day (a cache lookup)."""
+    done = cache.get(_expired_key(server))
+    hit = done is not None and partition_day_for(cutoff) <= done
+    record_cache_lookup("partitions", hit)
+    return not hit
+
+
+def expire_partitions(server: MonitoredServer, cutoff: datetime, *, limit: int | None = None) -> int:
+    """Drop ``server``'s day partitions that end before ``cutoff``; return snapshots dropped.
+
+    With ``limit``, at most that many snapshots go per call and the server
+    only counts as done (see :func:`retention_due`) once a call drops fewer.
+    With the columnar archive enabled, days not archived yet are kept.
+    """
+    from monitoring.services.archive import archive_horizon  # archive imports this module
+
+    before = partition_day_for(cutoff)
+    dropped = drop_partitions(archive_horizon(server, before), server=server, limit=limit)
+    if limit is None or dropped < limit:
+        cache.set(_expired_key(server), before, timeout=None)
+    return dropped
@@ -0,0 +1,460 @@
+"""Synthetic fleet: deterministic agent payloads and an ingest load test.
+
+:class:`SyntheticAgent` produces samples shaped like the real agent's
+(``collect_raw_metrics()`` plus agent-side rates and per-interval
+summaries), for a node with a fixed number of GPUs, disks and fans.  Each
+agent moves through workload phases (training, data loading, idle) so GPU,
+disk and CPU readings and the resulting bottlenecks vary the way a busy
+fleet's do.  The same seed always yields the same samples.
+
+:func:`run_load_test` drives many such agents against the ingest endpoint,
+either in-process through Django's test client or over HTTP against a
+running webapp (``manage.py loadtest_ingest``).
+"""
+from __future__ import annotations
+
+import heapq
+import http.client
+import json
+import math
+import random
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from monitoring.models import MetricSnapshot, MonitoredServer
+
+GIB = 2**30
+
+# (name, GPU util range, disk util range, CPU range, iowait range, mean ticks in phase)
+WORKLOAD_PHASES = (
+    ("train", (92.0, 100.0), (1.0, 8.0), (25.0, 45.0), (0.0, 1.0), 120),
+    ("load", (5.0, 45.0), (70.0, 100.0), (40.0, 70.0), (8.0, 30.0), 20),
+    ("preprocess", (0.0, 15.0), (10.0, 30.0), (85.0, 100.0), (0.0, 3.0), 30),
+    ("idle", (0.0, 2.0), (0.0, 2.0), (1.0, 6.0), (0.0, 0.5), 60),
+)
+PHASE_WEIGHTS = (6, 2, 1, 1)
+
+GPU_MODELS = (
+    ("NVIDIA H100 80GB HBM3", 85_520_809_984, 700.0),
+    ("NVIDIA A100-SXM4-80GB", 85_899_345_920, 400.0),
+    ("NVIDIA L40S", 48_305_799_168, 350.0),
+)
+
+
+class SyntheticAgent:
+    """A virtual agent for one server: fixed hardware, running counters and a workload phase."""
+
+    def __init__(
+        self,
+        slug: str,
+        *,
+        seed: int,
+        gpus: int = 8,
+        disks: int = 4,
+        fans: int = 4,
+        interval: float = 5.0,
+        start: datetime | None = None,
+    ) -> None:
+        self.slug = slug
+        self.interval = interval
+        self.rnd = random.Random(seed)
+        self.start = start or timezone.now()
+        self.tick = 0
+        # Agents keep seq across restarts; deriving it from the start time keeps re-runs from colliding.
+        self.seq_base = int(self.start.timestamp() * 1000)
+        self.gpu_model = self.rnd.choice(GPU_MODELS)
+        self.gpu_uuids = [f"GPU-{self.rnd.getrandbits(64):016x}-{index}" for index in range(gpus)]
+        self.disk_names = [f"nvme{index}n1" for index in range(disks)]
+        self.fan_labels = [f"fan{index + 1}" for index in range(fans)]
+        self.memory_total = self.rnd.choice((512, 1024, 2048)) * GIB
+        self.cpu_count = self.rnd.choice((64, 128, 192, 256))
+        self.counters = {"rx": 0, "tx": 0}
+        self.disk_counters = {name: [0, 0, 0, 0, 0.0] for name in self.disk_names}
+        self.phase = 0
+        self.phase_left = 0
+
+    def _range(self, bounds: tuple[float, float]) -> float:
+        return self.rnd.uniform(*bounds)
+
+    def _next_phase(self) -> None:
+        if self.phase_left <= 0:
+            self.phase = self.rnd.choices(range(len(WORKLOAD_PHASES)), PHASE_WEIGHTS)[0]
+            self.phase_left = max(1, int(self.rnd.expovariate(1.0 / WORKLOAD_PHASES[self.phase][5])))
+        self.phase_left -= 1
+
+    def agent_info(self) -> dict[str, Any]:
+        return {
+            "version": "synthetic",
+            "hostname": self.slug,
+            "interval_seconds": self.interval,
+            "labels": {"synthetic": "1"},
+            "system_info": {"cpu_count_logical": self.cpu_count, "gpu_count": len(self.gpu_uuids)},
+        }
+
+    def sample(self) -> dict[str, Any]:
+        """The next sample, ``interval`` seconds after the previous one."""
+        self._next_phase()
+        _, gpu_range, disk_range, cpu_range, iowait_range, _ = WORKLOAD_PHASES[self.phase]
+        interval = self.interval or 1.0
+        self.tick += 1
+
+        cpu = self._range(cpu_range)
+        iowait = min(cpu, self._range(iowait_range))
+        rx_bps = self._range((50e6, 1.2e9)) if self.phase in (0, 1) else self._range((1e5, 5e6))
+        tx_bps = rx_bps * self._range((0.05, 0.3))
+        self.counters["rx"] += int(rx_bps * interval)
+        self.counters["tx"] += int(tx_bps * interval)
+
+        disks = []
+        disk_utils = []
+        for name in self.disk_names:
+            util = min(100.0, self._range(disk_range))
+            read_bps = util / 100.0 * self._range((2e9, 6e9))
+            write_bps = read_bps * self._range((0.05, 0.4))
+            read_iops, write_iops = read_bps / 131_072, write_bps / 131_072
+            totals = self.disk_counters[name]
+            totals[0] += int(read_bps * interval)
+            totals[1] += int(write_bps * interval)
+            totals[2] += int(read_iops * interval)
+            totals[3] += int(write_iops * interval)
+            totals[4] += util / 100.0 * interval * 1000.0
+            disk_utils.append(util)
+            disks.append(
+                {
+                    "device": name,
+                    "read_bytes_total": totals[0],
+                    "write_bytes_total": totals[1],
+                    "read_count_total": totals[2],
+                    "write_count_total": totals[3],
+                    "busy_time_ms_total": int(totals[4]),
+                    "read_bps": round(read_bps, 1),
+                    "write_bps": round(write_bps, 1),
+                    "read_iops": round(read_iops, 1),
+                    "write_iops": round(write_iops, 1),
+                    "util_percent": round(util, 1),
+                }
+            )
+
+        name, memory_total, power_limit = self.gpu_model
+        gpus = []
+        gpu_utils = []
+        for index, uuid in enumerate(self.gpu_uuids):
+            util = min(100.0, self._range(gpu_range))
+            memory_used = int(memory_total * (0.85 if self.phase == 0 else self._range((0.0, 0.3))))
+            gpu_utils.append(util)
+            gpus.append(
+                {
+                    "gpu_index": index,
+                    "name": name,
+                    "uuid": uuid,
+                    "utilization_gpu_percent": round(util),
+                    "utilization_memory_percent": round(util * self._range((0.3, 0.6))),
+                    "memory_total_bytes": memory_total,
+                    "memory_used_bytes": memory_used,
+                    "memory_percent": round(memory_used / memory_total * 100.0, 1),
+                    "temperature_c": round(35.0 + util * 0.45 + self._range((-2.0, 2.0))),
+                    "fan_speed_percent": round(30.0 + util * 0.5),
+                    "power_w": round(power_limit * (0.1 + 0.85 * util / 100.0), 2),
+                    "power_limit_w": power_limit,
+                }
+            )
+
+        memory_used = int(self.memory_total * self._range((0.2, 0.6)))
+        load = cpu / 100.0 * self.cpu_count
+        return {
+            "collected_at": (self.start + timedelta(seconds=self.tick * interval)).isoformat(),
+            "seq": self.seq_base + self.tick,
+            "cpu_usage_percent": round(cpu, 1),
+            "cpu_user_percent": round(cpu * 0.8, 1),
+            "cpu_system_percent": round(cpu * 0.2 - iowait * 0.1, 1),
+            "cpu_iowait_percent": round(iowait, 2),
+            "cpu_load_1": round(load, 2),
+            "cpu_load_5": round(load * 0.95, 2),
+            "cpu_load_15": round(load * 0.9, 2),
+            "cpu_frequency_mhz": round(self._range((2000.0, 3500.0))),
+            "cpu_temperature_c": round(40.0 + cpu * 0.35, 1),
+            "cpu_count_logical": self.cpu_count,
+            "cpu_count_physical": self.cpu_count // 2,
+            "memory_total_bytes": self.memory_total,
+            "memory_used_bytes": memory_used,
+            "memory_available_bytes": self.memory_total - memory_used,
+            "memory_percent": round(memory_used / self.memory_total * 100.0, 1),
+            "swap_total_bytes": 8 * GIB,
+            "swap_used_bytes": 0,
+            "swap_percent": 0.0,
+            "network_rx_bytes_total": self.counters["rx"],
+            "network_tx_bytes_total": self.counters["tx"],
+            "process_count": 600 + self.rnd.randrange(200),
+            "interval_seconds": interval,
+            "network_rx_bps": round(rx_bps, 1),
+            "network_tx_bps": round(tx_bps, 1),
+            "disks": disks,
+            "gpus": gpus,
+            "fans": [
+                {"label": label, "speed_rpm": 2000 + int(cpu * 40) + self.rnd.randrange(-60, 60)}
+                for label in self.fan_labels
+            ],
+            "summaries": {
+                "gpu_util_percent": _summary(gpu_utils),
+                "cpu_usage_percent": _summary([cpu]),
+                "cpu_iowait_percent": _summary([iowait]),
+                "disk_util_percent": _summary(disk_utils),
+            },
+        }
+
+
+def _summary(values: list[float]) -> dict[str, float | int]:
+    if not values:
+        values = [0.0]
+    ordered = sorted(values)
+    return {
+        "min": round(ordered[0], 2),
+        "avg": round(sum(ordered) / len(ordered), 2),
+        "max": round(ordered[-1], 2),
+        "p95": round(ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)], 2),
+        "count": len(ordered),
+    }
+
+
+def synthetic_fleet(
+    count: int,
+    *,
+    prefix: str = "synthetic",
+    seed: int = 0,
+    gpus: int = 8,
+    disks: int = 4,
+    fans: int = 4,
+    interval: float = 5.0,
+    start: datetime | None = None,
+) -> list[SyntheticAgent]:
+    """``count`` agents with slugs ``<prefix>-0000``...; agent ``i`` is seeded from ``seed`` and ``i``."""
+    start = start or timezone.now()
+    return [
+        SyntheticAgent(
+            f"{prefix}-{index:04d}",
+            seed=seed * 1_000_003 + index,
+            gpus=gpus,
+            disks=disks,
+            fans=fans,
+            interval=interval,
+            start=start,
+        )
+        for index in range(count)
+    ]
+
+
+def register_fleet(agents: list[SyntheticAgent]) -> dict[str, str]:
+    """Create (or re-token) a server per agent; returns ``{slug: plain ingest token}``."""
+    tokens = {}
+    for agent in agents:
+        server = MonitoredServer.objects.filter(slug=agent.slug).first() or MonitoredServer(
+            slug=agent.slug, name=f"Synthetic {agent.slug}", description="Load-test agent"
+        )
+        tokens[agent.slug] = secrets.token_urlsafe(24)
+        server.set_api_token(tokens[agent.slug])
+        server.is_active = True
+        server.save()
+    return tokens
+
+
+def database_bytes() -> int | None:
+    """Bytes in use by the default database (SQLite: pages not on the free list), or None if unsupported."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute("PRAGMA wal_checkpoint(PASSIVE)")
+            cursor.execute("PRAGMA page_count")
+            pages = cursor.fetchone()[0]
+            cursor.execute("PRAGMA freelist_count")
+            pages -= cursor.fetchone()[0]
+            cursor.execute("PRAGMA page_size")
+            return pages * cursor.fetchone()[0]
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT pg_database_size(current_database())")
+            return int(cursor.fetchone()[0])
+    return None
+
+
+def _percentile(ordered: list[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))]
+
+
+def _client_sender() -> Callable[[str, str, bytes], str]:
+    """In-process transport: the ingest view through Django's test client (full middleware stack)."""
+    from django.test import Client
+
+    hosts = [host for host in settings.ALLOWED_HOSTS if host and not host.startswith((".", "*"))]
+    client = Client(HTTP_HOST=hosts[0] if hosts and "testserver" not in hosts else "testserver")
+    secure = bool(getattr(settings, "SECURE_SSL_REDIRECT", False))
+
+    def send(slug: str, token: str, body: bytes) -> str:
+        response = client.post(
+            f"/api/ingest/servers/{slug}/metrics/",
+            data=body,
+            content_type="application/json",
+            headers={"X-Monitoring-Token": token},
+            secure=secure,
+        )
+        return str(response.status_code)
+
+    return send
+
+
+def _http_sender(base_url: str, timeout: float) -> Callable[[str, str, bytes], str]:
+    """HTTP transport: one keep-alive connection per worker thread, like the agent's pooled session."""
+    parts = urlsplit(base_url)
+    factory = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    prefix = parts.path.rstrip("/")
+    conn: list[http.client.HTTPConnection | None] = [None]
+
+    def send(slug: str, token: str, body: bytes) -> str:
+        if conn[0] is None:
+            conn[0] = factory(parts.netloc, timeout=timeout)
+        try:
+            conn[0].request(
+                "POST",
+                f"{prefix}/api/ingest/servers/{slug}/metrics/",
+                body=body,
+                headers={"Content-Type": "application/json", "X-Monitoring-Token": token},
+            )
+            response = conn[0].getresponse()
+            response.read()
+            return str(response.status)
+        except (OSError, http.client.HTTPException) as exc:
+            conn[0].close()
+            conn[0] = None
+            return type(exc).__name__
+
+    return send
+
+
+def run_load_test(
+    agents: list[SyntheticAgent],
+    tokens: dict[str, str],
+    *,
+    duration: float = 60.0,
+    samples_per_agent: int = 0,
+    concurrency: int = 16,
+    batch: int = 1,
+    paced: bool = True,
+    base_url: str = "",
+    timeout: float = 30.0,
+) -> dict[str, Any]:
+    """Post the agents' samples concurrently until ``duration`` seconds or ``samples_per_agent`` is reached.
+
+    Paced agents send every ``interval * batch`` seconds at a phase spread
+    over the interval, like a real fleet; unpaced ones send back to back, as
+    fast as ``concurrency`` worker threads get answers.  Requests go through
+    the Django test client unless ``base_url`` points at a running webapp.
+    Latencies are per request; ``samples_per_sec`` counts accepted samples.
+    """
+    lock = threading.Lock()
+    began = time.monotonic()
+    deadline = began + duration if duration > 0 else math.inf
+    # (due time, agent index): the earliest due agent is sent next by whichever worker is free.
+    # Unpaced agents are re-queued at the time they were answered, i.e. round robin.
+    queue = [
+        (began + (index / len(agents) * agent.interval * batch if paced else 0.0), index)
+        for index, agent in enumerate(agents)
+    ]
+    heapq.heapify(queue)
+    sent_samples = [0] * len(agents)
+    latencies: list[float] = []
+    status: dict[str, int] = {}
+    accepted = [0]
+    max_lag = [0.0]
+    before = database_bytes()
+    slugs = list(tokens)
+    snapshots_before = MetricSnapshot.objects.filter(server__slug__in=slugs).count()
+
+    def worker() -> None:
+        send = _http_sender(base_url, timeout) if base_url else _client_sender()
+        while True:
+            with lock:
+                if not queue:
+                    return
+                due, index = heapq.heappop(queue)
+            now = time.monotonic()
+            if due >= deadline or now >= deadline:
+                return
+            if due > now:
+                time.sleep(due - now)
+            elif paced:
+                with lock:
+                    max_lag[0] = max(max_lag[0], now - due)
+            agent = agents[index]
+            count = batch if not samples_per_agent else min(batch, samples_per_agent - sent_samples[index])
+            samples = [agent.sample() for _ in range(count)]
+            payload = {"samples": samples} if batch > 1 else {"sample": samples[0]}
+            payload["agent"] = agent.agent_info()
+            body = json.dumps(payload).encode("utf-8")
+            started = time.perf_counter()
+            key = send(agent.slug, tokens[agent.slug], body)
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            with lock:
+                latencies.append(elapsed_ms)
+                status[key] = status.get(key, 0) + 1
+                if key == "200":
+                    accepted[0] += count
+                sent_samples[index] += count
+                if not samples_per_agent or sent_samples[index] < samples_per_agent:
+                    heapq.heappush(queue, (due + agent.interval * batch if paced else time.monotonic(), index))
+
+    # In-process workers open their own database connection; close it when they finish.
+    threads = [threading.Thread(target=_close_after(worker), daemon=True) for _ in range(max(1, concurrency))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - began
+
+    after = database_bytes()
+    snapshots_after = MetricSnapshot.objects.filter(server__slug__in=slugs).count()
+    ordered = sorted(latencies)
+    requests_sent = len(latencies)
+    errors = sum(count for key, count in status.items() if key != "200")
+    stored = snapshots_after - snapshots_before
+    growth = after - before if before is not None and after is not None else None
+    return {
+        "agents": len(agents),
+        "transport": base_url or "in-process",
+        "paced": paced,
+        "batch": batch,
+        "concurrency": concurrency,
+        "elapsed_seconds": round(elapsed, 3),
+        "requests": requests_sent,
+        "samples_sent": sum(sent_samples),
+        "samples_accepted": accepted[0],
+        "samples_per_sec": round(accepted[0] / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(_percentile(ordered, 50), 1),
+        "p95_ms": round(_percentile(ordered, 95), 1),
+        "p99_ms": round(_percentile(ordered, 99), 1),
+        "max_ms": round(ordered[-1], 1) if ordered else 0.0,
+        "status": status,
+        "error_rate": round(errors / requests_sent, 4) if requests_sent else 0.0,
+        "max_lag_seconds": round(max_lag[0], 3),
+        "snapshots_stored": stored,
+        "db_bytes_before": before,
+        "db_bytes_after": after,
+        "db_growth_bytes": growth,
+        "db_bytes_per_sample": round(growth / stored) if growth is not None and stored > 0 else None,
+    }
+
+
+def _close_after(target: Callable[[], None]) -> Callable[[], None]:
+    def run() -> None:
+        try:
+            target()
+        finally:
+            connection.close()
+
+    return run
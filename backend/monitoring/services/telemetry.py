@@ -0,0 +1,264 @@
+"""In-process backend telemetry, exposed in Prometheus text format at ``/metrics``.
+
+Ingest is timed per phase (:func:`ingest_phase`), requests per view by
+``monitoring.middleware.TelemetryMiddleware``, and every database query is
+counted by a wrapper installed on each new connection.  Histograms have
+fixed buckets, so an observation is a lock, a ``bisect`` and two additions;
+rendering only happens when ``/metrics`` is scraped.
+
+Like ``ingest_load``, the numbers are per worker process: with several
+gunicorn workers each scrape sees the worker that answered it.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ContextDecorator
+from typing import Any, Iterable
+
+from django.conf import settings
+
+# Seconds; covers both sub-millisecond phases and multi-second SMTP timeouts.
+TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+
+INGEST_PHASES = (
+    "parse",
+    "queue",
+    "lock",
+    "expand",
+    "normalize",
+    "lookup",
+    "build",
+    "insert",
+    "heartbeat",
+    "retention",
+    "notify",
+    "email",
+)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set (Prometheus ``histogram`` type)."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float]) -> None:
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series: dict[Labels, list[Any]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self) -> list[tuple[str, Labels, float]]:
+        with self._lock:
+            snapshot = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        lines: list[tuple[str, Labels, float]] = []
+        for key, counts, total in sorted(snapshot):
+            running = 0
+            for bound, count in zip(self.buckets, counts):
+                running += count
+                lines.append(("_bucket", key + (("le", format_value(bound)),), running))
+            running += counts[-1]
+            lines.append(("_bucket", key + (("le", "+Inf"),), running))
+            lines.append(("_sum", key, total))
+            lines.append(("_count", key, running))
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    """Monotonic counter per label set (Prometheus ``counter`` type)."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._series: dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._series.get(tuple(sorted(labels.items())), 0)
+
+    def samples(self) -> list[tuple[str, Labels, float]]:
+        with self._lock:
+            return [("", key, value) for key, value in sorted(self._series.items())]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+ingest_phase_seconds = Histogram(
+    "monitoring_ingest_phase_seconds", "Time spent per ingest phase.", TIME_BUCKETS
+)
+ingest_samples = Counter("monitoring_ingest_samples_total", "Samples stored, by server.")
+ingest_duplicates = Counter(
+    "monitoring_ingest_duplicates_total", "Replayed samples acknowledged without storing, by server."
+)
+http_request_seconds = Histogram(
+    "monitoring_http_request_seconds", "Request latency by view and method.", TIME_BUCKETS
+)
+http_request_queries = Histogram(
+    "monitoring_http_request_queries", "Database queries issued by the request thread, by view.", QUERY_BUCKETS
+)
+http_responses = Counter("monitoring_http_responses_total", "Responses by view and status code.")
+db_queries = Counter("monitoring_db_queries_total", "Database queries, by connection vendor.")
+db_query_seconds = Counter("monitoring_db_query_seconds_total", "Time spent executing database queries.")
+cache_requests = Counter("monitoring_cache_requests_total", "Cache lookups by cache and result (hit or miss).")
+
+METRICS = (
+    ingest_phase_seconds,
+    ingest_samples,
+    ingest_duplicates,
+    http_request_seconds,
+    http_request_queries,
+    http_responses,
+    db_queries,
+    db_query_seconds,
+    cache_requests,
+)
+
+_local = threading.local()
+_started_at = time.time()
+
+
+def telemetry_enabled() -> bool:
+    return settings.MONITORING_TELEMETRY
+
+
+def record_phase(phase: str, seconds: float) -> None:
+    if telemetry_enabled():
+        ingest_phase_seconds.observe(seconds, phase=phase)
+
+
+class ingest_phase(ContextDecorator):
+    """Add a block's (or a decorated function's) duration to the ingest phase histogram.
+
+    ``with ingest_phase("insert"): ...`` or ``@ingest_phase("heartbeat")``.
+    """
+
+    def __init__(self, phase: str) -> None:
+        self.phase = phase
+        self.started = 0.0
+
+    def _recreate_cm(self) -> "ingest_phase":
+        # A decorated function may run on several threads at once; time each call separately.
+        return ingest_phase(self.phase)
+
+    def __enter__(self) -> "ingest_phase":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        record_phase(self.phase, time.perf_counter() - self.started)
+
+
+def record_ingest(server_slug: str, accepted: int, duplicates: int) -> None:
+    if telemetry_enabled():
+        if accepted:
+            ingest_samples.inc(accepted, server=server_slug)
+        if duplicates:
+            ingest_duplicates.inc(duplicates, server=server_slug)
+
+
+def record_cache_lookup(cache_name: str, hit: bool) -> None:
+    if telemetry_enabled():
+        cache_requests.inc(cache=cache_name, result="hit" if hit else "miss")
+
+
+def thread_query_count() -> int:
+    """Queries run so far by the current thread (all connections)."""
+    return getattr(_local, "queries", 0)
+
+
+def _count_queries(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        _local.queries = getattr(_local, "queries", 0) + 1
+        vendor = context["connection"].vendor
+        db_queries.inc(vendor=vendor)
+        db_query_seconds.inc(time.perf_counter() - started, vendor=vendor)
+
+
+def install_query_counter(sender, connection, **kwargs) -> None:
+    """``connection_created`` receiver: count every query of the new connection."""
+    if telemetry_enabled() and _count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_queries)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels) + "}"
+
+
+def render_metric(name: str, kind: str, help_text: str, samples: Iterable[tuple[str, Labels, float]]) -> list[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{name}{suffix}{format_labels(labels)} {format_value(value)}" for suffix, labels, value in samples)
+    return lines
+
+
+def render_metrics() -> str:
+    """Every backend metric of this process in Prometheus text exposition format (0.0.4)."""
+    from monitoring.services.ingest_load import ingest_load
+    from monitoring.services.writer import ingest_writer
+
+    lines: list[str] = []
+    for metric in METRICS:
+        lines.extend(render_metric(metric.name, metric.kind, metric.help, metric.samples()))
+    load = ingest_load.stats()
+    gauges = (
+        ("monitoring_ingest_p95_milliseconds", "Ingest p95 latency over the last minute.", load["p95_ms"]),
+        ("monitoring_ingest_lock_errors", "Database lock errors at ingest over the last minute.", load["lock_errors"]),
+        ("monitoring_ingest_writer_pending", "Writes queued for the ingest writer thread.", ingest_writer.pending()),
+        ("monitoring_process_start_time_seconds", "Start time of this worker process.", _started_at),
+    )
+    for name, help_text, value in gauges:
+        lines.extend(render_metric(name, "gauge", help_text, [("", (), value)]))
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics() -> None:
+    for metric in METRICS:
+        metric.reset()
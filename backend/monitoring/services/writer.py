@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Callable, TypeVar
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+from monitoring.services.telemetry import record_phase
+
+T = TypeVar("T")
+
+
+class IngestWriter:
+    """Runs every ingest write of this process on one dedicated thread.
+
+    SQLite allows a single writer at a time.  Funnelling ingest through one
+    thread (and so one connection) per worker process means request threads
+    never queue inside SQLite's busy handler: they wait on an in-process
+    queue, dashboard reads keep running against the WAL, and only the few
+    worker processes compete for the write lock.
+
+    The writer is per process, not global: with three gunicorn workers there
+    are three writers, and management commands (``import_samples``,
+    ``compact_metrics``, ``archive_metrics --prune``, ``prune_metrics``) write
+    on their own connection.  Across processes, writes are still serialized
+    by SQLite's lock and ``busy_timeout``.
+
+    A request that cannot be queued, or whose write does not finish within
+    ``timeout`` seconds, gets an ``OperationalError`` ("database is locked"),
+    which the ingest view already turns into a ``503`` with ``Retry-After``.
+    A write that finishes after its caller gave up is still stored; the
+    agent's retry is then deduplicated on ``(server, seq)``.
+    """
+
+    def __init__(self, max_pending: int = 256) -> None:
+        self._queue: queue.Queue[tuple[Future, float, Callable[..., Any], tuple, dict]] = queue.Queue(
+            maxsize=max_pending
+        )
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            future, queued_at, fn, args, kwargs = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            record_phase("queue", time.perf_counter() - queued_at)
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as exc:
+                # Drop a connection left broken by the failure; keep it open otherwise.
+                connection.close_if_unusable_or_obsolete()
+                future.set_exception(exc)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> bool:
+        """Queue ``fn(*args, **kwargs)`` behind the pending writes without waiting for it.
+
+        Returns False, and runs nothing, when the single writer is off or its
+        queue is full.  Exceptions of ``fn`` are not reported; catch them in ``fn``.
+        """
+        if not settings.MONITORING_INGEST_SINGLE_WRITER:
+            return False
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((Future(), time.perf_counter(), fn, args, kwargs))
+        except queue.Full:
+            return False
+        return True
+
+    def run(self, fn: Callable[..., T], *args: Any, timeout: float | None = None, **kwargs: Any) -> T:
+        """Call ``fn(*args, **kwargs)`` on the writer thread and return its result."""
+        if not settings.MONITORING_INGEST_SINGLE_WRITER or threading.current_thread() is self._thread:
+            return fn(*args, **kwargs)
+        self._ensure_started()
+        future: Future = Future()
+        try:
+            self._queue.put((future, time.perf_counter(), fn, args, kwargs), timeout=timeout)
+            return future.result(timeout=timeout)
+        except (queue.Full, FutureTimeout):
+            future.cancel()
+            raise OperationalError("database is locked: ingest writer is busy") from None
+
+
+ingest_writer = IngestWriter()
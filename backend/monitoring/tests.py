@@ -1,3 +1,591 @@
-from django.test import TestCase
+"""Correctness tests, and query-count and wall-time budgets for the hot paths.
 
-# Create your tests here.
+``IngestOrderingTests``, ``IngestReplayTests``, ``NonFiniteValueTests``,
+``DeviceStorageTests``, ``BulkImportTests`` and ``ChunkCodecTests`` check what
+ingest, import and compaction store, ``MetricsEndpointTests`` and
+``AgentTokenRefreshTests`` what the endpoints accept, ``SlowMailTests`` that
+alert email never holds up the ingest writer.
+``EndpointBudgetTests`` holds the performance budgets:
+
+The fixture is a realistic fleet: many servers with a little recent
+history, one server with a full day of it, and a page of notifications
+(synthetic samples, fixed seed, loaded with the bulk importer).  Each test
+requests an endpoint once to warm caches, then again under
+``CaptureQueriesContext`` and a timer.  Budgets are absolute: a change that
+adds a query per server or per snapshot fails here with the captured SQL.
+
+``MONITORING_BUDGET_TIME_FACTOR`` scales the wall-time budgets for slow
+machines (e.g. ``3`` on a shared CI runner); query budgets never scale.
+"""
+from __future__ import annotations
+
+import io
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from monitoring.auth import _cached_allowlists
+from monitoring.models import DiskMetric, MetricChunk, MetricSnapshot, MonitoredServer, Notification
+from monitoring.services.bulk_import import BulkImporter
+from monitoring.services.chunks import (
+    FLOAT_COLUMNS,
+    INT_COLUMNS,
+    TEXT_COLUMNS,
+    compact_window,
+    decode_chunk,
+    encode_chunk,
+)
+from monitoring.services.collector import ingest_sample_for_server
+from monitoring.services.delta import KeyframeRequired
+from monitoring.services.devices import DEVICE_FIELDS, is_packed, load_devices, snapshot_devices
+from monitoring.services.latest_state import latest_states, unpack_state_devices
+from monitoring.services.partitions import drop_partitions, partition_day_for
+from monitoring.services.synthetic import SyntheticAgent, register_fleet, synthetic_fleet
+from monitoring.services.telemetry import format_value
+from monitoring.services.writer import ingest_writer
+
+BUDGET_EMAIL = "budget@example.com"
+TIME_FACTOR = float(os.environ.get("MONITORING_BUDGET_TIME_FACTOR", "1") or 1)
+
+FLEET_SERVERS = 60
+FLEET_SAMPLES = 10
+LONG_HISTORY_HOURS = 24
+LONG_HISTORY_INTERVAL = 30.0
+NOTIFICATIONS = 80
+
+
+@override_settings(GOOGLE_ALLOWED_EMAILS={BUDGET_EMAIL}, MONITORING_INGEST_SINGLE_WRITER=False)
+class EndpointBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        _cached_allowlists.cache_clear()
+        cls.user = get_user_model().objects.create_user("budget", BUDGET_EMAIL, "budget")
+        now = timezone.now().replace(microsecond=0)
+
+        fleet = synthetic_fleet(
+            FLEET_SERVERS,
+            prefix="fleet",
+            seed=7,
+            interval=LONG_HISTORY_INTERVAL,
+            start=now - timedelta(seconds=LONG_HISTORY_INTERVAL * FLEET_SAMPLES),
+        )
+        cls.tokens = register_fleet(fleet)
+        for agent in fleet:
+            importer = BulkImporter(MonitoredServer.objects.get(slug=agent.slug))
+            for _ in range(FLEET_SAMPLES):
+                importer.add(agent.sample())
+            importer.finish()
+
+        long = SyntheticAgent(
+            "fleet-long",
+            seed=8,
+            interval=LONG_HISTORY_INTERVAL,
+            start=now - timedelta(hours=LONG_HISTORY_HOURS),
+        )
+        cls.tokens.update(register_fleet([long]))
+        cls.long_server = MonitoredServer.objects.get(slug=long.slug)
+        importer = BulkImporter(cls.long_server)
+        for _ in range(int(LONG_HISTORY_HOURS * 3600 / LONG_HISTORY_INTERVAL)):
+            importer.add(long.sample())
+        importer.finish()
+        # Later samples for the ingest test continue where the history stops.
+        cls.long_agent = long
+
+        servers = list(MonitoredServer.objects.order_by("id"))
+        Notification.objects.bulk_create(
+            Notification(
+                server=servers[index % len(servers)],
+                level="warning",
+                title=f"Budget notification {index}",
+                message="Synthetic notification for the query budget tests.",
+                code="budget",
+            )
+            for index in range(NOTIFICATIONS)
+        )
+
+    def setUp(self):
+        _cached_allowlists.cache_clear()
+        self.client.force_login(self.user)
+
+    def assertBudget(self, request, *, max_queries: int, max_ms: float):
+        """Run ``request()`` once to warm up, then again within ``max_queries`` and ``max_ms``."""
+        request()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = request()
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+        self.assertEqual(response.status_code, 200, response.content[:500])
+        queries = len(captured.captured_queries)
+        if queries > max_queries:
+            listing = "\n".join(f"{i + 1:3d}. {query['sql']}" for i, query in enumerate(captured.captured_queries))
+            self.fail(f"{queries} queries, budget {max_queries}:\n{listing}")
+        budget_ms = max_ms * TIME_FACTOR
+        self.assertLessEqual(elapsed_ms, budget_ms, f"{elapsed_ms:.0f} ms, budget {budget_ms:.0f} ms")
+        return response
+
+    def test_servers(self):
+        response = self.assertBudget(lambda: self.client.get("/api/servers/"), max_queries=3, max_ms=150)
+        self.assertEqual(len(response.json()["servers"]), FLEET_SERVERS + 1)
+
+    def test_metrics_latest(self):
+        response = self.assertBudget(
+            lambda: self.client.get("/api/metrics/latest/", {"server": self.long_server.slug}),
+            max_queries=7,
+            max_ms=150,
+        )
+        self.assertEqual(len(response.json()["snapshot"]["gpu"]["devices"]), 8)
+
+    def test_metrics_history_hour(self):
+        response = self.assertBudget(
+            lambda: self.client.get("/api/metrics/history/", {"server": self.long_server.slug, "minutes": 60}),
+            max_queries=8,
+            max_ms=400,
+        )
+        self.assertEqual(response.json()["point_count"], 120)
+
+    def test_metrics_history_day(self):
+        response = self.assertBudget(
+            lambda: self.client.get("/api/metrics/history/", {"server": self.long_server.slug, "minutes": 1440}),
+            max_queries=8,
+            max_ms=2500,
+        )
+        self.assertGreater(response.json()["point_count"], 1000)
+
+    @override_settings(MONITORING_LATEST_STATE_TTL_SECONDS=0)
+    def test_fleet_latest(self):
+        # TTL 0: every request re-reads the servers table (session, user, servers); still nothing per server.
+        latest_states.reset()
+        response = self.assertBudget(lambda: self.client.get("/api/fleet/latest/"), max_queries=3, max_ms=150)
+        rows = response.json()["servers"]
+        self.assertEqual(len(rows), FLEET_SERVERS + 1)
+        self.assertTrue(all(row["gpu_count"] == 8 and row["collected_at"] for row in rows))
+
+    def test_notifications(self):
+        response = self.assertBudget(lambda: self.client.get("/api/notifications/"), max_queries=3, max_ms=100)
+        self.assertEqual(len(response.json()["notifications"]), 50)
+
+    @override_settings(MONITORING_METRICS_TOKEN="budget-token", MONITORING_LATEST_STATE_TTL_SECONDS=0)
+    def test_metrics_fleet(self):
+        # TTL 0: every scrape re-reads the servers table, which is all it may read.
+        latest_states.reset()
+        response = self.assertBudget(
+            lambda: self.client.get("/metrics/fleet", headers={"Authorization": "Bearer budget-token"}),
+            max_queries=1,
+            max_ms=150,
+        )
+        lines = response.content.decode().splitlines()
+        self.assertEqual(sum(line.startswith("monitoring_fleet_info{") for line in lines), FLEET_SERVERS + 1)
+        self.assertEqual(
+            sum(line.startswith("monitoring_fleet_gpu_utilization_percent{") for line in lines), 8 * (FLEET_SERVERS + 1)
+        )
+
+    def test_ingest(self):
+        agent, token = self.long_agent, self.tokens[self.long_agent.slug]
+
+        def post():
+            return self.client.post(
+                f"/api/ingest/servers/{agent.slug}/metrics/",
+                data=json.dumps({"sample": agent.sample(), "agent": agent.agent_info()}),
+                content_type="application/json",
+                headers={"X-Monitoring-Token": token},
+            )
+
+        # Includes the successor seek that marks late samples, which runs even when the agent sends rates.
+        self.assertBudget(post, max_queries=12, max_ms=150)
+
+    def test_ingest_batch(self):
+        agent, token = self.long_agent, self.tokens[self.long_agent.slug]
+
+        def post():
+            samples = [agent.sample() for _ in range(10)]
+            return self.client.post(
+                f"/api/ingest/servers/{agent.slug}/metrics/",
+                data=json.dumps({"samples": samples, "agent": agent.agent_info()}),
+                content_type="application/json",
+                headers={"X-Monitoring-Token": token},
+            )
+
+        # Per sample: the successor seek, snapshot, disk, GPU and fan inserts plus savepoints; nothing else may.
+        response = self.assertBudget(post, max_queries=5 + 7 * 10, max_ms=600)
+        self.assertEqual(response.json()["accepted"], 10)
+
+
+def _sample(at, *, seq, rx_total, agent_rx_bps=None):
+    """A minimal sample; ``agent_rx_bps`` makes it carry agent-side rates."""
+    sample = {
+        "collected_at": at.isoformat(),
+        "seq": seq,
+        "cpu_usage_percent": 10.0,
+        "memory_percent": 20.0,
+        "network_rx_bytes_total": rx_total,
+        "network_tx_bytes_total": 0,
+        "disks": [],
+        "gpus": [],
+        "fans": [],
+    }
+    if agent_rx_bps is not None:
+        sample.update(interval_seconds=5.0, network_rx_bps=agent_rx_bps, network_tx_bps=0.0)
+    return sample
+
+
+@override_settings(MONITORING_INGEST_SINGLE_WRITER=False)
+class IngestOrderingTests(TestCase):
+    def setUp(self):
+        self.server = MonitoredServer.objects.create(slug="ordering", name="ordering")
+        self.t = timezone.now().replace(microsecond=0)
+
+    def ingest(self, sample):
+        return ingest_sample_for_server(self.server, {"sample": sample})
+
+    def assertLatest(self, moment):
+        self.server.refresh_from_db()
+        self.assertEqual(self.server.last_seen_at, moment)
+        self.assertEqual(self.server.latest_state["ts"], moment.timestamp())
+
+    def test_late_sample_with_agent_rates(self):
+        newest = self.ingest(_sample(self.t, seq=2, rx_total=1000, agent_rx_bps=100.0))
+        late = self.ingest(_sample(self.t - timedelta(seconds=5), seq=1, rx_total=500, agent_rx_bps=50.0))
+        self.assertTrue(late.late)
+        self.assertLatest(self.t)
+        newest.refresh_from_db()
+        self.assertEqual(newest.network_rx_bps, 100.0)
+
+    def test_late_sample_rederives_counter_rates(self):
+        self.ingest(_sample(self.t - timedelta(seconds=10), seq=1, rx_total=0))
+        newest = self.ingest(_sample(self.t, seq=3, rx_total=10000))
+        newest.refresh_from_db()
+        self.assertEqual(newest.network_rx_bps, 1000.0)
+
+        late = self.ingest(_sample(self.t - timedelta(seconds=5), seq=2, rx_total=2000))
+        self.assertTrue(late.late)
+        self.assertEqual(late.network_rx_bps, 400.0)
+        newest.refresh_from_db()
+        self.assertEqual(newest.network_rx_bps, 1600.0)
+        self.assertEqual(newest.interval_seconds, 5.0)
+        self.assertLatest(self.t)
+
+    def test_late_counter_sample_keeps_agent_rates_of_successor(self):
+        newest = self.ingest(_sample(self.t, seq=2, rx_total=10000, agent_rx_bps=100.0))
+        late = self.ingest(_sample(self.t - timedelta(seconds=5), seq=1, rx_total=2000))
+        self.assertTrue(late.late)
+        newest.refresh_from_db()
+        self.assertEqual(newest.network_rx_bps, 100.0)
+        self.assertEqual(newest.interval_seconds, 5.0)
+        self.assertLatest(self.t)
+
+
+@override_settings(MONITORING_INGEST_SINGLE_WRITER=False)
+class NonFiniteValueTests(TestCase):
+    def test_nan_and_inf_readings_are_stored_as_missing(self):
+        server = MonitoredServer.objects.create(slug="nan", name="nan")
+        sample = _sample(timezone.now().replace(microsecond=0), seq=1, rx_total=0)
+        sample["cpu_temperature_c"] = float("inf")
+        sample["gpus"] = [{"gpu_index": 0, "uuid": "GPU-0", "power_w": float("nan"), "temperature_c": 60.0}]
+        snapshot = ingest_sample_for_server(server, {"sample": sample})
+        self.assertIsNone(snapshot.cpu_temperature_c)
+        server.refresh_from_db()
+        gpus = unpack_state_devices(server.latest_state, "gpus")
+        self.assertIsNone(gpus[0]["power_w"])
+        self.assertEqual(gpus[0]["temperature_c"], 60.0)
+
+    def test_format_value(self):
+        self.assertEqual(format_value(3.0), "3")
+        self.assertEqual(format_value(0.25), "0.25")
+        self.assertEqual(format_value(float("nan")), "NaN")
+        self.assertEqual(format_value(float("inf")), "+Inf")
+        self.assertEqual(format_value(float("-inf")), "-Inf")
+
+
+@override_settings(MONITORING_INGEST_SINGLE_WRITER=False)
+class DeviceStorageTests(TestCase):
+    def ingest_pair(self, slug):
+        server = MonitoredServer.objects.create(slug=slug, name=slug)
+        t = timezone.now().replace(microsecond=0)
+        for seq, offset in ((1, 5), (2, 0)):
+            sample = _sample(t - timedelta(seconds=offset), seq=seq, rx_total=seq * 1000)
+            sample["disks"] = [{"device": "nvme0n1", "read_bytes_total": seq * 4096, "write_bytes_total": seq * 8192,
+                                "read_count_total": seq, "write_count_total": seq * 2, "busy_time_ms_total": seq * 50}]
+            sample["gpus"] = [{"gpu_index": 0, "name": "GPU", "uuid": "GPU-0", "utilization_gpu_percent": 50.0,
+                               "memory_total_bytes": 1 << 30, "memory_used_bytes": 1 << 29, "power_w": float("nan")}]
+            sample["fans"] = [{"label": "fan1", "speed_rpm": 1200}]
+            snapshot = ingest_sample_for_server(server, {"sample": sample})
+        return MetricSnapshot.objects.get(pk=snapshot.pk)
+
+    def test_packed_and_row_storage_round_trip_alike(self):
+        rows = self.ingest_pair("rows")
+        with override_settings(MONITORING_DEVICE_STORAGE="packed"):
+            packed = self.ingest_pair("packed")
+        self.assertTrue(is_packed(packed))
+        self.assertFalse(is_packed(rows))
+        for kind, fields in DEVICE_FIELDS.items():
+            expected = [[getattr(item, field) for field in fields] for item in snapshot_devices(rows)[kind]]
+            actual = [[getattr(item, field) for field in fields] for item in snapshot_devices(packed)[kind]]
+            self.assertEqual(actual, expected, kind)
+            self.assertEqual(len(actual), 1, kind)
+        self.assertIsNone(snapshot_devices(packed)["gpus"][0].power_w)
+
+
+class MetricsEndpointTests(TestCase):
+    def test_off_without_token(self):
+        for path in ("/metrics", "/metrics/fleet"):
+            with override_settings(MONITORING_METRICS_TOKEN=""):
+                self.assertEqual(self.client.get(path).status_code, 404, path)
+            with override_settings(MONITORING_METRICS_TOKEN="scrape"):
+                self.assertEqual(self.client.get(path).status_code, 401, path)
+                response = self.client.get(path, headers={"Authorization": "Bearer scrape"})
+                self.assertEqual(response.status_code, 200, path)
+
+    @override_settings(
+        MONITORING_METRICS_TOKEN="scrape",
+        MONITORING_LATEST_STATE_TTL_SECONDS=0,
+        MONITORING_INGEST_SINGLE_WRITER=False,
+        MONITORING_DEVICE_STORAGE="packed",
+    )
+    def test_fans_sharing_a_label_are_separate_series(self):
+        server = MonitoredServer.objects.create(slug="fans", name="fans")
+        sample = _sample(timezone.now().replace(microsecond=0), seq=1, rx_total=0)
+        sample["fans"] = [{"label": "fan1", "speed_rpm": 1200}, {"label": "fan1", "speed_rpm": 900}]
+        ingest_sample_for_server(server, {"sample": sample})
+        latest_states.reset()
+        response = self.client.get("/metrics/fleet", headers={"Authorization": "Bearer scrape"})
+        lines = [line for line in response.content.decode().splitlines() if 'server="fans"' in line]
+        self.assertIn('monitoring_fleet_fan_speed_rpm{server="fans",fan="fan1"} 1200', lines)
+        self.assertIn('monitoring_fleet_fan_speed_rpm{server="fans",fan="fan1#2"} 900', lines)
+
+
+@override_settings(MONITORING_INGEST_SINGLE_WRITER=False)
+class BulkImportTests(TestCase):
+    def setUp(self):
+        self.server = MonitoredServer.objects.create(slug="import", name="import")
+        self.t = timezone.now().replace(microsecond=0)
+        ingest_sample_for_server(self.server, {"sample": _sample(self.t - timedelta(seconds=10), seq=5, rx_total=0)})
+
+    def test_skips_seq_already_stored(self):
+        importer = BulkImporter(self.server)
+        importer.add(_sample(self.t - timedelta(seconds=5), seq=5, rx_total=500))
+        importer.add(_sample(self.t, seq=6, rx_total=1000))
+        importer.finish()
+        self.assertEqual((importer.imported, importer.skipped), (1, 1))
+        self.assertEqual(MetricSnapshot.objects.filter(server=self.server).count(), 2)
+        self.server.refresh_from_db()
+        self.assertEqual(self.server.last_seen_at, self.t)
+
+    def test_defer_indexes_refused_on_populated_database(self):
+        with self.assertRaisesMessage(CommandError, "--defer-indexes"):
+            call_command("import_samples", os.devnull, "--server", "import", "--defer-indexes")
+
+
+def _gpu(power_w):
+    return {"gpu_index": 0, "name": "GPU", "uuid": "GPU-0", "utilization_gpu_percent": 50.0, "power_w": power_w}
+
+
+@override_settings(MONITORING_INGEST_SINGLE_WRITER=False)
+class IngestReplayTests(TestCase):
+    def setUp(self):
+        self.server = MonitoredServer.objects.create(slug="replay", name="replay")
+        self.t = timezone.now().replace(microsecond=0)
+
+    def ingest(self, sample):
+        return ingest_sample_for_server(self.server, {"sample": sample})
+
+    def test_replayed_seq_is_acknowledged_without_a_second_row(self):
+        first = self.ingest(_sample(self.t, seq=1, rx_total=0))
+        replay = self.ingest(_sample(self.t, seq=1, rx_total=0))
+        self.assertTrue(replay.deduplicated)
+        self.assertEqual(replay.pk, first.pk)
+        # Same seq under a different timestamp (agent clock step) is still the same sample.
+        shifted = self.ingest(_sample(self.t + timedelta(seconds=1), seq=1, rx_total=0))
+        self.assertEqual(shifted.pk, first.pk)
+        self.assertEqual(MetricSnapshot.objects.filter(server=self.server).count(), 1)
+
+    def test_delta_expands_against_keyframe(self):
+        keyframe = _sample(self.t - timedelta(seconds=5), seq=1, rx_total=0)
+        keyframe.update(keyframe=True, gpus=[_gpu(100.0)])
+        self.ingest(keyframe)
+        delta = {"collected_at": self.t.isoformat(), "cpu_usage_percent": 55.0, "gpus": {"0": {"power_w": 210.0}}}
+        snapshot = self.ingest({"base_seq": 1, "seq": 2, "delta": delta})
+        snapshot = MetricSnapshot.objects.get(pk=snapshot.pk)
+        self.assertEqual((snapshot.seq, snapshot.cpu_usage_percent, snapshot.memory_percent), (2, 55.0, 20.0))
+        gpus = snapshot_devices(snapshot)["gpus"]
+        self.assertEqual(
+            [(gpu.gpu_index, gpu.power_w, gpu.utilization_gpu_percent) for gpu in gpus], [(0, 210.0, 50.0)]
+        )
+
+    def test_delta_expands_against_keyframe_stored_by_another_request(self):
+        stale = MonitoredServer.objects.get(pk=self.server.pk)
+        keyframe = _sample(self.t - timedelta(seconds=5), seq=1, rx_total=0)
+        keyframe.update(keyframe=True)
+        self.ingest(keyframe)
+        delta = {"collected_at": self.t.isoformat(), "cpu_usage_percent": 55.0}
+        snapshot = ingest_sample_for_server(stale, {"sample": {"base_seq": 1, "seq": 2, "delta": delta}})
+        self.assertEqual(snapshot.cpu_usage_percent, 55.0)
+
+    def test_delta_against_unknown_keyframe_is_refused(self):
+        with self.assertRaises(KeyframeRequired):
+            self.ingest({"base_seq": 7, "seq": 8, "delta": {"collected_at": self.t.isoformat()}})
+        self.assertFalse(MetricSnapshot.objects.filter(server=self.server).exists())
+
+
+@override_settings(MONITORING_INGEST_SINGLE_WRITER=False)
+class ChunkCodecTests(TestCase):
+    def test_round_trip_with_gaps(self):
+        server = MonitoredServer.objects.create(slug="chunk", name="chunk")
+        t = timezone.now().replace(microsecond=0)
+        for seq in range(3):
+            sample = _sample(t + timedelta(seconds=5 * seq), seq=seq, rx_total=seq * 1000)
+            # The middle sample has no GPU: the device series must carry a gap.
+            sample["gpus"] = [] if seq == 1 else [_gpu(100.0 + seq)]
+            ingest_sample_for_server(server, {"sample": sample})
+        snapshots = load_devices(list(MetricSnapshot.objects.filter(server=server).order_by("collected_at")))
+        snapshots[0].cpu_temperature_c = None
+        snapshots[1].cpu_temperature_c = float("nan")
+        snapshots[2].cpu_temperature_c = 55.5
+        snapshots[2].cpu_load_1 = float("inf")
+
+        points = decode_chunk(encode_chunk(snapshots), server=server)
+
+        self.assertEqual(len(points), 3)
+        for snapshot, point in zip(snapshots, points):
+            self.assertEqual(point.collected_at, snapshot.collected_at)
+            for column in FLOAT_COLUMNS:
+                expected, actual = getattr(snapshot, column), getattr(point, column)
+                if expected is not None and math.isnan(expected):
+                    self.assertTrue(actual is not None and math.isnan(actual), column)
+                else:
+                    self.assertEqual(actual, expected, column)
+            for column in INT_COLUMNS + TEXT_COLUMNS:
+                self.assertEqual(getattr(point, column), getattr(snapshot, column), column)
+            for kind, fields in DEVICE_FIELDS.items():
+                expected = [[getattr(item, field) for field in fields] for item in snapshot_devices(snapshot)[kind]]
+                actual = [[getattr(item, field) for field in fields] for item in snapshot_devices(point)[kind]]
+                self.assertEqual(actual, expected, kind)
+        self.assertEqual([len(snapshot_devices(point)["gpus"]) for point in points], [1, 0, 1])
+
+    @override_settings(MONITORING_DEVICE_STORAGE="packed")
+    def test_fans_sharing_a_label_survive_compaction(self):
+        server = MonitoredServer.objects.create(slug="chunk-fans", name="chunk-fans")
+        t = timezone.now().replace(microsecond=0)
+        for seq in range(2):
+            sample = _sample(t + timedelta(seconds=5 * seq), seq=seq, rx_total=0)
+            sample["fans"] = [{"label": "fan1", "speed_rpm": 1200 + seq}, {"label": "fan1", "speed_rpm": 900 + seq}]
+            ingest_sample_for_server(server, {"sample": sample})
+        snapshots = load_devices(list(MetricSnapshot.objects.filter(server=server).order_by("collected_at")))
+
+        points = decode_chunk(encode_chunk(snapshots), server=server)
+
+        self.assertEqual(
+            [[(fan.label, fan.speed_rpm) for fan in snapshot_devices(point)["fans"]] for point in points],
+            [[("fan1", 1200), ("fan1", 900)], [("fan1", 1201), ("fan1", 901)]],
+        )
+
+
+class AgentTokenRefreshTests(TestCase):
+    def test_non_string_server_slug_is_rejected(self):
+        for slug in (123, ["web-01"], {"slug": "web-01"}):
+            response = self.client.post(
+                "/api/agent/token/refresh/", data=json.dumps({"server_slug": slug}), content_type="application/json"
+            )
+            self.assertEqual(response.status_code, 400, slug)
+
+
+@override_settings(MONITORING_INGEST_SINGLE_WRITER=True, NOTIFICATION_EMAILS=["ops@example.com"])
+class SlowMailTests(TransactionTestCase):
+    def test_slow_send_mail_does_not_hold_the_writer(self):
+        alerting = MonitoredServer.objects.create(slug="alerting", name="alerting")
+        quiet = MonitoredServer.objects.create(slug="quiet", name="quiet")
+        t = timezone.now().replace(microsecond=0)
+        hot = _sample(t, seq=1, rx_total=0)
+        hot["cpu_usage_percent"] = 99.0
+        release = threading.Event()
+        sending = threading.Event()
+
+        def slow_send_mail(**kwargs):
+            sending.set()
+            release.wait(10)
+
+        with mock.patch("monitoring.services.notifications.send_mail", slow_send_mail):
+            try:
+                ingest_writer.run(ingest_sample_for_server, alerting, {"sample": hot}, timeout=5)
+                self.assertTrue(sending.wait(5))
+                started = time.perf_counter()
+                ingest_writer.run(ingest_sample_for_server, quiet, {"sample": _sample(t, seq=1, rx_total=0)}, timeout=5)
+                self.assertLess(time.perf_counter() - started, 2.0)
+            finally:
+                release.set()
+        self.assertTrue(Notification.objects.filter(server=alerting, code="high_cpu").exists())
+
+
+@override_settings(MONITORING_INGEST_SINGLE_WRITER=False, MONITORING_RETENTION_DAYS=0, MONITORING_ARCHIVE_DIR="")
+class RetentionTests(TestCase):
+    def setUp(self):
+        self.server = MonitoredServer.objects.create(slug="retention", name="retention")
+        self.now = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+        self.old = self.now - timedelta(days=20)
+        for seq in range(3):
+            self.ingest(self.old + timedelta(seconds=5 * seq), seq)
+        compacted = self.now - timedelta(days=19)
+        for seq in range(3, 5):
+            self.ingest(compacted + timedelta(seconds=5 * seq), seq)
+        compact_window(self.server, compacted, compacted + timedelta(minutes=1))
+        self.recent = self.ingest(self.now - timedelta(seconds=5), 5)
+        cache.delete(f"monitoring:partitions:{self.server.pk}")
+
+    def ingest(self, at, seq):
+        sample = _sample(at, seq=seq, rx_total=seq * 1000)
+        sample["disks"] = [{"device": "sda", "read_bytes_total": seq, "write_bytes_total": seq,
+                            "read_count_total": seq, "write_count_total": seq, "busy_time_ms_total": seq}]
+        return ingest_sample_for_server(self.server, {"sample": sample})
+
+    def assertStored(self, snapshots, chunks):
+        stored = MetricSnapshot.objects.filter(server=self.server)
+        self.assertEqual(stored.count(), snapshots)
+        # No orphaned device rows either.
+        self.assertEqual(DiskMetric.objects.count(), snapshots)
+        self.assertEqual(MetricChunk.objects.filter(server=self.server).count(), chunks)
+
+    def test_drop_partitions_in_batches(self):
+        self.assertStored(4, 1)
+        before = partition_day_for(self.now - timedelta(days=14))
+        self.assertEqual(drop_partitions(before, server=self.server, limit=2), 2)
+        self.assertStored(2, 0)
+        self.assertEqual(drop_partitions(before, server=self.server, limit=2), 1)
+        self.assertEqual(drop_partitions(before, server=self.server, limit=2), 0)
+        self.assertStored(1, 0)
+        self.assertTrue(MetricSnapshot.objects.filter(pk=self.recent.pk).exists())
+
+    def test_prune_metrics(self):
+        call_command("prune_metrics", "--retention-days", "14", stdout=io.StringIO())
+        self.assertStored(1, 0)
+
+    def test_ingest_expires_in_batches(self):
+        with override_settings(MONITORING_RETENTION_DAYS=14), mock.patch(
+            "monitoring.services.collector.RETENTION_BATCH", 2
+        ):
+            self.ingest(self.now, 6)
+            self.assertStored(3, 0)
+            self.ingest(self.now + timedelta(seconds=5), 7)
+            self.assertStored(3, 0)  # the last old snapshot went, a new one came
+            self.ingest(self.now + timedelta(seconds=10), 8)
+            self.assertStored(4, 0)  # done for today: no further drops
+
+    def test_archive_horizon_keeps_unarchived_days(self):
+        with tempfile.TemporaryDirectory() as archive_dir, override_settings(MONITORING_ARCHIVE_DIR=archive_dir):
+            out = io.StringIO()
+            call_command("prune_metrics", "--retention-days", "14", stdout=out)
+            self.assertStored(4, 1)
+            self.assertIn("not archived yet", out.getvalue())
+            call_command("archive_metrics", "--retention-days", "14", "--prune", stdout=io.StringIO())
+            self.assertStored(1, 0)
@@ -10,6 +10,8 @@ urlpatterns = [
     path("api/servers/register/", views.api_register_server, name="api_register_server"),
     path("api/metrics/latest/", views.api_metrics_latest, name="api_metrics_latest"),
     path("api/metrics/history/", views.api_metrics_history, name="api_metrics_history"),
+    path("api/metrics/export/", views.api_metrics_export, name="api_metrics_export"),
+    path("api/fleet/latest/", views.api_fleet_latest, name="api_fleet_latest"),
     path("api/notifications/", views.api_notifications, name="api_notifications"),
     path("api/notifications/mark-read/", views.api_notifications_mark_read, name="api_notifications_mark_read"),
     path(
@@ -17,8 +19,12 @@ urlpatterns = [
         views.api_ingest_server_metrics,
         name="api_ingest_server_metrics",
     ),
+    # Prometheus scrape target (backend telemetry)
+    path("metrics", views.metrics, name="metrics"),
+    path("metrics/fleet", views.metrics_fleet, name="metrics_fleet"),
     # Agent self-enrollment (agent authenticates and obtains its own ingest token)
     path("api/agent/enroll/", views.api_agent_enroll, name="api_agent_enroll"),
+    path("api/agent/token/refresh/", views.api_agent_token_refresh, name="api_agent_token_refresh"),
     # Credential-based auth
     path("api/auth/login/", views.api_auth_login, name="api_auth_login"),
     path("api/auth/register/", views.api_auth_register, name="api_auth_register"),
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
 import hashlib
+import hmac
 import json
 import math
+import time
 from urllib.parse import urlencode
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
 from functools import wraps
 from typing import Any
 import logging
@@ -12,23 +14,65 @@ import logging
 from django.conf import settings
 from django.contrib.auth import logout
 from django.core.cache import cache
-from django.db import IntegrityError
+from django.db import IntegrityError, OperationalError
 from django.db.models import Count, Max
 from django.db import transaction
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.text import slugify
 from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
 from django.views.decorators.http import require_GET, require_POST
 
 from monitoring.auth import is_google_email_allowlisted
 from monitoring.models import MetricSnapshot, MonitoredServer, Notification
-from monitoring.services.collector import ingest_sample_for_server
+from monitoring.services.collector import ingest_sample_for_server, ingest_samples_for_server
+from monitoring.services.delta import KeyframeRequired, keyframe_seq
+from monitoring.services.devices import load_devices, snapshot_disks, snapshot_fans, snapshot_gpus
+from monitoring.services.export import EXPORT_FORMATS, EXPORT_TABLES, stream_export
+from monitoring.services.history import history_points
+from monitoring.services.ingest_load import ingest_advice, ingest_load
+from monitoring.services.latest_state import latest_states, render_fleet_metrics
+from monitoring.services.telemetry import ingest_phase, record_ingest, render_metrics
+from monitoring.services.writer import ingest_writer
 from monitoring.version import BACKEND_VERSION, MIN_AGENT_VERSION
 
 logger = logging.getLogger(__name__)
 
+# How long an ingest request waits for the writer thread before answering 503.
+INGEST_WRITE_TIMEOUT_SECONDS = 30.0
+
+# Columns the history endpoint serializes; the other columns are not read from chunks or the archive.
+HISTORY_COLUMNS = {
+    "cpu_usage_percent",
+    "cpu_iowait_percent",
+    "memory_percent",
+    "swap_percent",
+    "disk_read_bps",
+    "disk_write_bps",
+    "disk_util_percent",
+    "disk_avg_util_percent",
+    "network_rx_bps",
+    "network_tx_bps",
+    "top_gpu_util_percent",
+    "avg_gpu_util_percent",
+    "top_gpu_memory_percent",
+    "fan_count",
+    "fan_max_rpm",
+    "fan_avg_rpm",
+    "bottleneck",
+    "summaries",
+    "gpus.utilization_gpu_percent",
+    "gpus.memory_percent",
+    "gpus.temperature_c",
+    "gpus.fan_speed_percent",
+    "fans.speed_rpm",
+    "disks.read_bps",
+    "disks.write_bps",
+    "disks.util_percent",
+}
+
 # ── Rate limiting ─────────────────────────────────────────────────────────────
 
 def _rate_limit(max_requests: int, window_seconds: int):
@@ -60,6 +104,7 @@ def _label_to_title(label: str) -> str:
 def _server_queryset():
     return (
         MonitoredServer.objects.filter(is_active=True)
+        .defer("latest_state", "delta_base")
         .annotate(
             snapshot_count=Count("snapshots"),
             latest_snapshot_at=Max("snapshots__collected_at"),
@@ -132,14 +177,14 @@ def _serialize_snapshot(snapshot: MetricSnapshot) -> dict[str, Any]:
             "power_w": gpu.power_w,
             "power_limit_w": gpu.power_limit_w,
         }
-        for gpu in snapshot.gpus.all()
+        for gpu in snapshot_gpus(snapshot)
     ]
     fans = [
         {
             "label": fan.label,
             "speed_rpm": fan.speed_rpm,
         }
-        for fan in snapshot.fans.all()
+        for fan in snapshot_fans(snapshot)
     ]
     disks = [
         {
@@ -152,7 +197,7 @@ def _serialize_snapshot(snapshot: MetricSnapshot) -> dict[str, Any]:
             "read_bytes_total": disk.read_bytes_total,
             "write_bytes_total": disk.write_bytes_total,
         }
-        for disk in snapshot.disks.all()
+        for disk in snapshot_disks(snapshot)
     ]
     return {
         "id": snapshot.id,
@@ -217,6 +262,7 @@ def _serialize_snapshot(snapshot: MetricSnapshot) -> dict[str, Any]:
             "confidence": snapshot.bottleneck_confidence,
             "reason": snapshot.bottleneck_reason,
         },
+        "summaries": snapshot.summaries or {},
     }
 
 
@@ -329,6 +375,7 @@ def api_root(request):
                 "servers": "/api/servers/",
                 "metrics_latest": "/api/metrics/latest/",
                 "metrics_history": "/api/metrics/history/",
+                "fleet_latest": "/api/fleet/latest/",
                 "notifications": "/api/notifications/",
                 "google_login": "/accounts/google/login/",
                 "admin": "/admin/",
@@ -404,7 +451,7 @@ def api_metrics_latest(request):
     snapshot = (
         MetricSnapshot.objects.filter(server=selected_server)
         .order_by("-collected_at")
-        .prefetch_related("gpus", "disks", "fans", "server")
+        .select_related("server")
         .first()
     )
     if snapshot is None:
@@ -431,6 +478,46 @@ def api_metrics_latest(request):
     )
 
 
+def _serialize_fleet_row(entry: dict[str, Any], now: float) -> dict[str, Any]:
+    state = entry["latest_state"] or {}
+    ts = state.get("ts")
+    return {
+        "id": entry["id"],
+        "slug": entry["slug"],
+        "name": entry["name"],
+        "collected_at": state.get("collected_at"),
+        "age_seconds": round(max(0.0, now - ts), 1) if ts else None,
+        "cpu_usage_percent": state.get("cpu_usage_percent"),
+        "cpu_iowait_percent": state.get("cpu_iowait_percent"),
+        "memory_percent": state.get("memory_percent"),
+        "swap_percent": state.get("swap_percent"),
+        "disk_util_percent": state.get("disk_util_percent"),
+        "network_rx_bps": state.get("network_rx_bps"),
+        "network_tx_bps": state.get("network_tx_bps"),
+        "gpu_count": state.get("gpu_count", 0),
+        "top_gpu_util_percent": state.get("top_gpu_util_percent"),
+        "avg_gpu_util_percent": state.get("avg_gpu_util_percent"),
+        "bottleneck": state.get("bottleneck") or "unknown",
+        "bottleneck_confidence": state.get("bottleneck_confidence"),
+    }
+
+
+@require_GET
+def api_fleet_latest(request):
+    """One compact row per active server from the latest-state store; no snapshot reads, no per-server queries."""
+    access_error = _require_authenticated_allowlisted(request)
+    if access_error is not None:
+        return access_error
+    now = time.time()
+    return JsonResponse(
+        {
+            "ok": True,
+            "generated_at": datetime.fromtimestamp(now, dt_timezone.utc).isoformat(),
+            "servers": [_serialize_fleet_row(entry, now) for entry in latest_states.entries()],
+        }
+    )
+
+
 @require_GET
 def api_notifications(request):
     access_error = _require_authenticated_allowlisted(request)
@@ -506,17 +593,8 @@ def api_metrics_history(request):
 
     minutes = max(1, min(minutes, settings.MONITORING_MAX_HISTORY_MINUTES))
     since = timezone.now() - timedelta(minutes=minutes)
-    snapshots = list(
-        MetricSnapshot.objects.filter(server=selected_server, collected_at__gte=since)
-        .order_by("collected_at")
-        .prefetch_related("gpus", "disks", "fans")
-    )
-
-    max_points = 1500
-    stride = 1
-    if len(snapshots) > max_points:
-        stride = math.ceil(len(snapshots) / max_points)
-        snapshots = snapshots[::stride]
+    snapshots, stride = history_points(selected_server, since, columns=HISTORY_COLUMNS, max_points=1500)
+    load_devices(snapshots)
 
     points: list[dict[str, Any]] = []
     for snap in snapshots:
@@ -540,6 +618,7 @@ def api_metrics_history(request):
                 "fan_max_rpm": snap.fan_max_rpm,
                 "fan_avg_rpm": snap.fan_avg_rpm,
                 "bottleneck": snap.bottleneck,
+                "summaries": snap.summaries or {},
                 "gpus": [
                     {
                         "gpu_index": gpu.gpu_index,
@@ -548,14 +627,14 @@ def api_metrics_history(request):
                         "temperature_c": gpu.temperature_c,
                         "fan_speed_percent": gpu.fan_speed_percent,
                     }
-                    for gpu in snap.gpus.all()
+                    for gpu in snapshot_gpus(snap)
                 ],
                 "fans": [
                     {
                         "label": fan.label,
                         "speed_rpm": fan.speed_rpm,
                     }
-                    for fan in snap.fans.all()
+                    for fan in snapshot_fans(snap)
                 ],
                 "disks": [
                     {
@@ -564,7 +643,7 @@ def api_metrics_history(request):
                         "write_bps": disk.write_bps,
                         "util_percent": disk.util_percent,
                     }
-                    for disk in snap.disks.all()
+                    for disk in snapshot_disks(snap)
                 ],
             }
         )
@@ -584,6 +663,73 @@ def api_metrics_history(request):
     )
 
 
+def _parse_time_param(value: str | None) -> tuple[datetime | None, bool]:
+    """``(moment, ok)`` for an optional ISO 8601 query parameter; naive values are UTC."""
+    if not value:
+        return None, True
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        return None, False
+    if timezone.is_naive(parsed):
+        parsed = parsed.replace(tzinfo=dt_timezone.utc)
+    return parsed, True
+
+
+_EXPORT_CONTENT_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+@require_GET
+def api_metrics_export(request):
+    """Stream raw snapshots or per-device rows as NDJSON or CSV.
+
+    Query: ``server`` (slug or id; all active servers when omitted), ``since``
+    and ``until`` (ISO 8601; default the last ``minutes``, 60),
+    ``table`` (snapshots, gpus, disks, fans) and ``format`` (ndjson, csv).
+    """
+    access_error = _require_authenticated_allowlisted(request)
+    if access_error is not None:
+        return access_error
+
+    table = request.GET.get("table", "snapshots")
+    fmt = request.GET.get("format", "ndjson")
+    if table not in EXPORT_TABLES:
+        return JsonResponse({"ok": False, "error": f"table must be one of {', '.join(EXPORT_TABLES)}."}, status=400)
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({"ok": False, "error": f"format must be one of {', '.join(EXPORT_FORMATS)}."}, status=400)
+
+    since, since_ok = _parse_time_param(request.GET.get("since"))
+    until, until_ok = _parse_time_param(request.GET.get("until"))
+    if not (since_ok and until_ok):
+        return JsonResponse({"ok": False, "error": "since and until must be ISO 8601 timestamps."}, status=400)
+    until = until or timezone.now()
+    if since is None:
+        try:
+            minutes = int(request.GET.get("minutes", 60))
+        except ValueError:
+            return JsonResponse({"ok": False, "error": "minutes must be an integer."}, status=400)
+        since = until - timedelta(minutes=max(1, minutes))
+    if since >= until:
+        return JsonResponse({"ok": False, "error": "since must be before until."}, status=400)
+
+    servers = MonitoredServer.objects.filter(is_active=True).defer("latest_state", "delta_base").order_by("slug")
+    server_param = (request.GET.get("server") or "").strip()
+    if server_param:
+        servers = servers.filter(id=int(server_param)) if server_param.isdigit() else servers.filter(slug=server_param)
+        if not servers.exists():
+            return JsonResponse({"ok": False, "error": "Unknown server."}, status=404)
+
+    response = StreamingHttpResponse(
+        stream_export(servers.iterator(), since, until, table=table, fmt=fmt),
+        content_type=_EXPORT_CONTENT_TYPES[fmt],
+    )
+    filename = f"metrics-{server_param or 'all'}-{table}-{since:%Y%m%dT%H%M}-{until:%Y%m%dT%H%M}.{fmt}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
 def _extract_ingest_token(request) -> str:
     direct = (request.headers.get("X-Monitoring-Token") or "").strip()
     if direct:
@@ -606,6 +752,41 @@ def _request_ip(request) -> str | None:
     return addr or None
 
 
+# Fractional part of the golden ratio: successive multiples are evenly spread over [0, 1).
+_PHASE_STEP = 0.6180339887498949
+
+
+def _agent_schedule(server: MonitoredServer, agent_info: Any) -> dict[str, Any]:
+    """Send schedule suggested to the agent.
+
+    The phase is spread by server id.  The interval is the fleet-wide
+    override (if set), stretched when this worker's ingest load is above
+    target; ``None`` tells the agent to use its own configured interval.
+    """
+    configured = settings.MONITORING_AGENT_INTERVAL_SECONDS
+    base = configured if configured > 0 else None
+    if base is None and isinstance(agent_info, dict):
+        base = _to_positive_float(agent_info.get("interval_seconds"))
+    advice = ingest_advice(base or 2.0)
+    interval = advice["interval_seconds"]
+    if interval is None and configured > 0:
+        interval = configured
+    return {
+        "phase_fraction": round((server.id * _PHASE_STEP) % 1.0, 4),
+        "interval_seconds": interval,
+        "retry_after_seconds": advice["retry_after_seconds"],
+        "load_factor": advice["load_factor"],
+    }
+
+
+def _to_positive_float(value: Any) -> float | None:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) and number > 0 else None
+
+
 @csrf_exempt
 @require_POST
 def api_ingest_server_metrics(request, server_slug: str):
@@ -619,21 +800,90 @@ def api_ingest_server_metrics(request, server_slug: str):
         logger.warning("Invalid ingest token for server=%s from ip=%s", server_slug, _request_ip(request))
         return JsonResponse({"ok": False, "error": "Invalid ingest token."}, status=401)
 
-    payload, error_response = _load_json_dict(request)
+    with ingest_phase("parse"):
+        payload, error_response = _load_json_dict(request)
     if error_response is not None:
         return error_response
 
+    samples = payload.get("samples")
+    if samples is not None:
+        if not isinstance(samples, list) or not samples:
+            return JsonResponse({"ok": False, "error": "samples must be a non-empty list."}, status=400)
+        if len(samples) > settings.MONITORING_INGEST_MAX_BATCH:
+            return JsonResponse(
+                {
+                    "ok": False,
+                    "error": f"Too many samples in one request (max {settings.MONITORING_INGEST_MAX_BATCH}).",
+                    "max_batch": settings.MONITORING_INGEST_MAX_BATCH,
+                },
+                status=400,
+            )
+
+    started = time.perf_counter()
     try:
-        snapshot = ingest_sample_for_server(server, payload, source_ip=_request_ip(request))
+        if samples is not None:
+            snapshots = ingest_writer.run(
+                ingest_samples_for_server,
+                server,
+                payload,
+                source_ip=_request_ip(request),
+                timeout=INGEST_WRITE_TIMEOUT_SECONDS,
+            )
+        else:
+            snapshots = [
+                ingest_writer.run(
+                    ingest_sample_for_server,
+                    server,
+                    payload,
+                    source_ip=_request_ip(request),
+                    timeout=INGEST_WRITE_TIMEOUT_SECONDS,
+                )
+            ]
+    except KeyframeRequired as exc:
+        logger.info("Ingest rejected delta for server=%s: %s", server_slug, exc)
+        return JsonResponse(
+            {"ok": False, "error": "Unknown delta base; send a keyframe.", "keyframe_required": True},
+            status=409,
+        )
+    except OperationalError as exc:
+        if "locked" not in str(exc).lower():
+            logger.exception("Ingest failed for server=%s", server_slug)
+            return JsonResponse({"ok": False, "error": "Ingest processing failed."}, status=400)
+        # Writer contention: ask the agent to keep its samples queued and come back later.
+        ingest_load.record_lock_error()
+        schedule = _agent_schedule(server, payload.get("agent"))
+        retry_after = schedule["retry_after_seconds"] or math.ceil(schedule["interval_seconds"] or 5)
+        logger.warning("Ingest deferred for server=%s: database locked", server_slug)
+        return JsonResponse(
+            {"ok": False, "error": "Ingest temporarily overloaded.", "schedule": schedule},
+            status=503,
+            headers={"Retry-After": str(retry_after)},
+        )
     except Exception:  # pragma: no cover - defensive API path
         logger.exception("Ingest failed for server=%s", server_slug)
         return JsonResponse({"ok": False, "error": "Ingest processing failed."}, status=400)
-
-    logger.debug("Ingest OK server=%s snap_id=%s bottleneck=%s", server_slug, snapshot.id, snapshot.bottleneck)
+    if not snapshots:
+        return JsonResponse({"ok": False, "error": "No valid samples in request."}, status=400)
+
+    # Per sample: a backlog flush of 50 samples must not read as a slow database and throttle the flush.
+    ingest_load.record((time.perf_counter() - started) * 1000.0 / len(snapshots))
+
+    duplicates = sum(1 for snap in snapshots if getattr(snap, "deduplicated", False))
+    record_ingest(server_slug, len(snapshots) - duplicates, duplicates)
+    snapshot = snapshots[-1]
+    logger.debug(
+        "Ingest OK server=%s snap_id=%s bottleneck=%s accepted=%d",
+        server_slug, snapshot.id, snapshot.bottleneck, len(snapshots),
+    )
     return JsonResponse(
         {
             "ok": True,
             "server": _serialize_server(server),
+            "accepted": len(snapshots) - duplicates,
+            "duplicates": duplicates,
+            "max_batch": settings.MONITORING_INGEST_MAX_BATCH,
+            "schedule": _agent_schedule(server, payload.get("agent")),
+            "delta": {"keyframe_seq": keyframe_seq(server)},
             "snapshot": {
                 "id": snapshot.id,
                 "collected_at": snapshot.collected_at.isoformat(),
@@ -646,6 +896,37 @@ def api_ingest_server_metrics(request, server_slug: str):
     )
 
 
+_PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _metrics_denied(request) -> JsonResponse | None:
+    """Error response for a scrape without the metrics token; both endpoints are off until one is set."""
+    expected = settings.MONITORING_METRICS_TOKEN
+    if not expected:
+        return JsonResponse({"ok": False, "error": "Set MONITORING_METRICS_TOKEN to enable."}, status=404)
+    if not hmac.compare_digest(_extract_ingest_token(request).encode(), expected.encode()):
+        return JsonResponse({"ok": False, "error": "Invalid metrics token."}, status=401)
+    return None
+
+
+@require_GET
+def metrics(request):
+    """Backend telemetry of this worker process in Prometheus text format."""
+    denied = _metrics_denied(request)
+    if denied is not None:
+        return denied
+    return HttpResponse(render_metrics(), content_type=_PROMETHEUS_CONTENT_TYPE)
+
+
+@require_GET
+def metrics_fleet(request):
+    """Latest reading of every active server and device in Prometheus text format."""
+    denied = _metrics_denied(request)
+    if denied is not None:
+        return denied
+    return HttpResponse(render_fleet_metrics(latest_states.entries()), content_type=_PROMETHEUS_CONTENT_TYPE)
+
+
 # ── Agent self-enrollment ─────────────────────────────────────────────────────
 
 @csrf_exempt
@@ -730,6 +1011,47 @@ def api_agent_enroll(request):
     )
 
 
+@csrf_exempt
+@require_POST
+def api_agent_token_refresh(request):
+    """Rotate an agent's ingest token, authenticated by the current token.
+
+    Agents call this on start-up instead of re-enrolling: it costs one SHA-256
+    check and one UPDATE, where enrollment runs the password hasher.  A 401
+    means the token is no longer valid and the agent must enroll again.
+    """
+    body, error_response = _load_json_dict(request)
+    if error_response is not None:
+        return error_response
+
+    server_slug = body.get("server_slug")
+    if not isinstance(server_slug, str) or not server_slug.strip():
+        return JsonResponse({"ok": False, "error": "server_slug is required."}, status=400)
+    server_slug = server_slug.strip()
+
+    server = MonitoredServer.objects.filter(slug=server_slug).first()
+    token = _extract_ingest_token(request)
+    if server is None or not server.check_api_token(token):
+        logger.info("Token refresh rejected for server=%s from ip=%s", server_slug, _request_ip(request))
+        return JsonResponse({"ok": False, "error": "Invalid ingest token."}, status=401)
+    if not server.is_active:
+        return JsonResponse({"ok": False, "error": "Server is disabled."}, status=403)
+
+    ingest_token = server.rotate_api_token(token)
+    if ingest_token is None:
+        return JsonResponse({"ok": False, "error": "Invalid ingest token."}, status=401)
+
+    logger.info("Agent token refreshed: server_slug=%s", server.slug)
+    return JsonResponse(
+        {
+            "ok": True,
+            "server_slug": server.slug,
+            "ingest_token": ingest_token,
+            "server": _serialize_server(server),
+        }
+    )
+
+
 # ── Credential auth views ─────────────────────────────────────────────────────
 
 @require_POST
@@ -101,6 +101,18 @@ export interface DiskDeviceMetric {
   write_bytes_total: number;
 }
 
+export interface MetricSummary {
+  min: number;
+  avg: number;
+  max: number;
+  p95: number;
+  count: number;
+}
+
+export type MetricSummaries = Partial<
+  Record<'gpu_util_percent' | 'cpu_usage_percent' | 'cpu_iowait_percent' | 'disk_util_percent', MetricSummary>
+>;
+
 export interface MetricSnapshot {
   id: number;
   server: ServerSummary | null;
@@ -164,6 +176,7 @@ export interface MetricSnapshot {
     confidence: number;
     reason: string;
   };
+  summaries?: MetricSummaries;
 }
 
 export interface ServersListResponse {
@@ -226,6 +239,7 @@ export interface HistoryPoint {
   fan_max_rpm: number | null;
   fan_avg_rpm: number | null;
   bottleneck: string;
+  summaries?: MetricSummaries;
   gpus: HistoryPointGpu[];
   disks: HistoryPointDisk[];
   fans: FanDeviceMetric[];